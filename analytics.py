@@ -0,0 +1,306 @@
+"""
+Multi-year analytics over history in columnar form: a day × task matrix of
+seconds, one row per calendar day from the first saved day to the last and
+one column per task. Totals per task, group, weekday and month, averages
+and trends are reductions over whole columns (NumPy when it is installed,
+flat array('d') columns and slicing otherwise), never per-day dict loops.
+
+    python analytics.py [dataDir] [--from YYYY-MM-DD] [--to YYYY-MM-DD] [--months N]
+
+prints the report for a data directory, archived periods included.
+"""
+import calendar
+import os
+import sys
+from array import array
+from datetime import date
+
+from summaries import entryHoursById
+from taskDictionary import taskDictionary
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+DEFAULT_TREND_MONTHS = 12
+
+
+class HistoryMatrix:
+    """
+    Seconds by day (rows) and task (columns). `firstOrdinal` is the date
+    ordinal of row 0; `taskIds` are taskDictionary ids of the columns. With
+    NumPy `data` is a (days, tasks) float array, otherwise a list of
+    array('d') columns.
+    """
+
+    def __init__(self, firstOrdinal, days, taskIds, data, backend):
+        self.firstOrdinal = firstOrdinal
+        self.days = days
+        self.taskIds = taskIds
+        self.data = data
+        self.backend = backend
+        self._rowTotals = None
+
+    @classmethod
+    def fromHistory(cls, history, startKey=None, endKey=None, useNumpy=None):
+        """Build from {date: entry}, optionally limited to startKey..endKey (inclusive)"""
+        useNumpy = np is not None if useNumpy is None else (useNumpy and np is not None)
+        rows = []
+        for dateKey, entry in history.items():
+            if (startKey and dateKey < startKey) or (endKey and dateKey > endKey):
+                continue
+            try:
+                ordinal = date.fromisoformat(dateKey).toordinal()
+            except (TypeError, ValueError):
+                continue
+            # the hours the day's summary shows, like every other History total
+            hoursById, _ = entryHoursById(entry)
+            if hoursById:
+                rows.append((ordinal, {tid: hours * 3600.0 for tid, hours in hoursById.items()}))
+        if not rows:
+            return cls(date.today().toordinal(), 0, [], np.zeros((0, 0)) if useNumpy else [], "numpy" if useNumpy else "array")
+        first = min(r[0] for r in rows)
+        days = max(r[0] for r in rows) - first + 1
+        columnOf = {}
+        for _, byId in rows:
+            for tid in byId:
+                if tid not in columnOf:
+                    columnOf[tid] = len(columnOf)
+        taskIds = list(columnOf)
+        if useNumpy:
+            data = np.zeros((days, len(taskIds)))
+            for ordinal, byId in rows:
+                row = data[ordinal - first]
+                for tid, seconds in byId.items():
+                    row[columnOf[tid]] = seconds
+            return cls(first, days, taskIds, data, "numpy")
+        data = [array("d", bytes(8 * days)) for _ in taskIds]
+        for ordinal, byId in rows:
+            slot = ordinal - first
+            for tid, seconds in byId.items():
+                data[columnOf[tid]][slot] = seconds
+        return cls(first, days, taskIds, data, "array")
+
+    def firstDate(self):
+        return date.fromordinal(self.firstOrdinal)
+
+    def lastDate(self):
+        return date.fromordinal(self.firstOrdinal + max(self.days, 1) - 1)
+
+    def taskNames(self):
+        return [taskDictionary.name(tid) for tid in self.taskIds]
+
+    def rowTotals(self):
+        """Seconds per day across all tasks"""
+        if self._rowTotals is None:
+            if self.backend == "numpy":
+                self._rowTotals = self.data.sum(axis=1)
+            else:
+                totals = array("d", bytes(8 * self.days))
+                for column in self.data:
+                    totals = array("d", map(float.__add__, totals, column))
+                self._rowTotals = totals
+        return self._rowTotals
+
+    def columnTotals(self):
+        """Seconds per task, in column order"""
+        if self.backend == "numpy":
+            return list(self.data.sum(axis=0))
+        return [sum(column) for column in self.data]
+
+    def workedDays(self):
+        """Number of days with any time"""
+        if self.backend == "numpy":
+            return int((self.rowTotals() > 0).sum())
+        return sum(1 for v in self.rowTotals() if v > 0)
+
+    def columnWorkedDays(self):
+        """Per task, the number of days it has time on"""
+        if self.backend == "numpy":
+            return list((self.data > 0).sum(axis=0))
+        return [sum(1 for v in column if v > 0) for column in self.data]
+
+    def weekdayTotals(self):
+        """([seconds per weekday Mon..Sun], [worked days per weekday])"""
+        totals = self.rowTotals()
+        # weekday of row 0: date.toordinal() 1 is a Monday
+        offset = (self.firstOrdinal - 1) % 7
+        if self.backend == "numpy":
+            weekdays = (np.arange(self.days) + offset) % 7
+            seconds = np.bincount(weekdays, weights=totals, minlength=7)
+            worked = np.bincount(weekdays, weights=(totals > 0), minlength=7)
+            return list(seconds), [int(n) for n in worked]
+        seconds = [0.0] * 7
+        worked = [0] * 7
+        for wd in range(7):
+            rows = totals[(wd - offset) % 7::7]
+            seconds[wd] = sum(rows)
+            worked[wd] = sum(1 for v in rows if v > 0)
+        return seconds, worked
+
+    def monthStarts(self):
+        """[(\"YYYY-MM\", first row)] of every calendar month the rows touch"""
+        first = self.firstDate()
+        year, month = first.year, first.month
+        starts = []
+        row = 0
+        while row < self.days:
+            starts.append((f"{year:04d}-{month:02d}", row))
+            row = date(year, month, calendar.monthrange(year, month)[1]).toordinal() + 1 - self.firstOrdinal
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return starts
+
+    def monthTaskTotals(self):
+        """([\"YYYY-MM\"], month × task seconds) with one row per month"""
+        starts = self.monthStarts()
+        keys = [k for k, _ in starts]
+        rows = [r for _, r in starts]
+        if self.backend == "numpy":
+            if not rows or not self.taskIds:
+                return keys, np.zeros((len(keys), len(self.taskIds)))
+            return keys, np.add.reduceat(self.data, rows, axis=0)
+        bounds = rows + [self.days]
+        perColumn = [[sum(column[bounds[i]:bounds[i + 1]]) for i in range(len(rows))] for column in self.data]
+        return keys, [list(r) for r in zip(*perColumn)] if perColumn else [[] for _ in keys]
+
+
+def _slopes(series):
+    """Least-squares slope of each column of `series` (rows = consecutive months)"""
+    n = len(series)
+    if n < 2:
+        return None
+    if np is not None and not isinstance(series, list):
+        x = np.arange(n) - (n - 1) / 2.0
+        return list((x[:, None] * (series - series.mean(axis=0))).sum(axis=0) / (x * x).sum())
+    x = [i - (n - 1) / 2.0 for i in range(n)]
+    denom = sum(v * v for v in x)
+    columns = list(zip(*series))
+    return [sum(xi * yi for xi, yi in zip(x, column)) / denom for column in columns]
+
+
+def summarize(matrix, groups=None, trendMonths=DEFAULT_TREND_MONTHS):
+    """
+    Report dict of hours: totals and averages per task, group, weekday and
+    month, and per-task trends (slope of monthly hours over the last
+    `trendMonths` months, in hours per month).
+    """
+    groups = groups or {}
+    names = matrix.taskNames()
+    totals = [s / 3600.0 for s in matrix.columnTotals()]
+    taskDays = matrix.columnWorkedDays()
+    worked = matrix.workedDays()
+    monthKeys, monthly = matrix.monthTaskTotals()
+
+    recent = monthly[-trendMonths:] if len(monthKeys) else monthly
+    slopes = _slopes(recent) if len(monthKeys) else None
+    tasks = {}
+    for i, name in enumerate(names):
+        tasks[name] = {
+            "hours": totals[i],
+            "days": int(taskDays[i]),
+            "avgPerDay": totals[i] / taskDays[i] if taskDays[i] else 0.0,
+            "trend": slopes[i] / 3600.0 if slopes is not None else None,
+        }
+
+    byGroup = {}
+    for name, info in tasks.items():
+        group = groups.get(name)
+        if group:
+            byGroup[group] = byGroup.get(group, 0.0) + info["hours"]
+
+    weekdaySeconds, weekdayWorked = matrix.weekdayTotals()
+    weekdays = [
+        {"name": WEEKDAYS[wd], "hours": weekdaySeconds[wd] / 3600.0, "days": weekdayWorked[wd],
+         "avgPerDay": weekdaySeconds[wd] / 3600.0 / weekdayWorked[wd] if weekdayWorked[wd] else 0.0}
+        for wd in range(7)
+    ]
+    if matrix.backend == "numpy":
+        monthHours = list(monthly.sum(axis=1) / 3600.0) if len(monthKeys) else []
+    else:
+        monthHours = [sum(row) / 3600.0 for row in monthly]
+    total = sum(totals)
+    return {
+        "backend": matrix.backend,
+        "first": matrix.firstDate().isoformat() if matrix.days else None,
+        "last": matrix.lastDate().isoformat() if matrix.days else None,
+        "workedDays": worked,
+        "totalHours": total,
+        "avgPerDay": total / worked if worked else 0.0,
+        "tasks": tasks,
+        "groups": byGroup,
+        "weekdays": weekdays,
+        "months": dict(zip(monthKeys, (float(h) for h in monthHours))),
+        "trendMonths": min(trendMonths, len(monthKeys)),
+    }
+
+
+def formatReport(report):
+    if not report["workedDays"]:
+        return "No history to analyze."
+    lines = [
+        f"{report['first']} – {report['last']}: {report['workedDays']} days worked, "
+        f"{report['totalHours']:.1f} h ({report['avgPerDay']:.2f} h/day)",
+        "",
+        f"Tasks (trend over the last {report['trendMonths']} months, h/month per month):",
+    ]
+    for name, info in sorted(report["tasks"].items(), key=lambda kv: kv[1]["hours"], reverse=True):
+        trend = f"{info['trend']:+.2f}" if info["trend"] is not None else "n/a"
+        lines.append(f"  {name}: {info['hours']:.1f} h over {info['days']} days, "
+                     f"{info['avgPerDay']:.2f} h/day, trend {trend}")
+    if report["groups"]:
+        lines.append("")
+        lines.append("Groups:")
+        for group, hours in sorted(report["groups"].items(), key=lambda kv: kv[1], reverse=True):
+            lines.append(f"  {group}: {hours:.1f} h")
+    lines.append("")
+    lines.append("Weekdays:")
+    for wd in report["weekdays"]:
+        if wd["days"]:
+            lines.append(f"  {wd['name']}: {wd['hours']:.1f} h over {wd['days']} days, {wd['avgPerDay']:.2f} h/day")
+    lines.append("")
+    lines.append("Months:")
+    for month, hours in report["months"].items():
+        lines.append(f"  {month}: {hours:.1f} h")
+    return "\n".join(lines)
+
+
+def loadAllHistory(store):
+    """Active and archived history of a storage backend, as {date: entry}"""
+    loaded = store.load()
+    history = dict(loaded[2]) if loaded is not None else {}
+    for header in store.archivedPeriods():
+        for dateKey, entry in store.loadArchivedPeriod(header["start"]).items():
+            history.setdefault(dateKey, entry)
+    groups = loaded[1] if loaded is not None else {}
+    return history, groups or {}
+
+
+def main(argv):
+    args = list(argv[1:])
+    options = {"--from": None, "--to": None, "--months": str(DEFAULT_TREND_MONTHS)}
+    dataDir = None
+    while args:
+        arg = args.pop(0)
+        if arg in options and args:
+            options[arg] = args.pop(0)
+        elif dataDir is None and not arg.startswith("--"):
+            dataDir = arg
+        else:
+            print("usage: analytics.py [dataDir] [--from YYYY-MM-DD] [--to YYYY-MM-DD] [--months N]")
+            return 2
+    if dataDir is None:
+        appData = os.environ.get("LOCALAPPDATA") or os.environ.get("APPDATA") or os.path.expanduser("~")
+        dataDir = os.path.join(appData, "Task Tracker")
+    from settings import loadSettings
+    from storage import openStorage
+    store = openStorage(dataDir, loadSettings(os.path.join(dataDir, "settings.json")))
+    history, groups = loadAllHistory(store)
+    matrix = HistoryMatrix.fromHistory(history, options["--from"], options["--to"])
+    print(formatReport(summarize(matrix, groups, int(options["--months"]))))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
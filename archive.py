@@ -0,0 +1,333 @@
+"""
+Compressed archive of closed pay periods for the JSONL backend. History of
+periods before the newest `keepPeriods` is moved out of tasks.jsonl into one
+gzip (or lzma) segment per period under archive/, so the active file stays
+small and the load scan never touches old years:
+
+    archive/index.jsonl                   one header per archived period
+    archive/history-2024-01-06.jsonl.gz   the period's history records
+
+Periods follow the pay-period calendar of settings.json (payPeriods.py). Days
+are found by the header ranges, so segments written under an earlier
+schedule stay readable after it changes.
+
+A header holds the period's days and per-task totals, which is all the
+History window needs to list the period; the segment is only decompressed
+when the period is opened. Saving a day of an archived period rewrites that
+period's segment instead of tasks.jsonl, so every day lives in exactly one
+place and edits to old periods don't churn the active file.
+
+    python archive.py [dataDir]
+
+archives the closed periods of a data directory now.
+"""
+import gzip
+import lzma
+import os
+import sys
+import tempfile
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import date, timedelta
+
+from jsonlReader import checkLine, decodeLine
+from payPeriods import PayPeriodCalendar
+from storage import dedupeHistory, dumpRecord
+from summaries import summaryNumbers, withSummaryNumbers
+
+ARCHIVE_DIR = "archive"
+INDEX_NAME = "index.jsonl"
+SEGMENT_PREFIX = "history-"
+# compression -> (segment file extension, opener)
+COMPRESSIONS = {
+    "gzip": (".jsonl.gz", gzip.open),
+    "lzma": (".jsonl.xz", lzma.open),
+}
+DEFAULT_COMPRESSION = "gzip"
+# the current and previous pay period stay in tasks.jsonl
+DEFAULT_KEEP_PERIODS = 2
+PERIOD_CACHE_SIZE = 4
+# no schedule has longer periods; bounds the header search for one day
+MAX_PERIOD_DAYS = 31
+
+
+def archiveCutoff(keepPeriods=DEFAULT_KEEP_PERIODS, today=None, calendar=None):
+    """ISO start of the oldest pay period that stays active; earlier days are archivable"""
+    calendar = calendar or PayPeriodCalendar()
+    current = calendar.current(today)
+    return calendar.period(current.index - (max(1, int(keepPeriods)) - 1)).key
+
+
+def periodHeader(startKey, records, fileName, calendar=None):
+    """Aggregate header of one archived period: its days plus per-task hours and seconds"""
+    hoursByTask = {}
+    secondsByTask = {}
+    for obj in records:
+        hours, seconds = summaryNumbers(obj)
+        for task, h in hours.items():
+            hoursByTask[task] = hoursByTask.get(task, 0.0) + h
+        for task, s in seconds.items():
+            secondsByTask[task] = secondsByTask.get(task, 0) + s
+    end = (calendar or PayPeriodCalendar()).periodOf(startKey).end
+    return {
+        "type": "archivedPeriod",
+        "start": startKey,
+        "end": end.isoformat(),
+        "file": fileName,
+        "days": sorted(obj.get("date") for obj in records),
+        "total": round(sum(hoursByTask.values()), 2),
+        "hoursByTask": {task: round(h, 2) for task, h in hoursByTask.items()},
+        "secondsByTask": secondsByTask,
+    }
+
+
+def _opener(fileName):
+    for ext, opener in COMPRESSIONS.values():
+        if fileName.endswith(ext):
+            return opener
+    return gzip.open
+
+
+class HistoryArchive:
+    """
+    The archive/ directory beside a tasks.jsonl. Headers are read from the
+    small uncompressed index (re-read only when it changes); decompressed
+    periods are kept in a small LRU. Writers call writePeriods() and
+    removePeriods() while holding the data file's lock.
+    """
+
+    def __init__(self, archiveDir, compression=DEFAULT_COMPRESSION, durability=None, calendar=None):
+        self.dir = archiveDir
+        self.indexPath = os.path.join(archiveDir, INDEX_NAME)
+        self.compression = compression if compression in COMPRESSIONS else DEFAULT_COMPRESSION
+        self.durability = durability
+        # the schedule new segments are cut by
+        self.calendar = calendar or PayPeriodCalendar()
+        self.lock = threading.Lock()
+        self._headers = {}
+        self._starts = []
+        self._indexStat = None
+        self.periods = OrderedDict()
+
+    @classmethod
+    def besideDataFile(cls, jsonlPath, **kwargs):
+        return cls(os.path.join(os.path.dirname(jsonlPath) or ".", ARCHIVE_DIR), **kwargs)
+
+    def _headersByStart(self):
+        try:
+            st = os.stat(self.indexPath)
+        except OSError:
+            with self.lock:
+                self._headers = {}
+                self._starts = []
+                self._indexStat = None
+            return {}
+        stamp = (st.st_size, st.st_mtime_ns)
+        with self.lock:
+            if stamp == self._indexStat:
+                return self._headers
+        headers = {}
+        try:
+            with open(self.indexPath, "rb") as f:
+                for raw in f:
+                    line = raw.strip()
+                    if not line or checkLine(line, 0, len(line)) is False:
+                        continue
+                    obj = decodeLine(line)
+                    if obj is not None and obj.get("type") == "archivedPeriod" and obj.get("start"):
+                        headers[obj["start"]] = obj
+        except OSError:
+            return {}
+        with self.lock:
+            self._headers = headers
+            self._starts = sorted(headers)
+            self._indexStat = stamp
+            # segments may have been rewritten by another process
+            self.periods.clear()
+        return headers
+
+    def headers(self):
+        """Headers of every archived period, newest first"""
+        return [self._headersByStart()[k] for k in sorted(self._headersByStart(), reverse=True)]
+
+    def isEmpty(self):
+        return not self._headersByStart()
+
+    def periodKey(self, dateKey):
+        """ISO start of the pay period `dateKey` would be archived under, or None for a malformed date"""
+        return self.calendar.keyOf(dateKey)
+
+    def _headerFor(self, dateKey, covering=False):
+        """
+        Header of the archived period holding `dateKey`, or None. With
+        `covering` the day only has to fall in the period's range, not be saved in it.
+        """
+        headers = self._headersByStart()
+        try:
+            earliest = (date.fromisoformat(dateKey) - timedelta(days=MAX_PERIOD_DAYS)).isoformat()
+        except (TypeError, ValueError):
+            return None
+        with self.lock:
+            starts = self._starts
+        # usually the nearest start; segments cut under an earlier schedule may overlap it
+        for i in range(bisect_right(starts, dateKey) - 1, -1, -1):
+            if starts[i] < earliest:
+                break
+            header = headers.get(starts[i])
+            if header is None:
+                continue
+            if covering and header["start"] <= dateKey <= header.get("end", ""):
+                return header
+            if dateKey in header.get("days", []):
+                return header
+        return None
+
+    def periodCovering(self, dateKey):
+        """Start key of the archived period whose range holds `dateKey`, or None"""
+        header = self._headerFor(dateKey, covering=True)
+        return header["start"] if header is not None else None
+
+    def readPeriod(self, startKey):
+        """The history records of one archived period (decompressed on first use)"""
+        with self.lock:
+            if startKey in self.periods:
+                self.periods.move_to_end(startKey)
+                return self.periods[startKey]
+        header = self._headersByStart().get(startKey)
+        if header is None:
+            return []
+        records = self._readSegment(header["file"])
+        with self.lock:
+            self.periods[startKey] = records
+            while len(self.periods) > PERIOD_CACHE_SIZE:
+                self.periods.popitem(last=False)
+        return records
+
+    def _readSegment(self, fileName):
+        records = []
+        try:
+            with _opener(fileName)(os.path.join(self.dir, fileName), "rb") as f:
+                data = f.read()
+        except (OSError, EOFError, lzma.LZMAError):
+            return records
+        for raw in data.split(b"\n"):
+            line = raw.strip()
+            if not line or checkLine(line, 0, len(line)) is False:
+                continue
+            obj = decodeLine(line)
+            if obj is not None and obj.get("type") == "history" and obj.get("date"):
+                records.append(obj)
+        return records
+
+    def loadDay(self, dateKey):
+        """One archived day's history record, or None"""
+        header = self._headerFor(dateKey)
+        if header is None:
+            return None
+        for obj in self.readPeriod(header["start"]):
+            if obj.get("date") == dateKey:
+                return obj
+        return None
+
+    def iterRecords(self):
+        for startKey in sorted(self._headersByStart()):
+            yield from self.readPeriod(startKey)
+
+    def writePeriods(self, recordsByPeriod):
+        """
+        Add {periodStart: [history records]} to the archive. A period that is
+        already archived is merged, with the new records winning per date.
+        """
+        headers = dict(self._headersByStart())
+        os.makedirs(self.dir, exist_ok=True)
+        ext, opener = COMPRESSIONS[self.compression]
+        for startKey, records in sorted(recordsByPeriod.items()):
+            old = headers.get(startKey)
+            if old is not None:
+                records = self.readPeriod(startKey) + list(records)
+            records, _ = dedupeHistory([withSummaryNumbers(obj) for obj in records])
+            records.sort(key=lambda obj: obj.get("date"))
+            fileName = f"{SEGMENT_PREFIX}{startKey}{ext}"
+            header = periodHeader(startKey, records, fileName, self.calendar)
+            self._writeFile(os.path.join(self.dir, fileName), [header] + records, opener)
+            if old is not None and old.get("file") != fileName:
+                self._remove(old["file"])
+            headers[startKey] = header
+            with self.lock:
+                self.periods.pop(startKey, None)
+        self._writeIndex(headers)
+
+    def removePeriods(self, startKeys):
+        """Drop periods from the archive (after their records were written back to tasks.jsonl)"""
+        headers = dict(self._headersByStart())
+        removed = [headers.pop(k) for k in startKeys if k in headers]
+        if not removed:
+            return
+        self._writeIndex(headers)
+        for header in removed:
+            self._remove(header["file"])
+        with self.lock:
+            for k in startKeys:
+                self.periods.pop(k, None)
+
+    def _remove(self, fileName):
+        try:
+            os.remove(os.path.join(self.dir, fileName))
+        except OSError:
+            pass
+
+    def _writeIndex(self, headers):
+        self._writeFile(self.indexPath, [headers[k] for k in sorted(headers)], open)
+
+    def _writeFile(self, path, records, opener):
+        tmp = tempfile.NamedTemporaryFile(delete=False, dir=self.dir, suffix=".tmp")
+        tmp.close()
+        try:
+            with opener(tmp.name, "wb") as f:
+                for obj in records:
+                    f.write(dumpRecord(obj).encode("utf-8"))
+            if self.durability is not None:
+                # compressed streams can't be fsynced through; sync the finished file
+                with open(tmp.name, "rb+") as f:
+                    self.durability.sync(f)
+            os.replace(tmp.name, path)
+        except Exception:
+            if os.path.exists(tmp.name):
+                os.remove(tmp.name)
+            raise
+        if self.durability is not None:
+            self.durability.committed(path)
+
+
+def formatHeaders(headers):
+    if not headers:
+        return "No archived pay periods."
+    days = sum(len(h.get("days", [])) for h in headers)
+    lines = [f"{len(headers)} archived pay periods, {days} days"]
+    for h in headers:
+        lines.append(f"  {h['start']} – {h['end']}: {len(h.get('days', []))} days, {h.get('total', 0):.1f} h")
+    return "\n".join(lines)
+
+
+def main(argv):
+    if len(argv) > 1:
+        dataDir = argv[1]
+    else:
+        appData = os.environ.get("LOCALAPPDATA") or os.environ.get("APPDATA") or os.path.expanduser("~")
+        dataDir = os.path.join(appData, "Task Tracker")
+    from settings import loadSettings
+    from storage import openStorage
+    store = openStorage(dataDir, loadSettings(os.path.join(dataDir, "settings.json")))
+    if getattr(store, "archive", None) is None:
+        print("Archiving is only available with the jsonl storage backend.")
+        return 2
+    days = store.archiveClosedPeriods(store.archiveKeepPeriods or DEFAULT_KEEP_PERIODS)
+    store.waitForBackgroundWork()
+    print(f"Archived {days} days.")
+    print(formatHeaders(store.archivedPeriods()))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
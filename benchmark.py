@@ -0,0 +1,510 @@
+"""
+Storage benchmarks against a synthetic multi-year tasks.jsonl.
+
+    python benchmark.py [name ...] [--years N] [--dir PATH]
+
+With no names every benchmark runs. Synthetic data is written to a temporary
+directory (or --dir) and removed afterwards.
+"""
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from durability import DURABILITY_MODES, Durability
+from jsonlReader import CHECKSUM_KEY, iterRecords
+from storage import JsonlStorage, dumpRecord
+
+TASK_NAMES = ["Coding", "Meetings", "Review", "Support", "Design", "Admin", "Research", "Testing"]
+
+
+def writeSyntheticFile(path, years=10, segmentsPerDay=24, seed=1):
+    """tasks.jsonl with `years` of weekday history, a few groups and charge-code chunks"""
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for name in TASK_NAMES:
+            f.write(dumpRecord({"type": "task", "name": name}))
+        for name in TASK_NAMES[:4]:
+            f.write(dumpRecord({"type": "group", "task": name, "group": "Project"}))
+        for i in range(3):
+            codes = [{"chargeCodeId": i * 4 + j, "chargeCodeName": f"CC{i * 4 + j}", "type": None,
+                      "hierarchicalName": None, "leave": False} for j in range(4)]
+            f.write(dumpRecord({"type": "chargeCode", "groupKey": f"G{i}", "chunkIndex": i, "chargeCodes": codes}))
+
+        day = date.today() - timedelta(days=365 * years)
+        while day < date.today():
+            if day.weekday() < 5:
+                dayKey = day.isoformat()
+                secs = 8 * 3600
+                secondsByTask = {}
+                timeline = []
+                for _ in range(segmentsPerDay):
+                    task = rng.choice(TASK_NAMES)
+                    length = rng.randint(5, 30) * 60
+                    timeline.append({
+                        "task": task,
+                        "start": f"{dayKey}T{secs // 3600:02d}:{secs % 3600 // 60:02d}:00",
+                        "end": f"{dayKey}T{(secs + length) // 3600:02d}:{(secs + length) % 3600 // 60:02d}:00",
+                    })
+                    secondsByTask[task] = secondsByTask.get(task, 0) + length
+                    secs += length
+                hoursByTask = {t: round(s / 3600.0, 1) for t, s in secondsByTask.items()}
+                summary = "\n".join(f"{t}: {h:.1f} h" for t, h in sorted(hoursByTask.items()))
+                f.write(dumpRecord({
+                    "type": "history", "date": dayKey,
+                    "summary": summary + f"\nTotal: {sum(hoursByTask.values()):.1f} h",
+                    "hoursByTask": hoursByTask, "secondsByTask": secondsByTask, "timeline": timeline,
+                }))
+            day += timedelta(days=1)
+
+
+def timed(fn, repeat=3):
+    best = None
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def benchScan(workDir, years):
+    """Reading the charge-code records: text-mode decode of every line vs the mmap type filter"""
+    path = os.path.join(workDir, "tasks.jsonl")
+    writeSyntheticFile(path, years)
+
+    def textScan():
+        found = []
+        with open(path, "r", encoding="utf-8") as f:
+            for raw in f:
+                line = raw.strip()
+                if not line:
+                    continue
+                obj = json.loads(line)
+                obj.pop(CHECKSUM_KEY, None)
+                if obj.get("type") == "chargeCode":
+                    found.append(obj)
+        return found
+
+    def mmapScan():
+        return list(iterRecords(path, ("chargeCode",)))
+
+    before, a = timed(textScan)
+    after, b = timed(mmapScan)
+    assert a == b
+    size = os.path.getsize(path) / 1e6
+    print(f"scan    {size:.1f} MB: text {before * 1000:.1f} ms, mmap {after * 1000:.1f} ms ({before / after:.1f}x)")
+
+
+class _NoLock:
+    """Stand-in for FileLock to show what unsynchronized writers do"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def shared(self):
+        return self
+
+
+def _writerProcess(path, writerId, saves, locked):
+    store = JsonlStorage(path)
+    if not locked:
+        store.lock = _NoLock()
+    for i in range(saves):
+        dayKey = (date(2000, 1, 1) + timedelta(days=writerId * saves + i)).isoformat()
+        rec = {"type": "history", "date": dayKey, "summary": f"W{writerId}: 1.0 h\nTotal: 1.0 h", "timeline": []}
+        store.saveHistory(dayKey, rec, TASK_NAMES, {})
+        if locked and writerId == 0 and i % 5 == 0:
+            # a posting.py-style charge-code insert racing the history saves
+            store.insertChargeCodes([{"chargeCodeId": i * 4 + j, "chargeCodeName": f"CC{i}-{j}"} for j in range(4)])
+
+
+def _runWriters(path, writers, saves, locked):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for name in TASK_NAMES:
+            f.write(dumpRecord({"type": "task", "name": name}))
+    procs = [multiprocessing.Process(target=_writerProcess, args=(path, w, saves, locked)) for w in range(writers)]
+    t0 = time.perf_counter()
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - t0
+    days = {obj.get("date") for obj in iterRecords(path, ("history",))}
+    chunks = sum(1 for _ in iterRecords(path, ("chargeCode",)))
+    return writers * saves - len(days), chunks, elapsed
+
+
+def benchWriters(workDir, years, writers=6, saves=25):
+    """N processes rewriting tasks.jsonl at once: every saved day must survive"""
+    path = os.path.join(workDir, "tasks.jsonl")
+    lost, chunks, elapsed = _runWriters(path, writers, saves, locked=True)
+    print(f"writers {writers}x{saves} saves, locked:   lost {lost} days, {chunks} charge-code chunks kept ({elapsed:.2f} s)")
+    lost, _, elapsed = _runWriters(path, writers, saves, locked=False)
+    print(f"writers {writers}x{saves} saves, unlocked: lost {lost} days ({elapsed:.2f} s)")
+
+
+def benchIntegrity(workDir, years):
+    """Checksum verification of every line (integrity.py) and the load scan that also verifies them"""
+    from integrity import scanIntegrity
+    path = os.path.join(workDir, "tasks.jsonl")
+    writeSyntheticFile(path, years)
+    verify, report = timed(lambda: scanIntegrity(path))
+    assert not report["bad"] and report["verified"] == report["lines"]
+    load, _ = timed(lambda: JsonlStorage(path).load())
+    size = os.path.getsize(path) / 1e6
+    print(f"integrity {size:.1f} MB, {report['lines']} records: verify {verify * 1000:.1f} ms, "
+          f"load with verification {load * 1000:.1f} ms")
+
+
+def _nameStrings(histories):
+    """Distinct task-name string objects held by the heads' number dicts, and their size"""
+    seen = {}
+    for entry in histories:
+        for field in ("hoursByTask", "secondsByTask"):
+            for name in entry.get(field, {}):
+                seen[id(name)] = name
+    return len(seen), sum(sys.getsizeof(name) for name in seen.values())
+
+
+def benchTaskNames(workDir, years):
+    """Task-name strings held by loaded history, and pay-period aggregation keyed by name vs by task id"""
+    from summaries import entryHours, entryHoursById
+    from taskDictionary import taskDictionary
+    path = os.path.join(workDir, "tasks.jsonl")
+    writeSyntheticFile(path, years)
+
+    plain = []
+    for obj in iterRecords(path, ("history",)):
+        obj.pop("timeline", None)
+        plain.append(obj)
+    _, _, history = JsonlStorage(path).load()
+    plainCount, plainBytes = _nameStrings(plain)
+    internedCount, internedBytes = _nameStrings(history.values())
+
+    days = sorted(history)
+    periods = [days[i:i + 10] for i in range(0, len(days), 10)]
+
+    def byName():
+        out = []
+        for p in periods:
+            agg = {}
+            for d in p:
+                for k, v in entryHours(history[d])[0].items():
+                    agg[k] = agg.get(k, 0.0) + v
+            out.append(agg)
+        return out
+
+    dayAgg = {d: entryHoursById(history[d])[0] for d in days}
+
+    def byId():
+        out = []
+        for p in periods:
+            agg = {}
+            for d in p:
+                for k, v in dayAgg[d].items():
+                    agg[k] = agg.get(k, 0.0) + v
+            out.append(taskDictionary.nameKeys(agg))
+        return out
+
+    before, a = timed(byName)
+    after, b = timed(byId)
+    assert a == b
+    print(f"tasknames {len(days)} days: {plainCount} name strings ({plainBytes / 1024:.0f} KB) -> "
+          f"{internedCount} interned ({internedBytes / 1024:.1f} KB); {len(periods)} period aggregates "
+          f"by name {before * 1000:.1f} ms, by id {after * 1000:.1f} ms ({before / after:.1f}x)")
+
+
+def benchArchive(workDir, years):
+    """Startup load with every period in tasks.jsonl vs closed periods archived, and opening one archived period"""
+    from archive import HistoryArchive
+    path = os.path.join(workDir, "tasks.jsonl")
+    writeSyntheticFile(path, years)
+    sizeBefore = os.path.getsize(path)
+    before, _ = timed(lambda: JsonlStorage(path).load())
+
+    archive = HistoryArchive.besideDataFile(path)
+    store = JsonlStorage(path, archive=archive, archiveKeepPeriods=2)
+    t0 = time.perf_counter()
+    store.load()
+    archiving = time.perf_counter() - t0
+    after, _ = timed(lambda: JsonlStorage(path, archive=archive, archiveKeepPeriods=2).load())
+    listing, headers = timed(lambda: HistoryArchive.besideDataFile(path).headers())
+
+    def openPeriod():
+        return HistoryArchive.besideDataFile(path).readPeriod(headers[len(headers) // 2]["start"])
+
+    opening, _ = timed(openPeriod)
+    archived = sum(os.path.getsize(os.path.join(archive.dir, n)) for n in os.listdir(archive.dir))
+    print(f"archive {sizeBefore / 1e6:.1f} MB -> {os.path.getsize(path) / 1e3:.1f} KB active + "
+          f"{archived / 1e6:.2f} MB compressed ({len(headers)} periods, archived once in {archiving:.2f} s): "
+          f"load {before * 1000:.1f} ms -> {after * 1000:.1f} ms, list headers {listing * 1000:.1f} ms, "
+          f"open a period {opening * 1000:.1f} ms")
+
+
+def benchChargeCodes(workDir, years, chunks=20):
+    """Opening and saving the Settings charge-code table: per-chunk file scans vs the charge-code store"""
+    from chargeCodeStore import ChargeCodeStore
+    path = os.path.join(workDir, "tasks.jsonl")
+    writeSyntheticFile(path, years)
+    inFile = JsonlStorage(path)
+    inFile.insertChargeCodes([{"chargeCodeId": 100 + i, "chargeCodeName": f"X{i}"} for i in range(chunks * 4)])
+    keys = {i: f"G{i % 3}" for i in range(chunks)}
+
+    def openBefore():
+        codes = inFile.loadChargeCodeChunks()
+        return [(c, inFile.readChunkGroupKey(i)) for i, c in enumerate(codes)]
+
+    openOld, _ = timed(openBefore)
+    saveOld, _ = timed(lambda: inFile.updateChargeCodeGroupKeys(keys))
+
+    store = JsonlStorage(path, chargeCodes=ChargeCodeStore.besideDataFile(path))
+    store.load()
+    openNew, table = timed(store.loadChargeCodeTable)
+    rounds = iter(range(10))
+
+    def saveAfter():
+        # a different mapping every round so each save really writes
+        n = next(rounds)
+        store.updateChargeCodeGroupKeys({i: f"{k}-{n}" for i, k in keys.items()})
+
+    saveNew, _ = timed(saveAfter)
+    print(f"chargecodes {len(table)} chunks, {os.path.getsize(path) / 1e6:.1f} MB history: "
+          f"open {openOld * 1000:.1f} ms -> {openNew * 1000:.2f} ms, save {saveOld * 1000:.1f} ms -> {saveNew * 1000:.2f} ms")
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def benchDurability(workDir, years, saves=20):
+    """Save latency under each durability mode: task reorders (full rewrite) and journaled day saves (append)"""
+    for mode in DURABILITY_MODES:
+        path = os.path.join(workDir, f"tasks-{mode}.jsonl")
+        writeSyntheticFile(path, years)
+        durability = Durability(mode)
+        store = JsonlStorage(path, journal=True, compactThreshold=10 ** 9, durability=durability)
+        store.load()
+        rewrites = []
+        appends = []
+        for i in range(saves):
+            tasks = TASK_NAMES[i % len(TASK_NAMES):] + TASK_NAMES[:i % len(TASK_NAMES)]
+            t0 = time.perf_counter()
+            store.saveTasksAndGroups(tasks, {})
+            rewrites.append(time.perf_counter() - t0)
+
+            dayKey = (date.today() + timedelta(days=i)).isoformat()
+            rec = {"type": "history", "date": dayKey, "summary": "Coding: 1.0 h\nTotal: 1.0 h", "timeline": []}
+            t0 = time.perf_counter()
+            store.saveHistory(dayKey, rec, tasks, {})
+            appends.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        store.waitForBackgroundWork()
+        shutdown = time.perf_counter() - t0
+        print(f"durability {mode:<7} rewrite median {_percentile(rewrites, 50) * 1000:6.1f} ms, "
+              f"p95 {_percentile(rewrites, 95) * 1000:6.1f} ms | append median {_percentile(appends, 50) * 1000:5.2f} ms, "
+              f"p95 {_percentile(appends, 95) * 1000:5.2f} ms | {durability.fileSyncs} file / {durability.dirSyncs} dir "
+              f"fsyncs, shutdown flush {shutdown * 1000:.1f} ms")
+
+
+def benchPeriodTotals(workDir, years):
+    """Opening History and saving one day: summing every day of every period vs the maintained totals"""
+    from payPeriods import PayPeriodCalendar
+    from periodAggregates import PeriodAggregates
+    from summaries import entryHoursById, makeSummary
+    from taskDictionary import taskDictionary
+    path = os.path.join(workDir, "tasks.jsonl")
+    writeSyntheticFile(path, years)
+    store = JsonlStorage(path)
+    _, _, history = store.load()
+    days = sorted(history)
+    periodStartKey = PayPeriodCalendar().keyOf
+
+    def sumAll():
+        out = {}
+        for d in days:
+            p = out.setdefault(periodStartKey(d), [{}, 0.0])
+            dayAgg, dayTotal = entryHoursById(history[d])
+            for k, v in dayAgg.items():
+                p[0][k] = p[0].get(k, 0.0) + v
+            p[1] += dayTotal
+        return {k: (taskDictionary.nameKeys(agg), total) for k, (agg, total) in out.items()}
+
+    totals = PeriodAggregates.besideDataFile(path)
+    totals.load(store.historyVersion(), history)
+    opening, _ = timed(lambda: PeriodAggregates.besideDataFile(path).load(store.historyVersion(), history))
+    rebuild, _ = timed(sumAll)
+
+    day = days[len(days) // 2]
+    edited = makeSummary({"Coding": 6.0, "Review": 2.0}, 8.0, {"Coding": 21600, "Review": 7200})
+
+    def saveIncremental():
+        totals.replaceDay(day, history[day], edited)
+        totals.replaceDay(day, edited, history[day])
+        return totals.period(periodStartKey(day))
+
+    saving, _ = timed(saveIncremental)
+    expected = sumAll()
+    for p in totals.periodList():
+        agg, total = expected[p["start"].isoformat()]
+        assert abs(p["total"] - total) < 1e-6 and set(p["agg"]) == set(agg)
+    print(f"periodtotals {len(days)} days, {len(expected)} periods: open History {rebuild * 1000:.1f} ms summing "
+          f"every day -> {opening * 1000:.1f} ms from periodTotals.json; after a save {rebuild * 1000:.1f} ms -> "
+          f"{saving / 2 * 1000:.3f} ms")
+
+
+def benchPayPeriods(workDir, years):
+    """Mapping every day of `years` to its pay period: the old anchor arithmetic vs each calendar schedule"""
+    from datetime import date, timedelta
+    from payPeriods import SCHEDULES, PayPeriodCalendar
+    first = date.today() - timedelta(days=365 * years)
+    dates = [(first + timedelta(days=i)).isoformat() for i in range(365 * years)]
+    anchor = date(2025, 11, 29)
+
+    def anchorArithmetic():
+        ppMap = {}
+        for dStr in dates:
+            d = date.fromisoformat(dStr)
+            start = anchor + timedelta(days=(d - anchor).days // 14 * 14)
+            ppMap.setdefault((start, start + timedelta(days=13)), []).append(dStr)
+        return ppMap
+
+    before, ppMap = timed(anchorArithmetic)
+    parts = [f"payperiods {len(dates)} days: anchor arithmetic {before * 1000:.1f} ms ({len(ppMap)} periods)"]
+    for schedule in SCHEDULES:
+        calendar = PayPeriodCalendar(schedule)
+        mapping, keys = timed(lambda: [calendar.keyOf(d) for d in dates])
+        walking, periods = timed(lambda: list(calendar.periodsBetween(dates[0], dates[-1])))
+        assert len(set(keys)) == len(periods)
+        parts.append(f"{schedule} {mapping * 1000:.1f} ms + walk {len(periods)} periods {walking * 1000:.2f} ms")
+    print("; ".join(parts))
+
+
+def benchRangeIndex(workDir, years, queries=200):
+    """Hours on one task between two dates: looping over history vs the Fenwick-tree index"""
+    import random
+    from rangeIndex import HoursIndex
+    from summaries import entryHours, makeSummary
+    path = os.path.join(workDir, "tasks.jsonl")
+    writeSyntheticFile(path, years)
+    _, groups, history = JsonlStorage(path).load()
+    days = sorted(history)
+    tasks = sorted({task for d in days for task in entryHours(history[d])[0]})
+    rnd = random.Random(1)
+    ranges = [tuple(sorted(rnd.sample(days, 2))) + (rnd.choice(tasks),) for _ in range(queries)]
+
+    def loop():
+        out = []
+        for first, last, task in ranges:
+            out.append(sum(entryHours(history[d])[0].get(task, 0.0) for d in days if first <= d <= last))
+        return out
+
+    index = HoursIndex(lambda: history, lambda: groups)
+    t0 = time.perf_counter()
+    index.totalHours(days[0], days[0])
+    building = time.perf_counter() - t0
+    before, expected = timed(loop, repeat=1)
+    after, got = timed(lambda: [index.taskHours(task, first, last) for first, last, task in ranges])
+    assert all(abs(a - b) < 1e-6 for a, b in zip(expected, got))
+
+    day = days[len(days) // 2]
+    edited = makeSummary({"Coding": 6.0, "Review": 2.0}, 8.0, {"Coding": 21600, "Review": 7200})
+
+    def save():
+        index.replaceDay(day, history[day], edited)
+        index.replaceDay(day, edited, history[day])
+
+    updating, _ = timed(save)
+    print(f"rangeindex {len(days)} days, {len(tasks)} tasks: {queries} task range queries "
+          f"{before * 1000:.0f} ms looping -> {after * 1000:.2f} ms indexed (built once in {building * 1000:.0f} ms), "
+          f"day save {updating / 2 * 1000:.3f} ms")
+
+
+def benchAnalytics(workDir, years):
+    """Task, weekday and month totals over all of history: per-day dict loops vs the columnar matrix"""
+    from datetime import date
+    from analytics import HistoryMatrix, summarize, np
+    from summaries import entryHours
+    path = os.path.join(workDir, "tasks.jsonl")
+    writeSyntheticFile(path, years)
+    _, groups, history = JsonlStorage(path).load()
+
+    def loop():
+        byTask = {}
+        byWeekday = [0.0] * 7
+        byMonth = {}
+        for dateKey, entry in history.items():
+            hoursByTask, total = entryHours(entry)
+            for task, hours in hoursByTask.items():
+                byTask[task] = byTask.get(task, 0.0) + hours
+            byWeekday[date.fromisoformat(dateKey).weekday()] += total
+            byMonth[dateKey[:7]] = byMonth.get(dateKey[:7], 0.0) + total
+        return byTask, byWeekday, byMonth
+
+    before, (byTask, byWeekday, byMonth) = timed(loop, repeat=1)
+    backends = [False] + ([True] if np is not None else [])
+    results = []
+    for useNumpy in backends:
+        building, matrix = timed(lambda: HistoryMatrix.fromHistory(history, useNumpy=useNumpy), repeat=1)
+        reducing, report = timed(lambda: summarize(matrix, groups))
+        assert all(abs(report["tasks"][t]["hours"] - h) < 1e-6 for t, h in byTask.items())
+        assert all(abs(w["hours"] - h) < 1e-6 for w, h in zip(report["weekdays"], byWeekday))
+        assert all(abs(report["months"][m] - h) < 1e-6 for m, h in byMonth.items())
+        results.append(f"{matrix.backend} {reducing * 1000:.1f} ms (+{building * 1000:.0f} ms to build the matrix once)")
+    print(f"analytics {len(history)} days, {len(byTask)} tasks: totals/averages/trends "
+          f"{before * 1000:.0f} ms looping -> " + ", ".join(results))
+
+
+BENCHMARKS = {
+    "scan": benchScan,
+    "writers": benchWriters,
+    "durability": benchDurability,
+    "integrity": benchIntegrity,
+    "tasknames": benchTaskNames,
+    "archive": benchArchive,
+    "chargecodes": benchChargeCodes,
+    "periodtotals": benchPeriodTotals,
+    "payperiods": benchPayPeriods,
+    "rangeindex": benchRangeIndex,
+    "analytics": benchAnalytics,
+}
+
+
+def main(argv):
+    names = []
+    years = 10
+    workDir = None
+    args = list(argv[1:])
+    while args:
+        arg = args.pop(0)
+        if arg == "--years" and args:
+            years = int(args.pop(0))
+        elif arg == "--dir" and args:
+            workDir = args.pop(0)
+        elif arg in BENCHMARKS:
+            names.append(arg)
+        else:
+            print(f"usage: benchmark.py [{'|'.join(BENCHMARKS)} ...] [--years N] [--dir PATH]")
+            return 2
+
+    for name in names or list(BENCHMARKS):
+        benchDir = tempfile.mkdtemp(prefix=f"bench-{name}-", dir=workDir)
+        try:
+            BENCHMARKS[name](benchDir, years)
+        finally:
+            shutil.rmtree(benchDir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
@@ -0,0 +1,204 @@
+"""
+Charge codes in their own small file beside the data file (chargeCodes.jsonl),
+one {"type": "chargeCode", "groupKey", "chunkIndex", "chargeCodes"} record per
+chunk of four, so reading or remapping them never touches history.
+
+The file is read in one pass into an in-memory index (chunks in order, by
+signature and by group key) and re-read only when another process changed
+it. Pulled chunks are appended; remapping group keys rewrites this file only.
+Charge-code lines found in tasks.jsonl (files from older versions, exports)
+are merged in by the JSONL backend and dropped from tasks.jsonl.
+"""
+import os
+import tempfile
+import threading
+
+from fileLock import fileVersion, lockFor
+from jsonlReader import checkLine, decodeLine, iterRecords
+from storage import appendRecords, chargeCodeChunks, chunkSignature, dumpRecord, isAllNullIds
+
+CHARGE_CODE_FILE = "chargeCodes.jsonl"
+
+
+def _usableCodes(codes):
+    return isinstance(codes, list) and codes and not isAllNullIds(chunkSignature(codes))
+
+
+class ChargeCodeStore:
+    def __init__(self, path, durability=None):
+        self.path = path
+        self.durability = durability
+        # shared with other processes (posting.py) writing the same file
+        self.lock = lockFor(path)
+        self.memLock = threading.Lock()
+        # file version the index below was read from
+        self.version = None
+        self.chunks = []
+        self.bySignature = {}
+
+    @classmethod
+    def besideDataFile(cls, dataPath, **kwargs):
+        return cls(os.path.join(os.path.dirname(dataPath) or ".", CHARGE_CODE_FILE), **kwargs)
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def _index(self):
+        """The chunk records, re-read only if the file changed since the last read"""
+        current = fileVersion(self.path)
+        with self.memLock:
+            if current == self.version:
+                return self.chunks
+        chunks = []
+        if current is not None:
+            with self.lock.shared():
+                current = fileVersion(self.path)
+                try:
+                    with open(self.path, "rb") as f:
+                        for raw in f:
+                            line = raw.strip()
+                            if not line or checkLine(line, 0, len(line)) is False:
+                                continue
+                            obj = decodeLine(line)
+                            if obj is not None and obj.get("type") == "chargeCode" and obj.get("chargeCodes"):
+                                chunks.append(obj)
+                except OSError:
+                    chunks = []
+        self._setIndex(chunks, current)
+        return chunks
+
+    def _setIndex(self, chunks, version):
+        with self.memLock:
+            self.chunks = chunks
+            self.bySignature = {chunkSignature(obj["chargeCodes"]): obj for obj in chunks}
+            self.version = version
+
+    def records(self):
+        return [dict(obj) for obj in self._index()]
+
+    def chunkCodes(self):
+        """The charge codes of every chunk, in order"""
+        return [obj["chargeCodes"] for obj in self._index()]
+
+    def table(self):
+        """[(chargeCodes, groupKey)] by chunk ordinal, as the Settings table shows them"""
+        return [(obj["chargeCodes"], (obj.get("groupKey") or "").strip()) for obj in self._index()]
+
+    def byGroupKey(self):
+        byKey = {}
+        for obj in self._index():
+            groupKey = (obj.get("groupKey") or "").strip()
+            if groupKey:
+                byKey[groupKey] = obj["chargeCodes"]
+        return byKey
+
+    def groupKey(self, ordinal):
+        chunks = self._index()
+        if 0 <= ordinal < len(chunks):
+            return (chunks[ordinal].get("groupKey") or "").strip()
+        return ""
+
+    def setGroupKeys(self, groupKeys):
+        """Set groupKey by chunk ordinal; rewrites this file only, and only if a key changed"""
+        with self.lock:
+            chunks = [dict(obj) for obj in self._index()]
+            changed = False
+            for i, obj in enumerate(chunks):
+                key = groupKeys.get(i, "")
+                if (obj.get("groupKey") or "") != key:
+                    obj["groupKey"] = key
+                    changed = True
+            if changed:
+                self._write(chunks)
+
+    def insert(self, chargeCodeIdModels):
+        """Append the chunks of `chargeCodeIdModels` that aren't stored yet; returns how many were added"""
+        with self.lock:
+            chunks = self._index()
+            seen = set(self.bySignature)
+            nextIndex = max((obj.get("chunkIndex") or 0 for obj in chunks), default=-1) + 1
+            added = []
+            for codes in chargeCodeChunks(chargeCodeIdModels):
+                sig = chunkSignature(codes)
+                if isAllNullIds(sig) or sig in seen:
+                    continue
+                seen.add(sig)
+                added.append({"type": "chargeCode", "groupKey": "", "chunkIndex": nextIndex, "chargeCodes": codes})
+                nextIndex += 1
+            if added:
+                appendRecords(self.path, added, self.durability)
+                self._setIndex(chunks + added, fileVersion(self.path))
+            return len(added)
+
+    def merge(self, records):
+        """
+        Add chargeCode records from elsewhere (tasks.jsonl): new chunks are
+        appended in order; a chunk already stored only takes the incoming
+        groupKey if it has none. Returns how many records changed the store.
+        """
+        with self.lock:
+            chunks = [dict(obj) for obj in self._index()]
+            bySignature = {chunkSignature(obj["chargeCodes"]): obj for obj in chunks}
+            nextIndex = max((obj.get("chunkIndex") or 0 for obj in chunks), default=-1) + 1
+            changed = 0
+            for rec in records:
+                codes = rec.get("chargeCodes")
+                if not _usableCodes(codes):
+                    continue
+                sig = chunkSignature(codes)
+                existing = bySignature.get(sig)
+                if existing is not None:
+                    if not existing.get("groupKey") and rec.get("groupKey"):
+                        existing["groupKey"] = rec["groupKey"]
+                        changed += 1
+                    continue
+                obj = {"type": "chargeCode", "groupKey": rec.get("groupKey") or "", "chunkIndex": nextIndex,
+                       "chargeCodes": codes}
+                bySignature[sig] = obj
+                chunks.append(obj)
+                nextIndex += 1
+                changed += 1
+            if changed or not self.exists():
+                self._write(chunks)
+            return changed
+
+    def vacuum(self):
+        """Vacuum this file like tasks.jsonl (vacuum.vacuumFile); returns its report, or None"""
+        from vacuum import vacuumFile
+        with self.lock:
+            report = vacuumFile(self.path, self.lock, self.durability)
+            with self.memLock:
+                # chunkIndex is renumbered; re-read on next use
+                self.version = None
+        return report
+
+    def _write(self, chunks):
+        dirpath = os.path.dirname(self.path) or "."
+        tmp = tempfile.NamedTemporaryFile(mode="w", encoding="utf-8", newline="", delete=False, dir=dirpath)
+        try:
+            for obj in chunks:
+                tmp.write(dumpRecord(obj))
+            if self.durability is not None:
+                self.durability.sync(tmp)
+            tmp.close()
+            os.replace(tmp.name, self.path)
+        except Exception:
+            tmp.close()
+            if os.path.exists(tmp.name):
+                os.remove(tmp.name)
+            raise
+        if self.durability is not None:
+            self.durability.committed(self.path)
+        self._setIndex(chunks, fileVersion(self.path))
+
+
+def chargeCodeRecordsFor(jsonlPath):
+    """Charge-code records of a tasks.jsonl plus its chargeCodes.jsonl, for converting to other backends"""
+    records = list(iterRecords(jsonlPath, ("chargeCode",))) if os.path.exists(jsonlPath) else []
+    seen = {chunkSignature(obj.get("chargeCodes") or []) for obj in records}
+    store = ChargeCodeStore.besideDataFile(jsonlPath)
+    if store.exists():
+        for obj in store.records():
+            if chunkSignature(obj["chargeCodes"]) not in seen:
+                records.append(obj)
+    return records
@@ -0,0 +1,155 @@
+import json
+import os
+import threading
+
+from jsonlReader import CHECKSUM_KEY, checkLine, peekType
+from summaries import summaryHead
+
+
+class ParsedDocument:
+    """
+    One parse of tasks.jsonl. `records` holds every JSON object line in file
+    order; task/group/history views are built once from them. Everything here
+    is shared between callers, so treat it as read-only.
+    """
+
+    def __init__(self, records, badLines, isJsonl, legacy=None, legacyError=None):
+        self.records = records
+        self.badLines = badLines
+        self.isJsonl = isJsonl
+        self.legacy = legacy
+        self.legacyError = legacyError
+        self._views = None
+
+    def views(self):
+        """Return (taskNames, groups, history, deadRecords) for the document"""
+        if self._views is not None:
+            return self._views
+        if not self.isJsonl:
+            if self.legacyError is not None:
+                raise self.legacyError
+            data = self.legacy if isinstance(self.legacy, dict) else {}
+            self._views = (
+                data.get("tasks", []) or [],
+                data.get("groups", {}) or {},
+                data.get("history", {}) or {},
+                0,
+            )
+            return self._views
+
+        tasks_list = []
+        groups = {}
+        history = {}
+        deadRecords = 0
+        for obj in self.records:
+            t = obj.get("type")
+            if t == "task":
+                name = obj.get("name")
+                if name:
+                    tasks_list.append(name)
+            elif t == "group":
+                task = obj.get("task")
+                if task:
+                    groups[task] = obj.get("group")
+            elif t == "history":
+                d = obj.get("date")
+                if not d:
+                    continue
+                if d in history:
+                    # journaled files keep superseded records until compaction
+                    deadRecords += 1
+                entry = summaryHead(obj)
+                entry["timeline"] = obj.get("timeline", []) or []
+                history[d] = entry
+        self._views = (tasks_list, groups, history, deadRecords)
+        return self._views
+
+
+def parseDocument(data):
+    records = []
+    badLines = []
+    isJsonl = True
+    # split the bytes: a record may contain U+2028 and friends, which str.splitlines() breaks on
+    for raw in data.splitlines():
+        line = raw.strip()
+        if not line:
+            continue
+        if line.startswith(b"//"):
+            badLines.append(line.decode("utf-8", errors="replace"))
+            continue
+        if checkLine(line, 0, len(line)) is False:
+            # corrupted record: carried along verbatim, never trusted as data
+            badLines.append(line.decode("utf-8", errors="replace"))
+            continue
+        try:
+            obj = json.loads(line)
+        except Exception:
+            if not records and peekType(line, 0, len(line)) is None:
+                # not JSONL -> may be the legacy single-document format
+                isJsonl = False
+            badLines.append(line.decode("utf-8", errors="replace"))
+            continue
+        if isinstance(obj, dict):
+            obj.pop(CHECKSUM_KEY, None)
+            records.append(obj)
+        else:
+            badLines.append(line.decode("utf-8", errors="replace"))
+
+    legacy = None
+    legacyError = None
+    if not isJsonl:
+        try:
+            legacy = json.loads(data.decode("utf-8"))
+        except Exception as e:
+            legacyError = e
+    return ParsedDocument(records, badLines, isJsonl, legacy, legacyError)
+
+
+class DocumentCache:
+    """
+    Parsed tasks.jsonl documents keyed on (path, inode, mtime_ns, size). A lookup
+    whose stat() still matches costs no I/O beyond the stat.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path):
+        """Return the ParsedDocument for `path`, or None if the file does not exist"""
+        key = os.path.abspath(path)
+        with self.lock:
+            try:
+                st = os.stat(key)
+            except OSError:
+                self.entries.pop(key, None)
+                return None
+            cached = self.entries.get(key)
+            if cached is not None and cached[0] == (st.st_ino, st.st_mtime_ns, st.st_size):
+                self.hits += 1
+                return cached[1]
+
+            self.misses += 1
+            with open(key, "rb") as f:
+                st = os.fstat(f.fileno())
+                # journal appends may land while we read; parse exactly what was stat'ed
+                data = f.read(st.st_size)
+            doc = parseDocument(data)
+            self.entries[key] = ((st.st_ino, st.st_mtime_ns, st.st_size), doc)
+            return doc
+
+    def invalidate(self, path=None):
+        with self.lock:
+            if path is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(os.path.abspath(path), None)
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries)}
+
+
+documentCache = DocumentCache()
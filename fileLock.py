@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+LOCK_SUFFIX = ".lock"
+WINDOWS_RETRY_SECONDS = 0.05
+
+
+class FileLock:
+    """
+    Advisory reader/writer lock for one data file, held on a <path>.lock
+    sidecar (the data file itself is replaced on every rewrite, so it can't
+    carry the lock). Threads of this process are serialized by an RLock; other
+    processes (a second app instance, `posting.py`, the sqlite/sharded CLIs)
+    by flock() on POSIX or msvcrt.locking() on Windows, which has no shared
+    mode so readers lock exclusively there.
+
+    `with lock:` takes it exclusively, `with lock.shared():` for reading.
+    Nested acquisitions by the holding thread are free. Asking for exclusive
+    while holding shared raises RuntimeError: a writer takes the lock
+    exclusively up front.
+    If the lock file can't be opened the lock only covers this process.
+    """
+
+    def __init__(self, lockPath):
+        self.lockPath = lockPath
+        self.rlock = threading.RLock()
+        self.fh = None
+        self.depth = 0
+        self.exclusive = False
+        self.waits = 0
+
+    def _open(self):
+        if self.fh is None:
+            try:
+                self.fh = open(self.lockPath, "a+b")
+            except OSError:
+                self.fh = None
+        return self.fh
+
+    def _lockFile(self, exclusive):
+        fh = self._open()
+        if fh is None:
+            return
+        if fcntl is not None:
+            op = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+            try:
+                fcntl.flock(fh.fileno(), op | fcntl.LOCK_NB)
+            except OSError:
+                self.waits += 1
+                fcntl.flock(fh.fileno(), op)
+        elif msvcrt is not None:
+            fh.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+                    return
+                except OSError:
+                    self.waits += 1
+                    time.sleep(WINDOWS_RETRY_SECONDS)
+
+    def _unlockFile(self):
+        fh = self.fh
+        if fh is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+        except OSError:
+            pass
+
+    def acquire(self, exclusive=True):
+        self.rlock.acquire()
+        try:
+            if self.depth == 0:
+                self._lockFile(exclusive)
+                self.exclusive = exclusive
+            elif exclusive and not self.exclusive:
+                # flock converts shared to exclusive by dropping and re-taking it, so another
+                # process can write in between, and two readers upgrading at once deadlock
+                raise RuntimeError(f"{self.lockPath} is held shared; take it exclusively before reading")
+        except Exception:
+            self.rlock.release()
+            raise
+        self.depth += 1
+
+    def release(self):
+        self.depth -= 1
+        if self.depth == 0:
+            self._unlockFile()
+            self.exclusive = False
+        self.rlock.release()
+
+    def __enter__(self):
+        self.acquire(True)
+        return self
+
+    def __exit__(self, excType, exc, tb):
+        self.release()
+        return False
+
+    @contextmanager
+    def shared(self):
+        self.acquire(False)
+        try:
+            yield self
+        finally:
+            self.release()
+
+
+_locks = {}
+_locksGuard = threading.Lock()
+
+
+def lockFor(path):
+    """The process-wide FileLock guarding `path` (one instance per file, so nesting works across objects)"""
+    key = os.path.abspath(path)
+    with _locksGuard:
+        lock = _locks.get(key)
+        if lock is None:
+            lock = _locks[key] = FileLock(key + LOCK_SUFFIX)
+        return lock
+
+
+def fileVersion(path):
+    """(inode, size, mtime_ns) of `path`, or None; every rewrite or append changes it"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
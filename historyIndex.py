@@ -0,0 +1,189 @@
+import json
+import os
+import tempfile
+
+from jsonlReader import CHECKSUM_KEY, checkLine, decodeLine, mappedFile, peekType
+
+
+def parseRecordHead(line):
+    """
+    Parse a JSONL record without its "timeline" array. Writers put "timeline"
+    last, so everything before it is a complete object once closed with "}".
+    Falls back to a full parse when the shortcut doesn't apply.
+    """
+    if isinstance(line, bytes):
+        cut = line.find(b',"timeline":')
+        head = line[:cut] + b"}" if cut != -1 else None
+    else:
+        cut = line.find(',"timeline":')
+        head = line[:cut] + "}" if cut != -1 else None
+    if head is not None:
+        try:
+            obj = json.loads(head)
+            if isinstance(obj, dict) and obj.get("date"):
+                obj.pop(CHECKSUM_KEY, None)
+                return obj
+        except Exception:
+            pass
+    obj = json.loads(line)
+    if isinstance(obj, dict):
+        obj.pop(CHECKSUM_KEY, None)
+    return obj
+
+
+class HistoryIndex:
+    """
+    Sidecar index for tasks.jsonl: date -> (byte offset, length) of the newest
+    history record for that date. The data file's size and mtime are stored
+    alongside so a stale index (file edited by hand, another process, ...) is
+    noticed and rebuilt with one scan. With persist=False the index only
+    lives in memory.
+    """
+
+    def __init__(self, dataPath, indexPath=None, persist=True):
+        self.dataPath = dataPath
+        self.indexPath = indexPath or dataPath + ".idx"
+        self.persist = persist
+        self.size = None
+        self.mtimeNs = None
+        self.days = {}
+        self.loaded = False
+
+    def _dataStat(self):
+        try:
+            st = os.stat(self.dataPath)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def isFresh(self):
+        stat = self._dataStat()
+        return stat is not None and stat == (self.size, self.mtimeNs)
+
+    def _loadSidecar(self):
+        self.loaded = True
+        if not self.persist:
+            return
+        try:
+            with open(self.indexPath, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.size = data.get("size")
+            self.mtimeNs = data.get("mtime_ns")
+            self.days = {d: (int(v[0]), int(v[1])) for d, v in (data.get("days") or {}).items()}
+        except Exception:
+            self.size = None
+            self.mtimeNs = None
+            self.days = {}
+
+    def save(self):
+        if not self.persist:
+            return
+        dirpath = os.path.dirname(self.indexPath) or "."
+        tmp = None
+        try:
+            tmp = tempfile.NamedTemporaryFile(mode="w", encoding="utf-8", delete=False, dir=dirpath)
+            json.dump(
+                {"size": self.size, "mtime_ns": self.mtimeNs, "days": {d: list(v) for d, v in self.days.items()}},
+                tmp, separators=(",", ":")
+            )
+            tmp.close()
+            os.replace(tmp.name, self.indexPath)
+        except Exception:
+            try:
+                if tmp is not None:
+                    tmp.close()
+                    if os.path.exists(tmp.name):
+                        os.remove(tmp.name)
+            except Exception:
+                pass
+
+    def rebuild(self):
+        """Scan the data file once and record where every history day lives"""
+        days = {}
+        try:
+            with mappedFile(self.dataPath) as (data, st):
+                pos = 0
+                end = st.st_size
+                while pos < end:
+                    nl = data.find(b"\n", pos)
+                    lineEnd = end if nl == -1 else nl + 1
+                    kind = peekType(data, pos, lineEnd)
+                    if kind == "history" or (kind is None and data.find(b'"history"', pos, lineEnd) != -1):
+                        try:
+                            obj = parseRecordHead(data[pos:lineEnd].strip())
+                        except Exception:
+                            obj = None
+                        if isinstance(obj, dict) and obj.get("type") == "history" and obj.get("date"):
+                            days[obj["date"]] = (pos, lineEnd - pos)
+                    pos = lineEnd
+        except OSError:
+            self.size = None
+            self.mtimeNs = None
+            self.days = {}
+            return
+
+        self.size = st.st_size
+        self.mtimeNs = st.st_mtime_ns
+        self.days = days
+        self.save()
+
+    def ensureFresh(self):
+        if not self.loaded:
+            self._loadSidecar()
+        if not self.isFresh():
+            self.rebuild()
+
+    def noteAppends(self, dayOffsets, statBefore):
+        """
+        Record history lines just appended; `dayOffsets` maps each day to its
+        line's (offset, length). `statBefore` is the data file's (size,
+        mtime_ns) before the append; if the index did not match it, the index
+        is already stale and is left for the next rebuild.
+        """
+        if not self.loaded:
+            self._loadSidecar()
+        if statBefore is None or statBefore != (self.size, self.mtimeNs):
+            return
+        stat = self._dataStat()
+        if stat is None:
+            return
+        self.days.update(dayOffsets)
+        self.size, self.mtimeNs = stat
+        self.save()
+
+    def replaceAll(self, days, stat=None):
+        """Adopt offsets computed while the data file was written or scanned"""
+        self.loaded = True
+        if stat is None:
+            stat = self._dataStat()
+        if stat is None:
+            return
+        self.days = dict(days)
+        self.size, self.mtimeNs = stat
+        self.save()
+
+    def readDay(self, dateKey):
+        """Return the raw history record for `dateKey` (a dict) or None"""
+        self.ensureFresh()
+        for attempt in range(2):
+            loc = self.days.get(dateKey)
+            if loc is None:
+                return None
+            offset, length = loc
+            try:
+                with open(self.dataPath, "rb") as f:
+                    f.seek(offset)
+                    raw = f.read(length)
+                obj = decodeLine(raw) if checkLine(raw, 0, len(raw)) is not False else None
+                if isinstance(obj, dict) and obj.get("date") == dateKey:
+                    return obj
+            except Exception:
+                pass
+            # the offset no longer points at this day's record
+            if attempt == 0:
+                self.rebuild()
+        return None
+
+    def dates(self):
+        self.ensureFresh()
+        return list(self.days.keys())
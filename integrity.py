@@ -0,0 +1,152 @@
+"""
+Integrity checks for the JSONL data files. Every line dumpRecord() writes
+carries the CRC32 of its canonical JSON, so a line can be verified from its
+bytes without being decoded:
+
+    python integrity.py [dataDir]
+
+checks tasks.jsonl and any history shards and exits with 1 if a line is bad.
+On load, bad lines are moved to <file>.quarantine instead of being lost or
+taking the rest of the file down with them.
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from docCache import documentCache
+from jsonlReader import checkLine, mappedFile
+
+QUARANTINE_SUFFIX = ".quarantine"
+
+
+def scanIntegrity(path):
+    """
+    Verify every line of `path` without decoding it. Returns a report dict:
+    lines, verified, unchecked (lines without a checksum, i.e. written by
+    older versions or by hand), bad [(lineNo, offset, reason)] and seconds.
+    """
+    started = time.perf_counter()
+    report = {"path": path, "lines": 0, "verified": 0, "unchecked": 0, "bad": []}
+    if not os.path.exists(path):
+        report["seconds"] = 0.0
+        return report
+    with mappedFile(path) as (buf, st):
+        size = st.st_size
+        pos = 0
+        lineNo = 0
+        while pos < size:
+            nl = buf.find(b"\n", pos)
+            lineEnd = size if nl == -1 else nl + 1
+            start = pos
+            pos = lineEnd
+            lineNo += 1
+            first = buf[start:start + 2]
+            if first in (b"\n", b"\r\n", b"\r", b"") or first == b"//":
+                continue
+            report["lines"] += 1
+            if first[:1] != b"{":
+                report["bad"].append((lineNo, start, "not a record"))
+                continue
+            ok = checkLine(buf, start, lineEnd)
+            if ok:
+                report["verified"] += 1
+            elif ok is None:
+                report["unchecked"] += 1
+            else:
+                report["bad"].append((lineNo, start, "checksum"))
+    report["seconds"] = time.perf_counter() - started
+    return report
+
+
+def appendToQuarantine(path, entries):
+    """Append (offset, reason, rawLine) entries to <path>.quarantine; returns its path"""
+    quarantinePath = path + QUARANTINE_SUFFIX
+    stamp = datetime.now().isoformat(timespec="seconds")
+    with open(quarantinePath, "a", encoding="utf-8", newline="") as q:
+        for offset, reason, raw in entries:
+            q.write(json.dumps({
+                "quarantinedAt": stamp, "offset": offset, "reason": reason,
+                "line": raw.rstrip(b"\r\n").decode("utf-8", errors="replace"),
+            }, ensure_ascii=False) + "\n")
+        q.flush()
+        os.fsync(q.fileno())
+    return quarantinePath
+
+
+def quarantineLines(path, badLines, durability=None):
+    """
+    Move the lines of `path` at `badLines` [(offset, length, reason)] to
+    <path>.quarantine (one JSON record each, with where and why) and rewrite
+    `path` without them. The caller holds the file's lock. Returns the
+    quarantine file's path.
+    """
+    spans = sorted(badLines)
+    dirpath = os.path.dirname(path) or "."
+    with open(path, "rb") as src:
+        data = src.read()
+    quarantinePath = appendToQuarantine(
+        path, [(offset, reason, data[offset:offset + length]) for offset, length, reason in spans])
+
+    tmp = tempfile.NamedTemporaryFile(mode="wb", delete=False, dir=dirpath)
+    try:
+        pos = 0
+        for offset, length, _ in spans:
+            tmp.write(data[pos:offset])
+            pos = offset + length
+        tmp.write(data[pos:])
+        if durability is not None:
+            durability.sync(tmp)
+        tmp.close()
+        os.replace(tmp.name, path)
+    except Exception:
+        tmp.close()
+        if os.path.exists(tmp.name):
+            os.remove(tmp.name)
+        raise
+    documentCache.invalidate(path)
+    if durability is not None:
+        durability.committed(path)
+    return quarantinePath
+
+
+def dataFiles(dataDir):
+    """tasks.jsonl, its charge codes and archive index plus the sharded backend's files, whichever exist"""
+    paths = [os.path.join(dataDir, n) for n in ("tasks.jsonl", "chargeCodes.jsonl", os.path.join("archive", "index.jsonl"))]
+    shardDir = os.path.join(dataDir, "shards")
+    if os.path.isdir(shardDir):
+        paths.extend(os.path.join(shardDir, n) for n in sorted(os.listdir(shardDir)) if n.endswith(".jsonl"))
+    return [p for p in paths if os.path.exists(p)]
+
+
+def formatReport(report):
+    line = (f"{report['path']}: {report['lines']} records, {report['verified']} verified, "
+            f"{report['unchecked']} without checksum, {len(report['bad'])} bad "
+            f"({report['seconds'] * 1000:.1f} ms)")
+    for lineNo, offset, reason in report["bad"]:
+        line += f"\n  line {lineNo} (byte {offset}): {reason}"
+    return line
+
+
+def main(argv):
+    if len(argv) > 1:
+        dataDir = argv[1]
+    else:
+        appData = os.environ.get("LOCALAPPDATA") or os.environ.get("APPDATA") or os.path.expanduser("~")
+        dataDir = os.path.join(appData, "Task Tracker")
+    paths = dataFiles(dataDir)
+    if not paths:
+        print(f"No data files in {dataDir}")
+        return 0
+    bad = 0
+    for path in paths:
+        report = scanIntegrity(path)
+        bad += len(report["bad"])
+        print(formatReport(report))
+    return 1 if bad else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
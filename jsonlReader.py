@@ -0,0 +1,142 @@
+import json
+import mmap
+import os
+import zlib
+from contextlib import contextmanager
+
+# dumpRecord() always writes "type" first, so a record's kind can be read off its first bytes
+TYPE_PREFIX = b'{"type":"'
+
+# ...followed by the CRC32 of the line without this field: {"type":"task","crc":"89abcdef",...}
+CHECKSUM_KEY = "crc"
+CHECKSUM_FIELD = b',"crc":"'
+_CHECKSUM_FIELD_LEN = len(CHECKSUM_FIELD) + 8 + 1
+
+
+@contextmanager
+def mappedFile(path):
+    """Read-only mmap of `path` (b"" when the file is empty) together with its os.stat_result"""
+    with open(path, "rb") as f:
+        st = os.fstat(f.fileno())
+        if st.st_size == 0:
+            yield b"", st
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm, st
+
+
+def peekType(buf, start, end):
+    """Record type of the line buf[start:end] read from its bytes, or None if it isn't in dumpRecord form"""
+    typeStart = start + len(TYPE_PREFIX)
+    if buf[start:typeStart] != TYPE_PREFIX:
+        return None
+    quote = buf.find(b'"', typeStart, end)
+    if quote == -1:
+        return None
+    return buf[typeStart:quote].decode("utf-8", errors="replace")
+
+
+def stampChecksum(text):
+    """Insert the CRC32 of `text` (a dumpRecord line without its newline) right after the "type" value"""
+    if not text.startswith('{"type":"'):
+        return text
+    quote = text.find('"', len('{"type":"'))
+    if quote == -1:
+        return text
+    crc = zlib.crc32(text.encode("utf-8"))
+    return f'{text[:quote + 1]},"crc":"{crc:08x}"{text[quote + 1:]}'
+
+
+def checkLine(buf, start, end):
+    """
+    Verify the line buf[start:end] from its bytes: True if its checksum
+    matches, False if it doesn't, None for lines without one (blank,
+    hand-written or saved by older versions).
+    """
+    while end > start and buf[end - 1] in b"\r\n":
+        end -= 1
+    typeStart = start + len(TYPE_PREFIX)
+    if buf[start:typeStart] != TYPE_PREFIX:
+        return None
+    quote = buf.find(b'"', typeStart, end)
+    if quote == -1:
+        return None
+    fieldStart = quote + 1
+    digitsStart = fieldStart + len(CHECKSUM_FIELD)
+    if buf[fieldStart:digitsStart] != CHECKSUM_FIELD:
+        return None
+    restStart = fieldStart + _CHECKSUM_FIELD_LEN
+    if buf[restStart - 1:restStart] != b'"':
+        return False
+    try:
+        expected = int(buf[digitsStart:restStart - 1], 16)
+    except ValueError:
+        return False
+    crc = zlib.crc32(buf[start:fieldStart])
+    return zlib.crc32(buf[restStart:end], crc) == expected
+
+
+def iterRawLines(path):
+    """
+    Yield (recordType, line) for every line of a JSONL file, where `line` is
+    the raw bytes including the newline. recordType comes from peekType() and
+    is None for blank, comment, hand-formatted or broken lines; nothing is
+    JSON-decoded here. The file is mapped only while the generator runs, so
+    consume it fully before replacing the file.
+    """
+    if not os.path.exists(path):
+        return
+    with mappedFile(path) as (buf, st):
+        size = st.st_size
+        pos = 0
+        while pos < size:
+            nl = buf.find(b"\n", pos)
+            lineEnd = size if nl == -1 else nl + 1
+            yield peekType(buf, pos, lineEnd), buf[pos:lineEnd]
+            pos = lineEnd
+
+
+def decodeLine(line):
+    """Parse one raw line; None for blank, comment or broken lines"""
+    line = line.strip()
+    if not line or line.startswith(b"//"):
+        return None
+    try:
+        obj = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(obj, dict):
+        return None
+    obj.pop(CHECKSUM_KEY, None)
+    return obj
+
+
+def iterRecords(path, types=None):
+    """
+    Yield the records of a JSONL file whose "type" is in `types` (all records
+    when None). Lines of other types are skipped at the byte level without
+    being decoded, and so are lines whose checksum doesn't match.
+    """
+    wanted = set(types) if types is not None else None
+    if not os.path.exists(path):
+        return
+    with mappedFile(path) as (buf, st):
+        size = st.st_size
+        pos = 0
+        while pos < size:
+            nl = buf.find(b"\n", pos)
+            lineEnd = size if nl == -1 else nl + 1
+            start = pos
+            pos = lineEnd
+            if wanted is not None:
+                kind = peekType(buf, start, lineEnd)
+                if kind is not None and kind not in wanted:
+                    continue
+            if checkLine(buf, start, lineEnd) is False:
+                continue
+            obj = decodeLine(buf[start:lineEnd])
+            if obj is None:
+                continue
+            if wanted is not None and obj.get("type") not in wanted:
+                continue
+            yield obj
@@ -0,0 +1,105 @@
+import threading
+from collections import OrderedDict
+
+TIMELINE_CACHE_DAYS = 16
+
+
+class TimelineCache:
+    """Small LRU of day timelines; `loadDay(dateKey)` fetches one from storage"""
+
+    def __init__(self, loadDay, maxDays=TIMELINE_CACHE_DAYS):
+        self.loadDay = loadDay
+        self.maxDays = maxDays
+        self.lock = threading.Lock()
+        self.days = OrderedDict()
+
+    def get(self, dateKey):
+        with self.lock:
+            if dateKey in self.days:
+                self.days.move_to_end(dateKey)
+                return self.days[dateKey]
+        try:
+            timeline = self.loadDay(dateKey) or []
+        except Exception:
+            timeline = []
+        with self.lock:
+            self.days[dateKey] = timeline
+            self.days.move_to_end(dateKey)
+            while len(self.days) > self.maxDays:
+                self.days.popitem(last=False)
+        return timeline
+
+    def discard(self, dateKey):
+        with self.lock:
+            self.days.pop(dateKey, None)
+
+    def clear(self):
+        with self.lock:
+            self.days.clear()
+
+
+class LazyHistoryEntry(dict):
+    """
+    A history entry holding only its summary; "timeline" is read through the
+    shared TimelineCache the first time it is asked for and not kept here, so
+    the LRU bounds how many timelines stay in memory. Storing a "timeline"
+    explicitly pins it like a normal dict entry.
+    """
+    __slots__ = ("dateKey", "timelines")
+
+    def __init__(self, head, dateKey, timelines):
+        super().__init__(head)
+        self.dateKey = dateKey
+        self.timelines = timelines
+
+    def _hasOwnTimeline(self):
+        return dict.__contains__(self, "timeline")
+
+    def __getitem__(self, key):
+        if key == "timeline" and not self._hasOwnTimeline():
+            return self.timelines.get(self.dateKey)
+        return dict.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        if key == "timeline" and not self._hasOwnTimeline():
+            return self.timelines.get(self.dateKey)
+        return dict.get(self, key, default)
+
+    def __contains__(self, key):
+        return key == "timeline" or dict.__contains__(self, key)
+
+    def keys(self):
+        keys = list(dict.keys(self))
+        if not self._hasOwnTimeline():
+            keys.append("timeline")
+        return keys
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        return [(k, self[k]) for k in self.keys()]
+
+    def values(self):
+        return [self[k] for k in self.keys()]
+
+    def copy(self):
+        return dict(self.items())
+
+    def __eq__(self, other):
+        if isinstance(other, dict):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        summary = dict.get(self, "summary", "")
+        return f"LazyHistoryEntry({self.dateKey!r}, summary={summary!r})"
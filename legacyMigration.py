@@ -0,0 +1,201 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from storage import dumpRecord
+from summaries import withSummaryNumbers
+
+CHUNK_SIZE = 64 * 1024
+LEGACY_BACKUP_SUFFIX = ".legacy"
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+
+
+class _JsonStream:
+    """
+    Minimal incremental JSON reader over a text file: containers are walked
+    one member at a time and only leaf values (one task name, one history
+    day, ...) are decoded, so the buffer never holds much more than a chunk.
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.eof:
+            return False
+        chunk = self.f.read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Next non-whitespace character without consuming it ("" at end of file)"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, ch):
+        if self.peek() != ch:
+            raise ValueError(f"expected {ch!r} in legacy data file")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value"""
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # a number at the end of the buffer may continue in the next chunk
+            if end == len(self.buf) and self._fill():
+                continue
+            self.pos = end
+            return obj
+
+    def members(self):
+        """Yield the keys of the object that comes next; the caller reads each value"""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            ch = self.peek()
+            self.pos += 1
+            if ch == "}":
+                return
+            if ch != ",":
+                raise ValueError("malformed object in legacy data file")
+
+    def items(self):
+        """Step through the array that comes next; the caller reads each element"""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield
+            ch = self.peek()
+            self.pos += 1
+            if ch == "]":
+                return
+            if ch != ",":
+                raise ValueError("malformed array in legacy data file")
+
+
+def _historyRecord(dateKey, entry):
+    if isinstance(entry, dict):
+        rec = {"type": "history", "date": dateKey, "summary": entry.get("summary", "") or "",
+               "timeline": entry.get("timeline", []) or []}
+    else:
+        rec = {"type": "history", "date": dateKey, "summary": entry or "", "timeline": []}
+    return withSummaryNumbers(rec)
+
+
+def _convert(src, dst, spool):
+    """Stream the legacy document in `src` into JSONL on `dst`; returns the number of history days"""
+    stream = _JsonStream(src)
+    tasks = []
+    groups = {}
+    days = 0
+    for key in stream.members():
+        kind = stream.peek()
+        if key == "tasks" and kind == "[":
+            for _ in stream.items():
+                name = stream.value()
+                if isinstance(name, str) and name:
+                    tasks.append(name)
+        elif key == "tasks" and kind == "{":
+            for name in stream.members():
+                stream.value()
+                if name:
+                    tasks.append(name)
+        elif key == "groups" and kind == "{":
+            for task in stream.members():
+                groups[task] = stream.value()
+        elif key == "history" and kind == "{":
+            # history can come before groups in the document; spool it so the
+            # JSONL keeps the usual task/group/history order
+            for dateKey in stream.members():
+                spool.write(dumpRecord(_historyRecord(dateKey, stream.value())))
+                days += 1
+        else:
+            # nothing else in the legacy document was ever read by the app
+            stream.value()
+    if stream.peek() != "":
+        raise ValueError("trailing data after legacy document")
+
+    for name in tasks:
+        dst.write(dumpRecord({"type": "task", "name": name}))
+    for task, group in groups.items():
+        dst.write(dumpRecord({"type": "group", "task": task, "group": group}))
+    spool.seek(0)
+    shutil.copyfileobj(spool, dst)
+    return days
+
+
+def isLegacyDocument(path):
+    """True when the file is one JSON document rather than JSONL (its first record spans past line one)"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            first = f.readline().strip()
+    except (OSError, UnicodeDecodeError):
+        return False
+    if not first.startswith("{") or first.startswith('{"type":"'):
+        # a JSONL record, even one too damaged to parse, is never a legacy document
+        return False
+    try:
+        obj = json.loads(first)
+    except ValueError:
+        return True
+    return not (isinstance(obj, dict) and "type" in obj)
+
+
+def migrateLegacyFile(path):
+    """
+    Convert a legacy {"tasks", "groups", "history"} document at `path` to JSONL
+    in place, keeping the original as <path>.legacy. Returns a report dict
+    ({"days", "seconds", "backup"}) or None if the file is not in the legacy
+    format. Nothing is replaced unless the whole document converts cleanly.
+    """
+    if not isLegacyDocument(path):
+        return None
+
+    started = time.perf_counter()
+    dirpath = os.path.dirname(path) or "."
+    tmp = tempfile.NamedTemporaryFile(mode="w", encoding="utf-8", newline="", delete=False, dir=dirpath)
+    try:
+        with open(path, "r", encoding="utf-8") as src, \
+                tempfile.TemporaryFile(mode="w+", encoding="utf-8", newline="") as spool:
+            days = _convert(src, tmp, spool)
+        tmp.flush()
+        os.fsync(tmp.fileno())
+        tmp.close()
+        backup = path + LEGACY_BACKUP_SUFFIX
+        shutil.copyfile(path, backup)
+        os.replace(tmp.name, path)
+    except Exception:
+        tmp.close()
+        if os.path.exists(tmp.name):
+            os.remove(tmp.name)
+        raise
+    return {"days": days, "seconds": time.perf_counter() - started, "backup": backup}
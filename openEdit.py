@@ -1,7 +1,9 @@
 import tkinter as tk
-from datetime import datetime, date, time as dtime
+from datetime import datetime, time as dtime
 import sys
 import os
+from summaries import makeSummary
+from timeline import CompactTimeline, asCompactTimeline
 
 def resourcePath(relPath):
 	candidates = []
@@ -29,14 +31,12 @@ def open_day_editor(self, parent, dayKey, periods, current, showPayPeriodSummary
     - Supports dragging rectangles horizontally to resize and vertically to move tasks.
     - Click empty canvas to add a new segment for selected task.
     """
-    entry = self.history.get(dayKey, {}) or {}
-    segs = [dict(s) for s in (entry.get("timeline") or [])]
-
-    # normalize segment fields
-    for s in segs:
-        s.setdefault("task", "Untasked")
-        s.setdefault("start", "")
-        s.setdefault("end", "")
+    entry = self.getHistoryEntry(dayKey) or {}
+    timeline = asCompactTimeline(entry.get("timeline"), dayKey)
+    segs = [
+        {"task": task or "Untasked", "start": start, "end": min(end, 24*3600-1)}
+        for task, start, end in timeline
+    ]
 
     editor = tk.Toplevel(parent)
     editor.transient(parent)
@@ -99,22 +99,6 @@ def open_day_editor(self, parent, dayKey, periods, current, showPayPeriodSummary
     cancelBtn = tk.Button(saveRow, text="Cancel", font=("Segoe UI",10), bg="#1b1f24", fg=self.textColor, relief="flat")
     cancelBtn.pack(side="right")
 
-    # helper: parse ISO time to seconds since midnight
-    def iso_to_secs(ts):
-        if not ts or "T" not in ts:
-            return None
-        try:
-            parts = ts.split("T",1)[1]
-            for sep in ("+", "-", "Z"):
-                i = parts.find(sep)
-                if i > 0:
-                    parts = parts[:i]
-                    break
-            comps = parts.split(":")
-            h = int(comps[0]); m = int(comps[1]); s = int(comps[2]) if len(comps)>2 else 0
-            return h*3600 + m*60 + s
-        except Exception:
-            return None
     def hhmm_to_secs(hhmm, fallbackSecs=0):
         if not hhmm:
             return fallbackSecs
@@ -132,11 +116,9 @@ def open_day_editor(self, parent, dayKey, periods, current, showPayPeriodSummary
         except Exception:
             return fallbackSecs
 
-    # format seconds to ISO for this dayKey
-    def secs_to_iso(secs):
-        secs = max(0, min(int(round(secs)), 24*3600-1))
-        h = secs//3600; m = (secs%3600)//60; s = secs%60
-        return f"{dayKey}T{h:02d}:{m:02d}:{s:02d}"
+    # clamp seconds to this dayKey (segments hold seconds since midnight, not ISO strings)
+    def clamp_secs(secs):
+        return max(0, min(int(round(secs)), 24*3600-1))
 
         
     # drawing / layout state
@@ -200,8 +182,8 @@ def open_day_editor(self, parent, dayKey, periods, current, showPayPeriodSummary
         # draw segments (no internal text; y-axis labels suffice)
         rect_map.clear(); item_info.clear()
         for idx, s in enumerate(segs):
-            start_s = iso_to_secs(s.get("start") or "")
-            end_s = iso_to_secs(s.get("end") or "")
+            start_s = s.get("start")
+            end_s = s.get("end")
             if start_s is None or end_s is None or end_s <= start_s:
                 continue
             task = s.get("task") or "Untasked"
@@ -244,8 +226,8 @@ def open_day_editor(self, parent, dayKey, periods, current, showPayPeriodSummary
         # keeps ordering by time for stable UI
         valid = []
         for s in segs:
-            start_s = iso_to_secs(s.get("start",""))
-            end_s = iso_to_secs(s.get("end",""))
+            start_s = s.get("start")
+            end_s = s.get("end")
             if start_s is None or end_s is None or end_s <= start_s:
                 continue
             valid.append((start_s, end_s, s.get("task") or "Untasked"))
@@ -259,7 +241,7 @@ def open_day_editor(self, parent, dayKey, periods, current, showPayPeriodSummary
             else:
                 merged.append((start_s, end_s, task))
 
-        segs[:] = [{"task": task, "start": secs_to_iso(start_s), "end": secs_to_iso(end_s)} for start_s, end_s, task in merged]
+        segs[:] = [{"task": task, "start": clamp_secs(start_s), "end": clamp_secs(end_s)} for start_s, end_s, task in merged]
 
     def on_button_press(ev):
         # left-button press: start drag on existing segment OR start creating a provisional seg immediately
@@ -306,7 +288,7 @@ def open_day_editor(self, parent, dayKey, periods, current, showPayPeriodSummary
             color = ppColorMap.get(task, self.accentColor) if ppColorMap else self.accentColor
             item = canvas.create_rectangle(cx, y1, cx + 4, y2, fill=color, outline="#0f1720")
             # append provisional segment to segs and map
-            segs.append({"task": task, "start": secs_to_iso(start_s), "end": secs_to_iso(start_s)})
+            segs.append({"task": task, "start": clamp_secs(start_s), "end": clamp_secs(start_s)})
             idx = len(segs) - 1
             rect_map[item] = idx
             item_info[item] = {"seg": idx}
@@ -362,8 +344,8 @@ def open_day_editor(self, parent, dayKey, periods, current, showPayPeriodSummary
             if (end_s - start_s) < click_min_s:
                 end_s = min(86400-1, start_s + click_min_s)
             try:
-                segs[sidx]["start"] = secs_to_iso(start_s)
-                segs[sidx]["end"] = secs_to_iso(end_s)
+                segs[sidx]["start"] = clamp_secs(start_s)
+                segs[sidx]["end"] = clamp_secs(end_s)
             except Exception:
                 pass
             return
@@ -438,8 +420,8 @@ def open_day_editor(self, parent, dayKey, periods, current, showPayPeriodSummary
                 end_s = workEndSecs
             
             # commit provisional segment
-            segs[sidx]["start"] = secs_to_iso(start_s)
-            segs[sidx]["end"] = secs_to_iso(end_s)
+            segs[sidx]["start"] = clamp_secs(start_s)
+            segs[sidx]["end"] = clamp_secs(end_s)
             # resolve overlaps now (reuse same rules)
             mod_idx = sidx
             A_start = start_s
@@ -449,8 +431,8 @@ def open_day_editor(self, parent, dayKey, periods, current, showPayPeriodSummary
                 if i == mod_idx:
                     i += 1
                     continue
-                B_start = iso_to_secs(segs[i].get("start",""))
-                B_end = iso_to_secs(segs[i].get("end",""))
+                B_start = segs[i].get("start")
+                B_end = segs[i].get("end")
                 if B_start is None or B_end is None or B_end <= B_start:
                     segs.pop(i)
                     if i < mod_idx:
@@ -470,9 +452,9 @@ def open_day_editor(self, parent, dayKey, periods, current, showPayPeriodSummary
                     left_seg = None
                     right_seg = None
                     if left_dur >= min_seg_s:
-                        left_seg = {"task": segs[i].get("task","Untasked"), "start": secs_to_iso(B_start), "end": secs_to_iso(A_start)}
+                        left_seg = {"task": segs[i].get("task","Untasked"), "start": clamp_secs(B_start), "end": clamp_secs(A_start)}
                     if right_dur >= min_seg_s:
-                        right_seg = {"task": segs[i].get("task","Untasked"), "start": secs_to_iso(A_end), "end": secs_to_iso(B_end)}
+                        right_seg = {"task": segs[i].get("task","Untasked"), "start": clamp_secs(A_end), "end": clamp_secs(B_end)}
                     if left_seg and right_seg:
                         segs[i] = left_seg
                         segs.insert(i+1, right_seg)
@@ -500,7 +482,7 @@ def open_day_editor(self, parent, dayKey, periods, current, showPayPeriodSummary
                         if i < mod_idx:
                             mod_idx -= 1
                         continue
-                    segs[i]["end"] = secs_to_iso(new_end)
+                    segs[i]["end"] = clamp_secs(new_end)
                     i += 1
                     continue
                 if A_start <= B_start < A_end < B_end:
@@ -510,7 +492,7 @@ def open_day_editor(self, parent, dayKey, periods, current, showPayPeriodSummary
                         if i < mod_idx:
                             mod_idx -= 1
                         continue
-                    segs[i]["start"] = secs_to_iso(new_start)
+                    segs[i]["start"] = clamp_secs(new_start)
                     i += 1
                     continue
                 i += 1
@@ -560,15 +542,15 @@ def open_day_editor(self, parent, dayKey, periods, current, showPayPeriodSummary
         new_row = max(0, min(len(rows)-1, new_row))
         new_task = rows[new_row]
         # commit changes
-        segs[sidx]["start"] = secs_to_iso(start_s)
-        segs[sidx]["end"] = secs_to_iso(end_s)
+        segs[sidx]["start"] = clamp_secs(start_s)
+        segs[sidx]["end"] = clamp_secs(end_s)
         segs[sidx]["task"] = new_task
         # resolve overlaps after committing the edit (existing logic reused)
         def resolve_overlaps_for(mod_idx):
             if mod_idx < 0 or mod_idx >= len(segs):
                 return
-            A_start = iso_to_secs(segs[mod_idx].get("start",""))
-            A_end = iso_to_secs(segs[mod_idx].get("end",""))
+            A_start = segs[mod_idx].get("start")
+            A_end = segs[mod_idx].get("end")
             if A_start is None or A_end is None:
                 return
             i = 0
@@ -576,8 +558,8 @@ def open_day_editor(self, parent, dayKey, periods, current, showPayPeriodSummary
                 if i == mod_idx:
                     i += 1
                     continue
-                B_start = iso_to_secs(segs[i].get("start",""))
-                B_end = iso_to_secs(segs[i].get("end",""))
+                B_start = segs[i].get("start")
+                B_end = segs[i].get("end")
                 if B_start is None or B_end is None or B_end <= B_start:
                     segs.pop(i)
                     if i < mod_idx:
@@ -597,9 +579,9 @@ def open_day_editor(self, parent, dayKey, periods, current, showPayPeriodSummary
                     left_seg = None
                     right_seg = None
                     if left_dur >= min_seg_s:
-                        left_seg = {"task": segs[i].get("task","Untasked"), "start": secs_to_iso(B_start), "end": secs_to_iso(A_start)}
+                        left_seg = {"task": segs[i].get("task","Untasked"), "start": clamp_secs(B_start), "end": clamp_secs(A_start)}
                     if right_dur >= min_seg_s:
-                        right_seg = {"task": segs[i].get("task","Untasked"), "start": secs_to_iso(A_end), "end": secs_to_iso(B_end)}
+                        right_seg = {"task": segs[i].get("task","Untasked"), "start": clamp_secs(A_end), "end": clamp_secs(B_end)}
                     if left_seg and right_seg:
                         segs[i] = left_seg
                         segs.insert(i+1, right_seg)
@@ -627,7 +609,7 @@ def open_day_editor(self, parent, dayKey, periods, current, showPayPeriodSummary
                         if i < mod_idx:
                             mod_idx -= 1
                         continue
-                    segs[i]["end"] = secs_to_iso(new_end)
+                    segs[i]["end"] = clamp_secs(new_end)
                     i += 1
                     continue
                 if A_start <= B_start < A_end < B_end:
@@ -637,7 +619,7 @@ def open_day_editor(self, parent, dayKey, periods, current, showPayPeriodSummary
                         if i < mod_idx:
                             mod_idx -= 1
                         continue
-                    segs[i]["start"] = secs_to_iso(new_start)
+                    segs[i]["start"] = clamp_secs(new_start)
                     i += 1
                     continue
                 i += 1
@@ -694,40 +676,31 @@ def open_day_editor(self, parent, dayKey, periods, current, showPayPeriodSummary
         # compute totals from timeline segments (override summary)
         per_task_seconds = {}
         for s in segs:
-            start_s = iso_to_secs(s.get("start",""))
-            end_s = iso_to_secs(s.get("end",""))
+            start_s = s.get("start")
+            end_s = s.get("end")
             if start_s is None or end_s is None or end_s <= start_s:
                 continue
             sec = end_s - start_s
             per_task_seconds[s.get("task","Untasked")] = per_task_seconds.get(s.get("task","Untasked"), 0) + sec
 
-        # build summary lines with same rounding semantics as TaskTrackerApp.endDay
-        lines = []
-        totalHours = 0.0
-        for name, secs in sorted(per_task_seconds.items(), key=lambda kv: kv[0].lower()):
-            hours = secs / 3600.0
-            rounded = round(hours, 1)
-            totalHours += rounded
-            lines.append(f"{name}: {rounded:.1f} h")
-        lines.append(f"Total: {totalHours:.1f} h")
-        computed_summary = "\n".join(lines)
-
-        new_summary = computed_summary  # override user edits for correctness
-        # normalize segs: remove invalid and very short ones, and ensure ISO formatting
+        # build summary with same rounding semantics as TaskTrackerApp.endDay
+        rounded = {name: round(secs / 3600.0, 1) for name, secs in per_task_seconds.items()}
+        new_summary = makeSummary(rounded, sum(rounded.values()), per_task_seconds)  # override user edits for correctness
+        # normalize segs: remove invalid and very short ones, and clamp to the day
         final = []
         for s in segs:
-            start_s = iso_to_secs(s.get("start",""))
-            end_s = iso_to_secs(s.get("end",""))
+            start_s = s.get("start")
+            end_s = s.get("end")
             if start_s is None or end_s is None:
                 continue
             if end_s <= start_s:
                 continue
             if (end_s - start_s) < min_seg_s:
                 continue
-            final.append({"task": s.get("task","Untasked"), "start": secs_to_iso(start_s), "end": secs_to_iso(end_s)})
+            final.append({"task": s.get("task","Untasked"), "start": clamp_secs(start_s), "end": clamp_secs(end_s)})
 
         # merge same-task segments that overlap or touch (end == start)
-        final.sort(key=lambda s: iso_to_secs(s.get("start","")) or 0)
+        final.sort(key=lambda s: s.get("start") or 0)
         merged = []
         for s in final:
             if not merged:
@@ -736,9 +709,9 @@ def open_day_editor(self, parent, dayKey, periods, current, showPayPeriodSummary
 
             prev = merged[-1]
             if s.get("task") == prev.get("task"):
-                prevEnd = iso_to_secs(prev.get("end",""))
-                sStart = iso_to_secs(s.get("start",""))
-                sEnd = iso_to_secs(s.get("end",""))
+                prevEnd = prev.get("end")
+                sStart = s.get("start")
+                sEnd = s.get("end")
 
                 if prevEnd is not None and sStart is not None and sEnd is not None and sStart <= prevEnd:
                     if sEnd > prevEnd:
@@ -748,7 +721,10 @@ def open_day_editor(self, parent, dayKey, periods, current, showPayPeriodSummary
             merged.append(s)
 
         # persist
-        self.history[dayKey] = {"summary": new_summary, "timeline": merged}
+        timeline = CompactTimeline(dayKey)
+        for s in merged:
+            timeline.append(s.get("task","Untasked"), s["start"], s["end"])
+        self.setHistoryEntry(dayKey, dict(new_summary, timeline=timeline))
 
         try:
             self.append_history_entry(dayKey, self.history[dayKey])
@@ -757,20 +733,15 @@ def open_day_editor(self, parent, dayKey, periods, current, showPayPeriodSummary
         # post charge codes for edits only when editing within the most recent (non-ended) pay period
         try:
             if getattr(self, "autoChargeCodes", False) and getattr(self, "useTimesheetFunctions", False):
-                mostRecent = periods[0] if periods else None
-                mostRecentDays = (mostRecent or {}).get("days") if isinstance(mostRecent, dict) else None
-
-                if isinstance(mostRecentDays, list) and dayKey in mostRecentDays and mostRecentDays:
-                    endKey = max(str(d) for d in mostRecentDays if d)
-                    if endKey >= date.today().isoformat():
-                        taskSecondsSnapshot = dict(per_task_seconds)
-                        self.postChargeCodeHours(taskSecondsSnapshot, dateKey=dayKey)
+                if self.payPeriods.isCurrent(dayKey):
+                    taskSecondsSnapshot = dict(per_task_seconds)
+                    self.postChargeCodeHours(taskSecondsSnapshot, dateKey=dayKey)
         except Exception:
             pass
 
         # update pay-period aggregates before refreshing UI
         try:
-            updatePeriods()
+            updatePeriods(dayKey)
         except Exception:
             # best-effort: ignore if callback missing
             pass
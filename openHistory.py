@@ -1,10 +1,14 @@
-from datetime import date, timedelta, datetime
+from datetime import date, datetime
 import tkinter as tk
 from tkinter import messagebox
 import sys
 import os
 import hashlib
 import openEdit
+from timeline import asCompactTimeline, SECONDS_PER_DAY
+from summaries import entryHoursById
+from analytics import formatReport
+from taskDictionary import taskDictionary
 
 def resourcePath(relPath):
 	candidates = []
@@ -27,90 +31,60 @@ def resourcePath(relPath):
 	return relPath
 
 def openHistory(self):
-        self.loadData()
-        if not self.history:
+        self.refreshData()
+        archivedHeaders = self.storage.archivedPeriods()
+        if not self.history and not archivedHeaders:
             messagebox.showinfo("History", "No summaries saved yet.")
             return
 
-        anchorStart = date(2025, 11, 29)
+        # per-period days and totals come from the totals the app keeps in step with every save
         ppMap = {}
+        for p in self.periodTotals.periodList():
+            ppMap[(p["start"], p["end"])] = p
 
-        for dStr in self.history.keys():
+        # closed periods moved to the archive are listed from their headers alone;
+        # their records are decompressed when the period is selected
+        archivedPeriods = []
+        for header in archivedHeaders:
             try:
-                d = date.fromisoformat(dStr)
-            except ValueError:
+                key = (date.fromisoformat(header["start"]), date.fromisoformat(header["end"]))
+            except (KeyError, TypeError, ValueError):
+                continue
+            if key in ppMap:
+                # days of this period were saved since it was archived: show all of it now
+                for dStr in self.loadArchivedPeriod(header["start"]):
+                    self.periodTotals.replaceDay(dStr, None, self.history[dStr], saved=False)
+                ppMap[key] = self.periodTotals.period(header["start"])
                 continue
-            offset = (d - anchorStart).days
-            idx = offset // 14
-            ppStart = anchorStart + timedelta(days=idx * 14)
-            ppEnd = ppStart + timedelta(days=13)
-            key = (ppStart, ppEnd)
-            if key not in ppMap:
-                ppMap[key] = []
-            ppMap[key].append(dStr)
-
-        if not ppMap:
+            archivedPeriods.append({
+                "start": key[0],
+                "end": key[1],
+                "days": sorted(header.get("days", []), reverse=True),
+                "agg": dict(header.get("hoursByTask", {})),
+                "total": header.get("total", 0.0),
+                "archived": True
+            })
+
+        if not ppMap and not archivedPeriods:
             messagebox.showinfo("History", "No valid dated summaries.")
             return
 
-        periods = []
-        for (start, end), days in ppMap.items():
-            daysSorted = sorted(days, reverse=True)
-            periods.append({
-                "start": start,
-                "end": end,
-                "days": daysSorted
-            })
+        periods = list(ppMap.values())
+        periods.extend(archivedPeriods)
         periods.sort(key=lambda p: p["start"], reverse=True)
 
-        def _parseTimeToSeconds(ts): # Need this so that I don't get timezone confusion
-            try:
-                tpart = ts.split("T", 1)[1]
-            except IndexError:
-                return None, None, None, None
-
-            for sep in ("+", "-", "Z"):
-                idx = tpart.find(sep)
-                if idx > 0:
-                    tpart = tpart[:idx]
-                    break
-
-            comps = tpart.split(":")
-            if len(comps) < 2:
-                return None, None, None, None
-
-            h = int(comps[0])
-            m = int(comps[1])
-            s = int(comps[2]) if len(comps) > 2 else 0
-            total = h * 3600 + m * 60 + s
-            return h, m, s, total
+        # dayStr -> (entry, {taskId: hours}, total); an edited day gets a new entry object
+        dayAggCache = {}
 
         def parseDaySummary(dayStr):
+            """({taskId: hours}, totalHours) of a day; names are resolved only for display"""
             entry = self.history.get(dayStr, "")
-            if isinstance(entry, dict):
-                summary = entry.get("summary", "") or ""
-            else:
-                summary = entry or ""
-            agg = {}
-            total = 0.0
-            for line in summary.splitlines():
-                if ":" not in line:
-                    continue
-                name, rest = line.split(":", 1)
-                name = name.strip()
-                rest = rest.strip()
-                if not rest:
-                    continue
-                numToken = rest.split()[0]
-                try:
-                    hours = float(numToken)
-                except ValueError:
-                    continue
-                if name.lower() == "total":
-                    continue
-                agg[name] = agg.get(name, 0.0) + hours
-                total += hours
-            return agg, total
+            cached = dayAggCache.get(dayStr)
+            if cached is not None and cached[0] is entry:
+                return cached[1], cached[2]
+            aggById, total = entryHoursById(entry)
+            dayAggCache[dayStr] = (entry, aggById, total)
+            return aggById, total
 
         def collectAllTasks():
             names = set()
@@ -118,45 +92,29 @@ def openHistory(self):
             if hasattr(self, "rows") and isinstance(self.rows, dict):
                 names.update(self.rows.keys())
             # Also include any tasks found in history summaries (for legacy/removed tasks).
-            for entry in self.history.values():
-                if isinstance(entry, dict):
-                    summary = entry.get("summary", "") or ""
-                else:
-                    summary = entry or ""
-                for line in summary.splitlines():
-                    if ":" not in line:
-                        continue
-                    name, _ = line.split(":", 1)
-                    name = name.strip()
-                    if not name or name.lower() == "total":
-                        continue
-                    names.add(name)
+            for p in periods:
+                names.update(name for name in p.get("agg", {}) if name)
             return sorted(names)
 
-        for p in periods:
-            agg = {}
-            total = 0.0
-            for dStr in p["days"]:
-                dayAgg, dayTotal = parseDaySummary(dStr)
-                for k, v in dayAgg.items():
-                    agg[k] = agg.get(k, 0.0) + v
-                total += dayTotal
-            p["agg"] = agg
-            p["total"] = total
-
-        # helper to recompute period aggregates after edits
-        def updatePeriods():
-            nonlocal periods
+        def loadArchivedPeriod(p):
+            """Decompress an archived period the first time it is shown; its header already has the totals"""
+            if not p.get("archived"):
+                return
+            self.loadArchivedPeriod(p["start"].isoformat())
+            p["archived"] = False
+
+        # after an edit: take the edited day's period (or every period) from the maintained totals
+        def updatePeriods(dayKey=None):
+            startKey = self.payPeriods.keyOf(dayKey) if dayKey else None
             for p in periods:
-                agg = {}
-                total = 0.0
-                for dStr in p.get("days", []):
-                    dayAgg, dayTotal = parseDaySummary(dStr)
-                    for k, v in dayAgg.items():
-                        agg[k] = agg.get(k, 0.0) + v
-                    total += dayTotal
-                p["agg"] = agg
-                p["total"] = total
+                if p.get("archived"):
+                    continue
+                key = p["start"].isoformat()
+                if startKey is not None and key != startKey:
+                    continue
+                fresh = self.periodTotals.period(key)
+                if fresh is not None:
+                    p.update(days=fresh["days"], agg=fresh["agg"], total=fresh["total"])
             # ensure UI shows recalculated data
             try:
                 showPayPeriodSummary()
@@ -198,6 +156,7 @@ def openHistory(self):
             histWin.columnconfigure(3, weight=0)
             histWin.rowconfigure(0, weight=1)
             histWin.rowconfigure(1, weight=0)
+            histWin.rowconfigure(2, weight=0)
 
             histWin.transient(self.root)
 
@@ -725,6 +684,7 @@ def openHistory(self):
             tasksOrdered = [k for k, v in sorted(taskAgg.items(), key=lambda kv: kv[1], reverse=True) if v > 0]
             if not tasksOrdered:
                 return
+            taskIds = {task: taskDictionary.idFor(task) for task in tasksOrdered}
 
             ppPieCanvas.update_idletasks()
             w = ppPieCanvas.winfo_width() or 240
@@ -753,7 +713,7 @@ def openHistory(self):
 
                 y = bottom
                 for i, task in enumerate(tasksOrdered):
-                    v = float(perDayAgg[0].get(task, 0.0))
+                    v = float(perDayAgg[0].get(taskIds[task], 0.0))
                     if v <= 0:
                         continue
                     hPx = int(round((v / maxDayTotal) * plotH))
@@ -782,7 +742,8 @@ def openHistory(self):
             cumulative = [0.0 for _ in range(n)]
 
             for task in tasksOrdered:
-                vals = [float(dayAgg.get(task, 0.0)) for dayAgg in perDayAgg]
+                tid = taskIds[task]
+                vals = [float(dayAgg.get(tid, 0.0)) for dayAgg in perDayAgg]
                 if sum(vals) <= 0:
                     continue
 
@@ -889,6 +850,7 @@ def openHistory(self):
             p = periods[ppIdx]
             agg = p.get("agg", {})
             total = p.get("total", 0.0)
+            ppSummaryLabel.config(text="Pay Period Overview")
 
             computePayPeriodColorMap(agg)
 
@@ -897,6 +859,75 @@ def openHistory(self):
             else:
                 drawPayPeriodPie(total, agg)
 
+            fillOverviewText(total, agg)
+
+        def readDateRange():
+            """(start, end) dates of the From..To entries, in order; None after telling the user they're invalid"""
+            try:
+                start = date.fromisoformat(rangeFromEntry.get().strip())
+                end = date.fromisoformat(rangeToEntry.get().strip())
+            except ValueError:
+                messagebox.showerror("Date Range", "Enter dates as YYYY-MM-DD.", parent=histWin)
+                return None
+            return (end, start) if end < start else (start, end)
+
+        def showRangeSummary():
+            """Totals of the From..To dates in the overview panel, from the hours index"""
+            dateRange = readDateRange()
+            if dateRange is None:
+                return
+            start, end = dateRange
+            agg = self.hoursByTaskBetween(start.isoformat(), end.isoformat())
+            # every hour of a day belongs to one of its tasks, so one index lookup gives both
+            total = sum(agg.values())
+            ppSummaryLabel.config(text=f"{start.strftime('%b %d, %Y')} – {end.strftime('%b %d, %Y')}")
+            computePayPeriodColorMap(agg)
+            drawPayPeriodPie(total, agg)
+            fillOverviewText(total, agg)
+
+        def showTrends():
+            """Totals, averages and trends of the From..To dates (analytics.py) in the overview panel"""
+            dateRange = readDateRange()
+            if dateRange is None:
+                return
+            start, end = dateRange
+            report = self.analyticsBetween(start.isoformat(), end.isoformat())
+            ppSummaryLabel.config(text=f"Trends {start.strftime('%b %d, %Y')} – {end.strftime('%b %d, %Y')}")
+            drawMonthlyBars(report["months"])
+            ppSummaryBox.delete("1.0", tk.END)
+            ppSummaryBox.insert(tk.END, formatReport(report))
+
+        def drawMonthlyBars(months):
+            """Hours per month as bars on the chart canvas, with a tooltip per month"""
+            nonlocal pieSlices
+
+            ppPieCanvas.delete("all")
+            pieSlices = {}
+            peak = max(months.values(), default=0.0)
+            if peak <= 0:
+                return
+
+            ppPieCanvas.update_idletasks()
+            w = ppPieCanvas.winfo_width() or 240
+            h = ppPieCanvas.winfo_height() or 160
+            left, right, top, bottom = 10, max(11, w - 10), 10, max(11, h - 22)
+            ppPieCanvas.create_line(left, bottom, right, bottom, fill="#6b7280")
+
+            keys = list(months)
+            slot = (right - left) / float(len(keys))
+            for i, month in enumerate(keys):
+                hours = months[month]
+                if hours <= 0:
+                    continue
+                x1 = left + i * slot + (1 if slot > 3 else 0)
+                x2 = max(x1 + 1, left + (i + 1) * slot - (1 if slot > 3 else 0))
+                y1 = bottom - (hours / peak) * (bottom - top)
+                item = ppPieCanvas.create_rectangle(x1, y1, x2, bottom, fill=self.accentColor, outline="")
+                pieSlices[item] = f"{month} ({hours:.1f}h)"
+            for month, anchor, x in ((keys[0], "nw", left), (keys[-1], "ne", right)):
+                ppPieCanvas.create_text(x, bottom + 4, text=month, fill="#9ca3af", anchor=anchor, font=("Segoe UI", 7))
+
+        def fillOverviewText(total, agg):
             lines = formatLines(total, agg)
 
             ppSummaryBox.delete("1.0", tk.END)
@@ -925,8 +956,8 @@ def openHistory(self):
             rectTaskMap = {}
             timelineCanvas.delete("all")
 
-            entry = self.history.get(dayKey)
-            segments = entry.get("timeline") if isinstance(entry, dict) else []
+            entry = self.getHistoryEntry(dayKey)
+            segments = asCompactTimeline(entry.get("timeline"), dayKey) if isinstance(entry, dict) else None
 
             if not segments:
                 return
@@ -934,29 +965,20 @@ def openHistory(self):
             min_sec, max_sec = 24 * 3600, 0
             valid_segments = []
 
-            for seg in segments:
-                startStr = seg.get("start")
-                endStr = seg.get("end")
-                if not startStr or not endStr:
-                    continue
-
-                hStart, mStart, sStart, startSec = _parseTimeToSeconds(startStr)
-                hEnd, mEnd, sEnd, endSec = _parseTimeToSeconds(endStr)
-                if startSec is None or endSec is None:
-                    continue
-
+            # seconds since midnight straight from the compact timeline; no string parsing per redraw
+            for task, startSec, endSec in segments:
+                endSec = min(endSec, SECONDS_PER_DAY)
                 if endSec > startSec:
                     min_sec = min(min_sec, startSec)
                     max_sec = max(max_sec, endSec)
                     valid_segments.append({
-                        **seg,
-                        "task": seg.get("task") or "Untasked",
+                        "task": task or "Untasked",
                         "startSec": startSec,
                         "endSec": endSec,
-                        "hStart": hStart,
-                        "mStart": mStart,
-                        "hEnd": hEnd,
-                        "mEnd": mEnd,
+                        "hStart": startSec // 3600,
+                        "mStart": (startSec % 3600) // 60,
+                        "hEnd": endSec // 3600,
+                        "mEnd": (endSec % 3600) // 60,
                     })
 
             if not valid_segments:
@@ -1227,31 +1249,8 @@ def openHistory(self):
 
             dStr = period["days"][dayIdx]
             current["dayKey"] = dStr
-            entry = self.history.get(dStr, "") or ""
-            if isinstance(entry, dict):
-                raw = entry.get("summary", "") or ""
-            else:
-                raw = entry
-
-            taskAgg = {}
-            total = 0.0
-            for line in raw.splitlines():
-                if ":" not in line:
-                    continue
-                name, rest = line.split(":", 1)
-                name = name.strip()
-                rest = rest.strip()
-                if not rest:
-                    continue
-                token = rest.split()[0]
-                try:
-                    hours = float(token)
-                except ValueError:
-                    continue
-                if name.lower() == "total":
-                    continue
-                taskAgg[name] = taskAgg.get(name, 0.0) + hours
-                total += hours
+            aggById, total = parseDaySummary(dStr)
+            taskAgg = taskDictionary.nameKeys(aggById)
 
             lines = formatLines(total, taskAgg)
 
@@ -1289,6 +1288,7 @@ def openHistory(self):
                 timelineCanvas.delete("all")
                 return
             period = periods[ppIdx]
+            loadArchivedPeriod(period)
             for dStr in period["days"]:
                 try:
                     d = date.fromisoformat(dStr)
@@ -1365,8 +1365,65 @@ def openHistory(self):
         clearGroupBtn.config(command=clearGroup)
         ppChartModeBtn.config(command=togglePayPeriodChartMode)
 
+        # custom date range, summarized into the overview panel
+        rangeFrame = tk.Frame(histWin, bg=self.bgColor)
+        rangeFrame.grid(row=1, column=0, columnspan=4, padx=8, pady=(0, 8), sticky="w")
+        tk.Label(
+            rangeFrame,
+            text="Date Range",
+            font=("Segoe UI", 10, "bold"),
+            fg=self.textColor,
+            bg=self.bgColor
+        ).pack(side="left", padx=(0, 6))
+        rangeEntries = []
+        for i, initial in enumerate((date(date.today().year, 1, 1), date.today())):
+            if i:
+                tk.Label(rangeFrame, text="to", font=("Segoe UI", 10), fg=self.textColor, bg=self.bgColor).pack(side="left", padx=4)
+            entry = tk.Entry(
+                rangeFrame,
+                width=11,
+                font=("Segoe UI", 10),
+                bg="#2b3138",
+                fg=self.textColor,
+                insertbackground=self.textColor,
+                relief="flat",
+                highlightthickness=1,
+                highlightbackground="#0b0e12",
+                highlightcolor="#0b0e12",
+                bd=0
+            )
+            entry.insert(0, initial.isoformat())
+            entry.bind("<Return>", lambda e: showRangeSummary())
+            entry.pack(side="left")
+            rangeEntries.append(entry)
+        rangeFromEntry, rangeToEntry = rangeEntries
+        rangeBtn = tk.Button(
+            rangeFrame,
+            text="Summarize",
+            font=("Segoe UI", 9, "bold"),
+            bg="#1b1f24",
+            fg=self.textColor,
+            activebackground="#2c3440",
+            activeforeground=self.textColor,
+            relief="flat",
+            command=showRangeSummary
+        )
+        rangeBtn.pack(side="left", padx=(8, 0))
+        trendsBtn = tk.Button(
+            rangeFrame,
+            text="Trends",
+            font=("Segoe UI", 9, "bold"),
+            bg="#1b1f24",
+            fg=self.textColor,
+            activebackground="#2c3440",
+            activeforeground=self.textColor,
+            relief="flat",
+            command=showTrends
+        )
+        trendsBtn.pack(side="left", padx=(6, 0))
+
         btnFrame = tk.Frame(histWin, bg=self.bgColor)
-        btnFrame.grid(row=1, column=0, columnspan=4, padx=8, pady=(0, 8), sticky="e")
+        btnFrame.grid(row=2, column=0, columnspan=4, padx=8, pady=(0, 8), sticky="e")
 
         closeBtn = tk.Button(
             btnFrame,
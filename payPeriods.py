@@ -0,0 +1,141 @@
+"""
+Pay-period schedules. A PayPeriodCalendar maps any date to its pay period
+with a little arithmetic (no table of periods is built) and walks the
+periods of a range lazily:
+
+    weekly       7-day periods starting on the anchor's weekday
+    biweekly     14-day periods counted from the anchor date
+    semimonthly  two periods a month, starting on the anchor's day of month
+                 (1-15) and fifteen days later
+    monthly      one period a month, starting on the anchor's day of month
+
+Day-of-month starts past the end of a short month fall on its last day.
+Settings choose the schedule with "payPeriodSchedule" and "payPeriodAnchor".
+"""
+import calendar as _calendar
+from collections import namedtuple
+from datetime import date, timedelta
+
+SCHEDULES = ("weekly", "biweekly", "semimonthly", "monthly")
+DEFAULT_SCHEDULE = "biweekly"
+DEFAULT_ANCHOR = "2025-11-29"
+_FIXED_DAYS = {"weekly": 7, "biweekly": 14}
+
+
+def _asDate(day):
+    return day if isinstance(day, date) else date.fromisoformat(day)
+
+
+def _monthDay(year, month, day):
+    return date(year, month, min(day, _calendar.monthrange(year, month)[1]))
+
+
+class PayPeriod(namedtuple("PayPeriod", "index start end")):
+    """One pay period; `index` counts periods from the calendar's anchor (negative before it)"""
+    __slots__ = ()
+
+    @property
+    def key(self):
+        """ISO date of the first day, which names the period in files and dicts"""
+        return self.start.isoformat()
+
+    @property
+    def days(self):
+        return (self.end - self.start).days + 1
+
+    def dates(self):
+        """ISO dates of every day of the period, in order"""
+        return [(self.start + timedelta(days=i)).isoformat() for i in range(self.days)]
+
+    def contains(self, day):
+        return self.start <= _asDate(day) <= self.end
+
+
+class PayPeriodCalendar:
+    def __init__(self, schedule=DEFAULT_SCHEDULE, anchor=DEFAULT_ANCHOR):
+        schedule = (schedule or DEFAULT_SCHEDULE).strip().lower().replace("-", "")
+        if schedule not in SCHEDULES:
+            raise ValueError(f"unknown pay-period schedule: {schedule}")
+        self.schedule = schedule
+        self.anchor = _asDate(anchor or DEFAULT_ANCHOR)
+        self.periodDays = _FIXED_DAYS.get(schedule)
+        self.anchorMonth = self.anchor.year * 12 + self.anchor.month - 1
+        self.anchorDay = min(self.anchor.day, 15) if schedule == "semimonthly" else self.anchor.day
+
+    @classmethod
+    def fromSettings(cls, settings):
+        """The calendar settings.json asks for; falls back to the default biweekly one when that's invalid"""
+        try:
+            return cls(settings.get("payPeriodSchedule"), settings.get("payPeriodAnchor"))
+        except (TypeError, ValueError, AttributeError):
+            return cls()
+
+    def describe(self):
+        """(schedule, anchor ISO date), e.g. to tell whether data was grouped by this calendar"""
+        return self.schedule, self.anchor.isoformat()
+
+    def _startOfIndex(self, index):
+        if self.periodDays:
+            return self.anchor + timedelta(days=index * self.periodDays)
+        if self.schedule == "monthly":
+            year, month = divmod(self.anchorMonth + index, 12)
+            return _monthDay(year, month + 1, self.anchorDay)
+        year, month = divmod(self.anchorMonth + index // 2, 12)
+        return _monthDay(year, month + 1, self.anchorDay + 15 * (index % 2))
+
+    def _indexOf(self, d):
+        if self.periodDays:
+            return (d - self.anchor).days // self.periodDays
+        month = d.year * 12 + d.month - 1 - self.anchorMonth
+        if self.schedule == "monthly":
+            return month if d >= _monthDay(d.year, d.month, self.anchorDay) else month - 1
+        if d >= _monthDay(d.year, d.month, self.anchorDay + 15):
+            return month * 2 + 1
+        if d >= _monthDay(d.year, d.month, self.anchorDay):
+            return month * 2
+        return month * 2 - 1
+
+    def period(self, index):
+        """The period `index` periods after the anchor's"""
+        return PayPeriod(index, self._startOfIndex(index), self._startOfIndex(index + 1) - timedelta(days=1))
+
+    def periodOf(self, day):
+        """The period holding `day` (a date or ISO string)"""
+        return self.period(self._indexOf(_asDate(day)))
+
+    def keyOf(self, dateKey):
+        """ISO start of the period holding `dateKey`, or None for a malformed date"""
+        try:
+            return self._startOfIndex(self._indexOf(_asDate(dateKey))).isoformat()
+        except (TypeError, ValueError):
+            return None
+
+    def current(self, today=None):
+        return self.periodOf(today or date.today())
+
+    def isCurrent(self, day, today=None):
+        """Whether `day` is in the pay period holding today"""
+        try:
+            return self._indexOf(_asDate(day)) == self._indexOf(today or date.today())
+        except (TypeError, ValueError):
+            return False
+
+    def periodsBetween(self, first, last):
+        """Periods overlapping first..last (dates or ISO strings), oldest first, generated one at a time"""
+        index = self._indexOf(_asDate(first))
+        last = _asDate(last)
+        while True:
+            p = self.period(index)
+            if p.start > last:
+                return
+            yield p
+            index += 1
+
+    def __eq__(self, other):
+        return isinstance(other, PayPeriodCalendar) and self.describe() == other.describe()
+
+    def __hash__(self):
+        return hash(self.describe())
+
+    def __repr__(self):
+        return f"PayPeriodCalendar({self.schedule!r}, {self.anchor.isoformat()!r})"
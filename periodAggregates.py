@@ -0,0 +1,203 @@
+"""
+Per-pay-period task totals for the History window, maintained one day at a
+time: saving a day subtracts what it contributed before and adds its new
+hours, so neither opening History nor saving an edit re-reads every day.
+
+Periods are those of the app's pay-period calendar (payPeriods.py). The
+totals are saved beside the data file as periodTotals.json together with
+the storage's history version and the calendar they were grouped by. When that version doesn't match the loaded
+history (another process wrote, or the backend has no usable version) they
+are rebuilt once from the loaded heads.
+"""
+import json
+import os
+import tempfile
+import threading
+
+from payPeriods import PayPeriodCalendar
+from summaries import entryHoursById
+from taskDictionary import taskDictionary
+
+PERIOD_TOTALS_FILE = "periodTotals.json"
+FORMAT_VERSION = 1
+
+
+def _stampKey(stamp):
+    # compared after a JSON round trip, so tuples and lists must look alike
+    return json.loads(json.dumps(stamp)) if stamp is not None else None
+
+
+class PeriodAggregates:
+    """
+    {periodStart: {"days": set of dates, "hours": {taskId: hours},
+    "taskDays": {taskId: days contributing}, "total": hours}} for the days of
+    the loaded history. A task stays in a period's totals while any of its days
+    lists it (zero hours included), like summing the days would.
+    """
+
+    def __init__(self, path, calendar=None):
+        self.path = path
+        self.calendar = calendar or PayPeriodCalendar()
+        self.lock = threading.Lock()
+        self.periods = {}
+        # False after an in-memory-only change (a cleared day): the totals no longer
+        # describe what storage holds and aren't saved until the next rebuild
+        self.matchesStorage = True
+
+    @classmethod
+    def besideDataFile(cls, dataPath, **kwargs):
+        return cls(os.path.join(os.path.dirname(dataPath) or ".", PERIOD_TOTALS_FILE), **kwargs)
+
+    def _apply(self, startKey, dateKey, entry, sign):
+        p = self.periods.get(startKey)
+        if p is None:
+            if sign < 0:
+                return
+            p = self.periods[startKey] = {"days": set(), "hours": {}, "taskDays": {}, "total": 0.0}
+        aggById, total = entryHoursById(entry)
+        hours = p["hours"]
+        taskDays = p["taskDays"]
+        for tid, h in aggById.items():
+            count = taskDays.get(tid, 0) + sign
+            if count <= 0:
+                taskDays.pop(tid, None)
+                hours.pop(tid, None)
+            else:
+                taskDays[tid] = count
+                hours[tid] = hours.get(tid, 0.0) + sign * h
+        p["total"] += sign * total
+        if sign > 0:
+            p["days"].add(dateKey)
+        else:
+            p["days"].discard(dateKey)
+            if not p["days"]:
+                del self.periods[startKey]
+            elif not hours:
+                p["total"] = 0.0
+
+    def replaceDay(self, dateKey, oldEntry, newEntry, saved=True):
+        """
+        Swap one day's contribution: `oldEntry` (None if the day is new) out,
+        `newEntry` (None if the day is gone) in. `saved` is False for changes
+        that only exist in memory.
+        """
+        startKey = self.calendar.keyOf(dateKey)
+        if startKey is None:
+            return
+        with self.lock:
+            p = self.periods.get(startKey)
+            if oldEntry is not None and p is not None and dateKey in p["days"]:
+                self._apply(startKey, dateKey, oldEntry, -1)
+            if newEntry is not None:
+                self._apply(startKey, dateKey, newEntry, 1)
+            if not saved:
+                self.matchesStorage = False
+
+    def hasPeriod(self, startKey):
+        return startKey in self.periods
+
+    def rebuild(self, history):
+        """Recompute every period from `history` ({date: entry})"""
+        with self.lock:
+            self.periods = {}
+            self.matchesStorage = True
+            for dateKey, entry in history.items():
+                startKey = self.calendar.keyOf(dateKey)
+                if startKey is not None:
+                    self._apply(startKey, dateKey, entry, 1)
+
+    def period(self, startKey):
+        """{"start", "end", "days" (newest first), "agg" ({task: hours}), "total"} or None"""
+        with self.lock:
+            p = self.periods.get(startKey)
+            if p is None:
+                return None
+            pp = self.calendar.periodOf(startKey)
+            return {
+                "start": pp.start,
+                "end": pp.end,
+                "days": sorted(p["days"], reverse=True),
+                "agg": taskDictionary.nameKeys(p["hours"]),
+                "total": p["total"],
+            }
+
+    def periodList(self):
+        """Every period as period() gives it, newest first"""
+        return [self.period(k) for k in sorted(self.periods, reverse=True)]
+
+    def load(self, stamp, history):
+        """
+        Take the saved totals if they were saved for `stamp` and cover exactly
+        the days of `history`; otherwise rebuild them from `history` and save.
+        Returns True when the saved totals were used.
+        """
+        if self._read(stamp, len(history)):
+            return True
+        self.rebuild(history)
+        self.save(stamp)
+        return False
+
+    def _read(self, stamp, dayCount):
+        if stamp is None:
+            return False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                doc = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if not isinstance(doc, dict) or doc.get("version") != FORMAT_VERSION or doc.get("stamp") != _stampKey(stamp):
+            return False
+        if doc.get("calendar") != list(self.calendar.describe()):
+            return False
+        periods = {}
+        try:
+            for startKey, saved in doc["periods"].items():
+                periods[startKey] = {
+                    "days": set(saved["days"]),
+                    "hours": taskDictionary.idKeys(saved["hoursByTask"]),
+                    "taskDays": taskDictionary.idKeys(saved["taskDays"]),
+                    "total": float(saved["total"]),
+                }
+        except (KeyError, TypeError, ValueError, AttributeError):
+            return False
+        if sum(len(p["days"]) for p in periods.values()) != dayCount:
+            return False
+        with self.lock:
+            self.periods = periods
+            self.matchesStorage = True
+        return True
+
+    def save(self, stamp):
+        """Write the totals for history version `stamp`; skipped when there is nothing they'd be valid for"""
+        if stamp is None or not self.matchesStorage:
+            return False
+        with self.lock:
+            doc = {
+                "version": FORMAT_VERSION,
+                "stamp": _stampKey(stamp),
+                "calendar": list(self.calendar.describe()),
+                "periods": {
+                    startKey: {
+                        "days": sorted(p["days"]),
+                        "hoursByTask": taskDictionary.nameKeys(p["hours"]),
+                        "taskDays": taskDictionary.nameKeys(p["taskDays"]),
+                        "total": p["total"],
+                    }
+                    for startKey, p in self.periods.items()
+                },
+            }
+        dirpath = os.path.dirname(self.path) or "."
+        try:
+            tmp = tempfile.NamedTemporaryFile(mode="w", encoding="utf-8", delete=False, dir=dirpath, suffix=".tmp")
+        except OSError:
+            return False
+        try:
+            json.dump(doc, tmp, separators=(",", ":"))
+            tmp.close()
+            os.replace(tmp.name, self.path)
+        except Exception:
+            tmp.close()
+            if os.path.exists(tmp.name):
+                os.remove(tmp.name)
+            return False
+        return True
@@ -4,180 +4,7 @@ from http.cookiejar import MozillaCookieJar
 from typing import Any, Dict, Optional, Tuple
 from datetime import date, datetime
 import requests
-import json
-
-def insertChargeCodesBetweenGroupAndHistory(path, chargeCodeIdModels):
-    tmpPath = path + ".tmp"
-
-    def chunk4(arr):
-        for i in range(0, len(arr), 4):
-            yield arr[i:i + 4]
-
-    def normalizeModel(m):
-        if not isinstance(m, dict):
-            return None
-
-        ccId = m.get("chargeCodeId") or m.get("chargeCodeID") or m.get("chargeCodeId".upper())
-        name = m.get("chargeCodeName")
-        typ = m.get("type")
-        hier = m.get("hierarchicalName")
-        leave = m.get("leave")
-
-        return {
-            "chargeCodeId": ccId,
-            "chargeCodeName": name,
-            "type": typ,
-            "hierarchicalName": hier,
-            "leave": bool(leave) if leave is not None else False,
-        }
-
-    def chunkSignature(chunk):
-        ids = []
-        for x in chunk:
-            if isinstance(x, dict):
-                ids.append(x.get("chargeCodeId"))
-            else:
-                ids.append(None)
-        while len(ids) < 4:
-            ids.append(None)
-        return tuple(ids[:4])
-
-    def isAllNullIds(sig):
-        return all(x is None for x in sig)
-
-    def existingSignatureFromChargeCodeRecord(rec):
-        chunk = rec.get("chargeCodes")
-        if not isinstance(chunk, list):
-            return None
-        return chunkSignature(chunk)
-
-    def mkChargeCodeLine(groupKey, chunkIndex, chunk):
-        obj = {
-            "type": "chargeCode",
-            "groupKey": groupKey,
-            "chunkIndex": chunkIndex,
-            "chargeCodes": chunk,
-        }
-        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False) + "\n"
-
-    normalized = []
-    for m in (chargeCodeIdModels or []):
-        nm = normalizeModel(m)
-        if nm is None:
-            nm = {
-                "chargeCodeId": None,
-                "chargeCodeName": None,
-                "type": None,
-                "hierarchicalName": None,
-                "leave": False,
-            }
-        normalized.append(nm)
-
-    if not normalized:
-        return
-
-    if (len(normalized) % 4) != 0:
-        pad = 4 - (len(normalized) % 4)
-        for _ in range(pad):
-            normalized.append({
-                "chargeCodeId": None,
-                "chargeCodeName": None,
-                "type": None,
-                "hierarchicalName": None,
-                "leave": False,
-            })
-
-    with open(path, "r", encoding="utf-8") as src, open(tmpPath, "w", encoding="utf-8") as dst:
-        inGroup = False
-        groupKey = ""
-        seenChargeCodeSigs = set()
-        insertedSigs = set()
-        maxChunkIndex = -1
-        inserted_any = False
-        saw_group = False
-        saw_history = False
-
-        def insertMissingChargeCodes():
-            nonlocal insertedSigs, maxChunkIndex, inserted_any
-
-            nextChunkIndex = maxChunkIndex + 1
-            wrote = 0
-            for chunk in chunk4(normalized):
-                sig = chunkSignature(chunk)
-                if isAllNullIds(sig):
-                    continue
-                if sig in seenChargeCodeSigs or sig in insertedSigs:
-                    continue
-
-                dst.write(mkChargeCodeLine(groupKey, nextChunkIndex, chunk))
-                insertedSigs.add(sig)
-                nextChunkIndex += 1
-                wrote += 1
-            if wrote:
-                inserted_any = True
-            return wrote
-
-        for rawLine in src:
-            stripped = rawLine.strip()
-            if not stripped:
-                dst.write(rawLine)
-                continue
-
-            try:
-                rec = json.loads(stripped)
-            except Exception:
-                dst.write(rawLine)
-                continue
-
-            recType = rec.get("type")
-
-            if recType == "group":
-                dst.write(rawLine)
-                saw_group = True
-                inGroup = True
-                insertedSigs = set()
-                seenChargeCodeSigs = set()
-                maxChunkIndex = -1
-                groupKey = rec.get("groupKey") or rec.get("key") or rec.get("name") or ""
-                continue
-
-            if inGroup and recType == "chargeCode":
-                try:
-                    ci = rec.get("chunkIndex")
-                    if ci is not None:
-                        maxChunkIndex = max(maxChunkIndex, int(ci))
-                except Exception:
-                    pass
-
-                sig = existingSignatureFromChargeCodeRecord(rec)
-                if sig is not None:
-                    seenChargeCodeSigs.add(sig)
-
-                dst.write(rawLine)
-                continue
-
-            if inGroup and recType == "history":
-                saw_history = True
-                insertMissingChargeCodes()
-                inGroup = False
-                dst.write(rawLine)
-                continue
-
-            if recType == "history":
-                saw_history = True
-
-            dst.write(rawLine)
-
-        # If we never found a group/history section to insert into, append at the end.
-        if not inserted_any and (not saw_group or not saw_history):
-            groupKey = ""
-            maxChunkIndex = -1
-            insertedSigs = set()
-            seenChargeCodeSigs = set()
-            insertMissingChargeCodes()
-
-    os.replace(tmpPath, path)
-
+from storage import openStorage
 
 def loadEnv(path="posting.env"):
     if not os.path.exists(path):
@@ -418,7 +245,11 @@ def main() -> int:
     timesheetId = timesheetData["timesheetId"]
     chargeCodeIdModels = timesheetData["chargeCodeIDModels"]
 
-    insertChargeCodesBetweenGroupAndHistory(os.path.join(_baseDir, "tasks.jsonl"), chargeCodeIdModels)
+    from settings import loadSettings
+    storage = openStorage(_baseDir, loadSettings(os.path.join(_baseDir, "settings.json")))
+    storage.insertChargeCodes(chargeCodeIdModels)
+    # sync the write before this short-lived process exits
+    storage.waitForBackgroundWork()
     #postHoursWorked(s, employeeId, timesheetId, chargeCodeIdModels)
 
 ##    print(timesheetId, chargeCodeIdModels)
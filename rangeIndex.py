@@ -0,0 +1,244 @@
+"""
+Hours over arbitrary date ranges without walking history: one Fenwick tree
+(binary indexed tree) over day ordinals per task, per group and for the day
+totals. Saving a day adds the difference to each of its tasks' trees, and
+any from..to query is two prefix sums, both O(log days).
+
+The index is built from the loaded history on the first query, so startup
+doesn't pay for it. It only covers days in that history; callers load
+archived periods in a range first (TaskTrackerApp.hoursBetween does).
+"""
+import threading
+from array import array
+from datetime import date
+
+from summaries import entryHoursById
+from taskDictionary import taskDictionary
+
+# room left on each side when the covered days have to grow
+GROWTH_DAYS = 366
+
+
+def _ordinal(day):
+    return (day if isinstance(day, date) else date.fromisoformat(day)).toordinal()
+
+
+class FenwickTree:
+    """Prefix sums over a fixed number of float slots, with O(log n) point updates"""
+    __slots__ = ("values", "tree")
+
+    def __init__(self, values):
+        self.values = array("d", values)
+        n = len(self.values)
+        tree = array("d", [0.0]) + self.values
+        # linear-time build: push each node into its parent once
+        for i in range(1, n + 1):
+            j = i + (i & -i)
+            if j <= n:
+                tree[j] += tree[i]
+        self.tree = tree
+
+    def add(self, i, delta):
+        self.values[i] += delta
+        tree = self.tree
+        n = len(tree)
+        i += 1
+        while i < n:
+            tree[i] += delta
+            i += i & -i
+
+    def prefix(self, i):
+        """Sum of slots [0, i)"""
+        tree = self.tree
+        total = 0.0
+        while i > 0:
+            total += tree[i]
+            i &= i - 1
+        return total
+
+    def rangeSum(self, lo, hi):
+        """Sum of slots [lo, hi)"""
+        return self.prefix(hi) - self.prefix(lo)
+
+
+class HoursIndex:
+    """
+    Per-task, per-group and total hours by day, for range queries.
+    `historySource` and `groupsSource` return the app's current history
+    ({date: entry}) and groups ({task: group}); group trees are rebuilt when
+    the groups differ from the ones they were summed for.
+    """
+
+    def __init__(self, historySource, groupsSource=dict):
+        self.historySource = historySource
+        self.groupsSource = groupsSource
+        self.lock = threading.RLock()
+        self.built = False
+        # ordinal of slot 0, and the number of slots
+        self.base = 0
+        self.size = 0
+        self.tasks = {}
+        self.groups = {}
+        self.groupOf = {}
+        self.total = None
+
+    def invalidate(self):
+        """Drop the index; the next query rebuilds it from the history source"""
+        with self.lock:
+            self.built = False
+            self.tasks = {}
+            self.groups = {}
+            self.total = None
+
+    def _build(self):
+        history = self.historySource()
+        days = {}
+        for dateKey, entry in history.items():
+            try:
+                days[_ordinal(dateKey)] = entryHoursById(entry)
+            except (TypeError, ValueError):
+                continue
+        today = date.today().toordinal()
+        self.base = min(days, default=today) - GROWTH_DAYS
+        self.size = max(max(days, default=today), today) + GROWTH_DAYS - self.base
+        columns = {}
+        totals = [0.0] * self.size
+        for ordinal, (aggById, dayTotal) in days.items():
+            slot = ordinal - self.base
+            totals[slot] = dayTotal
+            for tid, hours in aggById.items():
+                column = columns.get(tid)
+                if column is None:
+                    column = columns[tid] = [0.0] * self.size
+                column[slot] = hours
+        self.tasks = {tid: FenwickTree(column) for tid, column in columns.items()}
+        self.total = FenwickTree(totals)
+        self.groupOf = {}
+        self.groups = {}
+        self.built = True
+
+    def _ready(self):
+        if not self.built:
+            self._build()
+
+    def _syncGroups(self):
+        groupOf = {taskDictionary.idFor(task): group for task, group in dict(self.groupsSource() or {}).items() if group}
+        if groupOf == self.groupOf:
+            return
+        columns = {}
+        for tid, group in groupOf.items():
+            tree = self.tasks.get(tid)
+            if tree is None:
+                continue
+            column = columns.get(group)
+            if column is None:
+                columns[group] = array("d", tree.values)
+            else:
+                for i, v in enumerate(tree.values):
+                    if v:
+                        column[i] += v
+        self.groups = {group: FenwickTree(column) for group, column in columns.items()}
+        self.groupOf = groupOf
+
+    def _grow(self, ordinal):
+        """Re-lay every tree so `ordinal` has a slot"""
+        lo = min(self.base, ordinal - GROWTH_DAYS)
+        hi = max(self.base + self.size, ordinal + GROWTH_DAYS)
+        pad = [0.0] * (self.base - lo)
+        tail = [0.0] * (hi - self.base - self.size)
+
+        def relaid(tree):
+            return FenwickTree(pad + list(tree.values) + tail)
+
+        self.tasks = {tid: relaid(tree) for tid, tree in self.tasks.items()}
+        self.groups = {group: relaid(tree) for group, tree in self.groups.items()}
+        self.total = relaid(self.total)
+        self.base = lo
+        self.size = hi - lo
+
+    def replaceDay(self, dateKey, oldEntry, newEntry):
+        """Move one day from `oldEntry`'s hours to `newEntry`'s (either may be None); O(tasks · log days)"""
+        with self.lock:
+            if not self.built:
+                # built from the history source on first use, which already has the change
+                return
+            try:
+                ordinal = _ordinal(dateKey)
+            except (TypeError, ValueError):
+                return
+            if not (self.base <= ordinal < self.base + self.size):
+                self._grow(ordinal)
+            slot = ordinal - self.base
+            deltas = {}
+            dayDelta = 0.0
+            for entry, sign in ((oldEntry, -1), (newEntry, 1)):
+                if entry is None:
+                    continue
+                aggById, dayTotal = entryHoursById(entry)
+                dayDelta += sign * dayTotal
+                for tid, hours in aggById.items():
+                    deltas[tid] = deltas.get(tid, 0.0) + sign * hours
+            for tid, delta in deltas.items():
+                if not delta:
+                    continue
+                tree = self.tasks.get(tid)
+                if tree is None:
+                    tree = self.tasks[tid] = FenwickTree([0.0] * self.size)
+                tree.add(slot, delta)
+                group = self.groupOf.get(tid)
+                if group is not None:
+                    groupTree = self.groups.get(group)
+                    if groupTree is None:
+                        groupTree = self.groups[group] = FenwickTree([0.0] * self.size)
+                    groupTree.add(slot, delta)
+            if dayDelta:
+                self.total.add(slot, dayDelta)
+
+    def _slots(self, startKey, endKey):
+        """[lo, hi) slots of startKey..endKey (inclusive dates), clamped to the covered days; empty (lo == hi) when they don't overlap"""
+        lo = min(max(0, _ordinal(startKey) - self.base), self.size)
+        hi = min(max(0, _ordinal(endKey) - self.base + 1), self.size)
+        return lo, max(lo, hi)
+
+    def taskHours(self, task, startKey, endKey):
+        """Hours on `task` from startKey to endKey, both ISO dates and inclusive"""
+        with self.lock:
+            self._ready()
+            tree = self.tasks.get(taskDictionary.idFor(task))
+            return tree.rangeSum(*self._slots(startKey, endKey)) if tree is not None else 0.0
+
+    def groupHours(self, group, startKey, endKey):
+        with self.lock:
+            self._ready()
+            self._syncGroups()
+            tree = self.groups.get(group)
+            return tree.rangeSum(*self._slots(startKey, endKey)) if tree is not None else 0.0
+
+    def totalHours(self, startKey, endKey):
+        with self.lock:
+            self._ready()
+            return self.total.rangeSum(*self._slots(startKey, endKey))
+
+    def hoursByTask(self, startKey, endKey):
+        """{task: hours} of every task with time in the range; O(tasks · log days)"""
+        with self.lock:
+            self._ready()
+            lo, hi = self._slots(startKey, endKey)
+            byId = {}
+            for tid, tree in self.tasks.items():
+                hours = tree.rangeSum(lo, hi)
+                if abs(hours) > 1e-9:
+                    byId[tid] = hours
+            return taskDictionary.nameKeys(byId)
+
+    def hoursByGroup(self, startKey, endKey):
+        with self.lock:
+            self._ready()
+            self._syncGroups()
+            lo, hi = self._slots(startKey, endKey)
+            byGroup = {}
+            for group, tree in self.groups.items():
+                hours = tree.rangeSum(lo, hi)
+                if abs(hours) > 1e-9:
+                    byGroup[group] = hours
+            return byGroup
@@ -0,0 +1,168 @@
+import json
+import os
+import time
+
+# while a task or untasked time is running, a "beat" line is logged this often so a
+# crash loses at most this much time
+HEARTBEAT_SECONDS = 60
+
+
+class SessionLog:
+    """
+    Append-only write-ahead log of the running day (session.wal next to tasks.jsonl).
+
+    Every change to the live session (task started/stopped, untasked time
+    started/stopped, timeline segment recorded, task dropped) is one short
+    JSON line appended to an open handle, so logging is O(1). A heartbeat line
+    marks that a running session was still alive. The log is reset
+    whenever the day is saved or cleared; after a crash it is replayed on
+    startup to rebuild the session.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fh = None
+        self.dayKey = None
+        self.lastBeat = None
+
+    def _write(self, obj):
+        if self.fh is None:
+            return
+        try:
+            self.fh.write(json.dumps(obj, ensure_ascii=False, separators=(",", ":")) + "\n")
+            self.fh.flush()
+        except Exception:
+            pass
+
+    def append(self, event, **fields):
+        obj = {"e": event}
+        obj.update(fields)
+        self._write(obj)
+
+    def heartbeat(self, t):
+        """Log that the session was alive at `t`, at most once every HEARTBEAT_SECONDS"""
+        if self.lastBeat is None or t - self.lastBeat >= HEARTBEAT_SECONDS:
+            self.lastBeat = t
+            self.append("beat", t=t)
+
+    def open(self, dayKey):
+        """Start appending to the log for `dayKey` (after recover() has consumed any old contents)"""
+        self.close()
+        self.dayKey = dayKey
+        self.lastBeat = None
+        try:
+            exists = os.path.exists(self.path) and os.path.getsize(self.path) > 0
+            self.fh = open(self.path, "a", encoding="utf-8", newline="")
+        except Exception:
+            self.fh = None
+            return
+        if not exists:
+            self._write({"e": "day", "date": dayKey})
+
+    def reset(self, dayKey=None):
+        """Drop all logged events; the session they describe has been saved or discarded"""
+        dayKey = dayKey or self.dayKey
+        self.close()
+        try:
+            with open(self.path, "w", encoding="utf-8", newline="") as f:
+                f.write(json.dumps({"e": "day", "date": dayKey}, separators=(",", ":")) + "\n")
+        except Exception:
+            pass
+        self.open(dayKey)
+
+    def close(self):
+        if self.fh is not None:
+            try:
+                self.fh.close()
+            except Exception:
+                pass
+            self.fh = None
+
+    def recover(self, dayKey):
+        """
+        Return the events logged for `dayKey`. A log left over from an earlier
+        day is moved aside to session-<date>.wal instead of being replayed.
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return []
+
+        loggedDay = None
+        events = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+            except Exception:
+                # a torn final line from a crash mid-write
+                continue
+            if not isinstance(obj, dict):
+                continue
+            if obj.get("e") == "day":
+                loggedDay = obj.get("date")
+                continue
+            events.append(obj)
+
+        if loggedDay != dayKey:
+            if events:
+                try:
+                    aside = os.path.join(os.path.dirname(self.path), f"session-{loggedDay or 'unknown'}.wal")
+                    os.replace(self.path, aside)
+                except Exception:
+                    pass
+            else:
+                try:
+                    os.remove(self.path)
+                except Exception:
+                    pass
+            return []
+        return events
+
+
+def replayEvents(app, events):
+    """Re-apply logged session events to a freshly loaded TaskTrackerApp"""
+    for ev in events:
+        kind = ev.get("e")
+        t = ev.get("t")
+        if kind == "start":
+            app.currentTask = ev.get("task")
+            app.currentStart = t
+            app.hasEverSelectedTask = True
+            app.hasUnsavedTime = True
+        elif kind == "stop":
+            task = ev.get("task")
+            if task is not None and app.currentStart is not None:
+                app.tasks[task] = app.tasks.get(task, 0.0) + (t - app.currentStart)
+            app.currentTask = None
+            app.currentStart = None
+        elif kind == "ustart":
+            app.unassignedStart = t
+            app.hasUnsavedTime = True
+        elif kind == "ustop":
+            if app.unassignedStart is not None:
+                app.unassignedSeconds += t - app.unassignedStart
+            app.unassignedStart = None
+        elif kind == "seg":
+            app.dayTimeline.appendIso(ev.get("task"), ev.get("start"), ev.get("end"))
+        elif kind == "drop":
+            app.tasks.pop(ev.get("task"), None)
+
+
+def lastEventTime(events):
+    """Epoch time of the latest logged event (heartbeats and segment ends included), or None"""
+    last = None
+    for ev in events:
+        times = [ev.get("t")]
+        if ev.get("e") == "seg":
+            try:
+                times.append(time.mktime(time.strptime(ev.get("end") or "", "%Y-%m-%dT%H:%M:%S")))
+            except (TypeError, ValueError):
+                pass
+        for t in times:
+            if isinstance(t, (int, float)) and (last is None or t > last):
+                last = t
+    return last
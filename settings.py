@@ -36,7 +36,19 @@ DEFAULT_SETTINGS = {
     "mainWindowHeight": 400,
     "useTimesheetFunctions": False,
     "autoChargeCodes": False,
-    "useDefaultBaseUrl": True
+    "useDefaultBaseUrl": True,
+    "storageBackend": "jsonl",
+    "journalHistory": False,
+    "journalCompactThreshold": 50,
+    "historyIndex": False,
+    "durability": "batched",
+    "durabilityFlushSeconds": 5,
+    "quarantineBadLines": True,
+    "archiveClosedPeriods": False,
+    "archiveKeepPeriods": 2,
+    "archiveCompression": "gzip",
+    "payPeriodSchedule": "biweekly",
+    "payPeriodAnchor": "2025-11-29"
 }
 
 DEFAULT_BASE_URL = "https://nearspacelaunch.hourtimesheet.com"
@@ -55,32 +67,9 @@ def loadSettings(settingsPath):
     except Exception:
         return dict(DEFAULT_SETTINGS)
 
-def loadChargeCodesFromJsonl(dataFile):
-    """Extract charge codes grouped by chunk from JSONL file"""
-    chunks = []
-    if not os.path.exists(dataFile):
-        return chunks
-    try:
-        with open(dataFile, "r", encoding="utf-8") as f:
-            for raw in f:
-                line = raw.strip()
-                if not line or line.startswith("//"):
-                    continue
-                try:
-                    obj = json.loads(line)
-                except Exception:
-                    continue
-                if obj.get("type") == "chargeCode":
-                    codes = obj.get("chargeCodes", [])
-                    if codes:
-                        chunks.append(codes)
-    except Exception:
-        pass
-    return chunks
-
 def openSettings(app):
     settingsPath = os.path.join(app.getDataDir(), "settings.json")
-    dataFile = app.realPath if hasattr(app, "realPath") else os.path.join(app.getDataDir(), "tasks.jsonl")
+    storage = app.storage
 
 
     def parseTimeHHMM(s, fallback):
@@ -129,8 +118,9 @@ def openSettings(app):
         with open(settingsPath, "w", encoding="utf-8") as f:
             json.dump(settings, f, indent=2)
 
-        # Write charge code mappings to JSONL
-        updateChargeCodesInJsonl(dataFile, chargeCodeChunks, chargeCodeVars)
+        # Write charge code mappings (and any pending task/group changes) in one batch
+        with app.unitOfWork() as batch:
+            updateChargeCodeMappings(batch, chargeCodeVars)
 
         app.settings = settings
         app.minSegmentSeconds = int(m * 60)
@@ -145,7 +135,6 @@ def openSettings(app):
         win.destroy()
 
     settings = loadSettings(settingsPath)
-    chargeCodes = loadChargeCodesFromJsonl(dataFile)
     groupChargeCodeMap = dict(settings.get("groupChargeCodeMap", {}))
 
     win = tk.Toplevel(app.root)
@@ -542,23 +531,6 @@ def openSettings(app):
     chargeCodeVars = {}
     chargeCodeChunks = []
 
-    def readGroupKeyForChunk(chunkIdx):
-        try:
-            with open(dataFile, "r", encoding="utf-8") as f:
-                for raw in f:
-                    line = raw.strip()
-                    if not line:
-                        continue
-                    try:
-                        obj = json.loads(line)
-                    except Exception:
-                        continue
-                    if obj.get("type") == "chargeCode" and obj.get("chunkIndex") == chunkIdx:
-                        return (obj.get("groupKey") or "").strip()
-        except Exception:
-            return ""
-        return ""
-
     def rebuildChargeCodeTable():
         nonlocal chargeCodeChunks, chargeCodeVars
 
@@ -566,7 +538,12 @@ def openSettings(app):
             child.destroy()
 
         chargeCodeVars = {}
-        chargeCodeChunks = loadChargeCodesFromJsonl(dataFile)
+        # codes and their group keys in one read of the charge-code store
+        try:
+            chargeCodeTable = storage.loadChargeCodeTable()
+        except Exception:
+            chargeCodeTable = []
+        chargeCodeChunks = [codes for codes, _ in chargeCodeTable]
 
         if not chargeCodeChunks:
             noCodesLabel = tk.Label(
@@ -582,7 +559,7 @@ def openSettings(app):
             scrollCanvas.config(scrollregion=scrollCanvas.bbox("all"))
             return
 
-        for chunkIdx, chunkCodes in enumerate(chargeCodeChunks):
+        for chunkIdx, (chunkCodes, currentGroup) in enumerate(chargeCodeTable):
             rowFrame = tk.Frame(tableFrame, bg=app.cardColor)
             rowFrame.grid(row=chunkIdx, column=0, columnspan=2, sticky="ew", padx=0, pady=6)
             rowFrame.columnconfigure(0, weight=1)
@@ -600,8 +577,6 @@ def openSettings(app):
             )
             codesLabel.grid(row=0, column=0, sticky="w", padx=12, pady=6)
 
-            currentGroup = readGroupKeyForChunk(chunkIdx)
-
             chunkVar = tk.StringVar(value=currentGroup)
             chargeDrop = tk.OptionMenu(rowFrame, chunkVar, *taskGroupOptions)
             chargeDrop.grid(row=0, column=1, sticky="ew", padx=12, pady=6)
@@ -635,7 +610,7 @@ def openSettings(app):
                 if not models:
                     raise RuntimeError("No charge codes returned from copyPreviousTimesheet")
 
-                posting.insertChargeCodesBetweenGroupAndHistory(dataFile, models)
+                storage.insertChargeCodes(models)
 
                 win.after(0, rebuildChargeCodeTable)
 
@@ -670,6 +645,32 @@ def openSettings(app):
     btnFrame = tk.Frame(win, bg=app.bgColor)
     btnFrame.pack(fill="x", padx=14, pady=(0, 12))
 
+    def vacuumDataFile():
+        from vacuum import formatReport
+        # pending task/group edits go in first so the rewrite includes them
+        app.flushPendingWrites()
+        try:
+            report = storage.vacuum()
+        except Exception as e:
+            messagebox.showerror("Vacuum failed", str(e), parent=win)
+            return
+        # chunk ordinals change when dead chunks are dropped
+        rebuildChargeCodeTable()
+        messagebox.showinfo("Vacuum", formatReport(report), parent=win)
+
+    vacuumBtn = tk.Button(
+        btnFrame,
+        text="Vacuum Data File",
+        font=("Segoe UI", 10),
+        bg="#1b1f24",
+        fg=app.textColor,
+        activebackground="#2c3440",
+        activeforeground=app.textColor,
+        relief="flat",
+        command=vacuumDataFile
+    )
+    vacuumBtn.pack(side="left")
+
     def saveSettings():
         start = parseTimeHHMM(workStartVar.get(), settings.get("workDayStart", "09:00"))
         end = parseTimeHHMM(workEndVar.get(), settings.get("workDayEnd", "17:00"))
@@ -707,8 +708,9 @@ def openSettings(app):
         with open(settingsPath, "w", encoding="utf-8") as f:
             json.dump(settings, f, indent=2)
 
-        # Write charge code mappings to JSONL
-        updateChargeCodesInJsonl(dataFile, chargeCodeChunks, chargeCodeVars)
+        # Write charge code mappings (and any pending task/group changes) in one batch
+        with app.unitOfWork() as batch:
+            updateChargeCodeMappings(batch, chargeCodeVars)
 
         baseUrlVal = baseUrlVar.get().strip()
         emailVal = emailVar.get().strip()
@@ -768,52 +770,14 @@ def openSettings(app):
     applyBaseUrlState()
 
 
-def updateChargeCodesInJsonl(dataFile, chargeCodeChunks, chargeCodeVars):
-    if not os.path.exists(dataFile):
-        return
-
-    tmpPath = dataFile + ".tmp"
-
-    try:
-        ccIdx = 0
-
-        with open(dataFile, "r", encoding="utf-8") as src, open(tmpPath, "w", encoding="utf-8") as dst:
-            for raw in src:
-                line = raw.strip()
-                if not line or line.startswith("//"):
-                    dst.write(raw)
-                    continue
-
-                try:
-                    obj = json.loads(line)
-                except Exception:
-                    dst.write(raw)
-                    continue
-
-                if obj.get("type") != "chargeCode":
-                    dst.write(raw)
-                    continue
-
-                groupKey = chargeCodeVars.get(ccIdx, tk.StringVar()).get().strip()
-                if not groupKey or groupKey == "<None>":
-                    groupKey = ""
-
-                obj["groupKey"] = groupKey
-
-                dst.write(json.dumps(obj, ensure_ascii=False, separators=(",", ":")) + "\n")
-                ccIdx += 1
-
-        os.replace(tmpPath, dataFile)
-
-    except Exception as e:
-        try:
-            if os.path.exists(tmpPath):
-                os.remove(tmpPath)
-        except Exception:
-            pass
-        print(f"Error updating charge codes in JSONL: {e}")
-        import traceback
-        traceback.print_exc()
+def updateChargeCodeMappings(batch, chargeCodeVars):
+    groupKeys = {}
+    for ccIdx, var in chargeCodeVars.items():
+        groupKey = var.get().strip()
+        if not groupKey or groupKey == "<None>":
+            groupKey = ""
+        groupKeys[ccIdx] = groupKey
+    batch.setChargeCodeGroupKeys(groupKeys)
 
 def updatePostingEnv(baseDir, baseUrl="", email="", password=""):
     """Update posting.env with provided credentials, keeping existing values if not provided"""
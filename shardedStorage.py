@@ -0,0 +1,369 @@
+import os
+import sys
+import tempfile
+from docCache import documentCache
+from durability import Durability
+from fileLock import fileVersion, lockFor
+from historyIndex import HistoryIndex
+from jsonlReader import mappedFile
+from lazyHistory import LazyHistoryEntry, TimelineCache
+from payPeriods import PayPeriodCalendar
+from storage import JsonlStorage, dumpRecord, historyEntryFromRecord, scanRecords
+from summaries import withSummaryNumbers
+from timeline import encodeHistoryRecord
+
+# shards keep the default biweekly layout whatever schedule the History window
+# groups by, so changing "payPeriodSchedule" never has to move files
+SHARD_CALENDAR = PayPeriodCalendar()
+
+SHARD_PREFIX = "history-"
+
+
+def payPeriodStart(dateKey):
+    return SHARD_CALENDAR.periodOf(dateKey).start
+
+
+class ShardedStorage:
+    """
+    History split into one JSONL shard per pay period (shards/history-<start>.jsonl),
+    with tasks and groups in a small shards/header.jsonl and charge codes in
+    shards/chargeCodes.jsonl.
+
+    Saving a day rewrites only that day's shard, so per-save I/O is bounded by
+    one pay period; shards of closed periods are never touched again unless a
+    day in them is edited.
+    """
+    kind = "sharded"
+
+    def __init__(self, shardDir, durability=None, quarantine=False, chargeCodes=None):
+        self.shardDir = shardDir
+        os.makedirs(shardDir, exist_ok=True)
+        self.durability = durability if durability is not None else Durability("none")
+        self.quarantine = quarantine
+        if chargeCodes is None:
+            from chargeCodeStore import CHARGE_CODE_FILE, ChargeCodeStore
+            chargeCodes = ChargeCodeStore(os.path.join(shardDir, CHARGE_CODE_FILE), durability=self.durability)
+        self.header = JsonlStorage(os.path.join(shardDir, "header.jsonl"), durability=self.durability,
+                                   quarantine=quarantine, chargeCodes=chargeCodes)
+        self.migrationReport = None
+        self.integrityReport = None
+        # serializes shard rewrites with other processes using the same shard directory
+        self.lock = lockFor(os.path.join(shardDir, "history"))
+        self.indexes = {}
+        self.timelines = TimelineCache(self._readTimeline)
+        # shard path -> file version its loaded history matches (see refresh())
+        self.shardVersions = {}
+
+    def _shardPath(self, periodStart):
+        return os.path.join(self.shardDir, f"{SHARD_PREFIX}{periodStart.isoformat()}.jsonl")
+
+    def _shardPathForDate(self, dateKey):
+        try:
+            return self._shardPath(payPeriodStart(dateKey))
+        except ValueError:
+            # undated/odd keys still need a home
+            return os.path.join(self.shardDir, f"{SHARD_PREFIX}undated.jsonl")
+
+    def _shardPaths(self):
+        try:
+            names = sorted(os.listdir(self.shardDir))
+        except OSError:
+            return []
+        return [
+            os.path.join(self.shardDir, n) for n in names
+            if n.startswith(SHARD_PREFIX) and n.endswith(".jsonl")
+        ]
+
+    def _index(self, shardPath):
+        index = self.indexes.get(shardPath)
+        if index is None:
+            index = self.indexes[shardPath] = HistoryIndex(shardPath, persist=False)
+        return index
+
+    def isEmpty(self):
+        return not os.path.exists(self.header.path) and not self._shardPaths()
+
+    def waitForBackgroundWork(self):
+        self.durability.flush()
+
+    def vacuum(self):
+        """Vacuum the header and every shard; returns the combined report"""
+        from vacuum import combineReports, vacuumFile
+        reports = [self.header.vacuum()]
+        with self.lock:
+            for shardPath in self._shardPaths():
+                reports.append(vacuumFile(shardPath, self.lock, self.durability))
+                self._index(shardPath).rebuild()
+        self.timelines.clear()
+        return combineReports(reports)
+
+    def historyVersion(self):
+        """Versions of the shards the caller's loaded history matches (see JsonlStorage.historyVersion)"""
+        return sorted((os.path.basename(path), version) for path, version in self.shardVersions.items())
+
+    def archivedPeriods(self):
+        # closed pay periods are only archived by the jsonl backend
+        return []
+
+    def archivedPeriodCovering(self, dateKey):
+        return None
+
+    def loadArchivedPeriod(self, startKey):
+        return {}
+
+    def _scanShard(self, shardPath):
+        with mappedFile(shardPath) as (data, st):
+            return scanRecords(data), st
+
+    def load(self):
+        loaded = self.header.load()
+        history = {}
+        self.timelines.clear()
+        self.integrityReport = self.header.integrityReport
+        self.header.integrityReport = None
+        self.shardVersions = {}
+        for shardPath in self._shardPaths():
+            for d, head in self._loadShard(shardPath).items():
+                history[d] = LazyHistoryEntry(head, d, self.timelines)
+        if loaded is None and not history:
+            return None
+        tasks_list, groups, _ = loaded if loaded is not None else ([], {}, {})
+        return tasks_list, groups, dict(sorted(history.items()))
+
+    def _loadShard(self, shardPath):
+        """Scan one shard (quarantining/migrating it if needed); returns its history heads by date"""
+        try:
+            scanned, st = self._scanShard(shardPath)
+            if scanned[6] and self.quarantine and self._quarantine(shardPath, scanned[6]):
+                scanned, st = self._scanShard(shardPath)
+            _, _, heads, dayOffsets, _, legacyRecords, _, _ = scanned
+        except (OSError, ValueError):
+            return {}
+        migrated = False
+        if legacyRecords:
+            # one-time migration of the shard to numeric summaries (re-indexes it)
+            try:
+                with self.lock:
+                    self._writeShard(shardPath, self._shardRecords(shardPath))
+                migrated = True
+            except Exception:
+                pass
+        if migrated:
+            self.shardVersions[shardPath] = fileVersion(shardPath)
+        else:
+            self._index(shardPath).replaceAll(dayOffsets, (st.st_size, st.st_mtime_ns))
+            self.shardVersions[shardPath] = (st.st_ino, st.st_size, st.st_mtime_ns)
+        return heads
+
+    def refresh(self):
+        """
+        Like JsonlStorage.refresh(), per file: the header is refreshed on its
+        own and only shards whose file changed since they were loaded are
+        rescanned. Returns None or (taskNames, groups, changedHistory, False).
+        """
+        header = self.header.refresh()
+        history = {}
+        for shardPath in self._shardPaths():
+            if fileVersion(shardPath) == self.shardVersions.get(shardPath):
+                continue
+            for d, head in self._loadShard(shardPath).items():
+                self.timelines.discard(d)
+                history[d] = LazyHistoryEntry(head, d, self.timelines)
+        if header is None and not history:
+            return None
+        tasks_list, groups = (header[0], header[1]) if header is not None else (None, None)
+        return tasks_list, groups, history, False
+
+    def _quarantine(self, shardPath, badLines):
+        from integrity import quarantineLines
+        try:
+            with self.lock:
+                quarantinePath = quarantineLines(shardPath, badLines, self.durability)
+        except Exception:
+            return False
+        lines = (self.integrityReport or {}).get("lines", 0) + len(badLines)
+        self.integrityReport = {"lines": lines, "path": quarantinePath}
+        return True
+
+    def saveTasksAndGroups(self, tasks, groups):
+        self.header.saveTasksAndGroups(tasks, groups)
+
+    def _writeShard(self, shardPath, records):
+        before = fileVersion(shardPath)
+        tmp = tempfile.NamedTemporaryFile(mode="w", encoding="utf-8", newline="", delete=False, dir=self.shardDir)
+        offset = 0
+        dayOffsets = {}
+        try:
+            for obj in records:
+                line = dumpRecord(withSummaryNumbers(obj))
+                length = len(line.encode("utf-8"))
+                dayOffsets[obj.get("date")] = (offset, length)
+                tmp.write(line)
+                offset += length
+            self.durability.sync(tmp)
+            tmp.close()
+            os.replace(tmp.name, shardPath)
+        except Exception:
+            tmp.close()
+            if os.path.exists(tmp.name):
+                os.remove(tmp.name)
+            raise
+        documentCache.invalidate(shardPath)
+        self.durability.committed(shardPath)
+        self._index(shardPath).replaceAll(dayOffsets)
+        if self.shardVersions.get(shardPath) == before:
+            # our own write: what the caller loaded is still current
+            self.shardVersions[shardPath] = fileVersion(shardPath)
+
+    def _shardRecords(self, shardPath):
+        doc = documentCache.get(shardPath)
+        if doc is None:
+            return []
+        return [obj for obj in doc.records if obj.get("type") == "history"]
+
+    def saveHistory(self, dateKey, historyObj, tasks, groups):
+        historyObj = withSummaryNumbers(encodeHistoryRecord(historyObj))
+        # the day's save also persists the current task list, like the single-file backend
+        self.header.saveTasksAndGroups(tasks, groups)
+        shardPath = self._shardPathForDate(dateKey)
+        try:
+            with self.lock:
+                records = [obj for obj in self._shardRecords(shardPath) if obj.get("date") != dateKey]
+                records.append(historyObj)
+                records.sort(key=lambda obj: obj.get("date") or "")
+                self._writeShard(shardPath, records)
+        except Exception:
+            return
+        self.timelines.discard(dateKey)
+
+    def commitBatch(self, batch):
+        """Commit a UnitOfWork: at most one header write plus one rewrite per touched shard"""
+        from unitOfWork import UnitOfWork
+        header = UnitOfWork(self.header)
+        if batch.tasks is not None:
+            header.setTasksAndGroups(batch.tasks, batch.groups)
+        if batch.chargeCodeGroupKeys is not None:
+            header.setChargeCodeGroupKeys(batch.chargeCodeGroupKeys)
+        header.commit()
+
+        byShard = {}
+        for dateKey, obj in batch.history.items():
+            rec = withSummaryNumbers(encodeHistoryRecord(dict(obj, type="history", date=dateKey)))
+            byShard.setdefault(self._shardPathForDate(dateKey), {})[dateKey] = rec
+        for shardPath, days in byShard.items():
+            try:
+                with self.lock:
+                    records = [obj for obj in self._shardRecords(shardPath) if obj.get("date") not in days]
+                    records.extend(days.values())
+                    records.sort(key=lambda obj: obj.get("date") or "")
+                    self._writeShard(shardPath, records)
+            except Exception:
+                continue
+            for dateKey in days:
+                self.timelines.discard(dateKey)
+
+    def loadHistoryDay(self, dateKey):
+        shardPath = self._shardPathForDate(dateKey)
+        if not os.path.exists(shardPath):
+            return None
+        try:
+            obj = self._index(shardPath).readDay(dateKey)
+        except Exception:
+            obj = None
+        return historyEntryFromRecord(obj) if obj is not None else None
+
+    def _readTimeline(self, dateKey):
+        entry = self.loadHistoryDay(dateKey)
+        if isinstance(entry, dict):
+            return entry.get("timeline", []) or []
+        return []
+
+    def loadChargeCodesByKey(self):
+        return self.header.loadChargeCodesByKey()
+
+    def loadChargeCodeChunks(self):
+        return self.header.loadChargeCodeChunks()
+
+    def loadChargeCodeTable(self):
+        return self.header.loadChargeCodeTable()
+
+    def readChunkGroupKey(self, chunkIdx):
+        return self.header.readChunkGroupKey(chunkIdx)
+
+    def updateChargeCodeGroupKeys(self, groupKeys):
+        self.header.updateChargeCodeGroupKeys(groupKeys)
+
+    def insertChargeCodes(self, chargeCodeIdModels):
+        if not os.path.exists(self.header.path):
+            self.header.saveTasksAndGroups([], {})
+        self.header.insertChargeCodes(chargeCodeIdModels)
+
+    def importJsonl(self, jsonlPath):
+        """Split a tasks.jsonl file into the header and per-period shards"""
+        doc = documentCache.get(jsonlPath)
+        if doc is None:
+            return
+        tasks_list, groups, history, _ = doc.views()
+        history = dict(history)
+        from archive import HistoryArchive
+        for obj in HistoryArchive.besideDataFile(jsonlPath).iterRecords():
+            history.setdefault(obj["date"], obj)
+        from chargeCodeStore import chargeCodeRecordsFor
+        chargeCodes = chargeCodeRecordsFor(jsonlPath)
+        self.header._createFile(tasks_list, groups, chargeCodes)
+
+        byShard = {}
+        for d, entry in history.items():
+            if isinstance(entry, dict):
+                # hoursByTask/secondsByTask (and any other fields) carry over as saved
+                rec = dict(entry, type="history", date=d, summary=entry.get("summary", "") or "",
+                           timeline=entry.get("timeline", []) or [])
+            else:
+                rec = {"type": "history", "date": d, "summary": entry or "", "timeline": []}
+            byShard.setdefault(self._shardPathForDate(d), []).append(rec)
+        with self.lock:
+            for shardPath, records in byShard.items():
+                records.sort(key=lambda obj: obj.get("date") or "")
+                self._writeShard(shardPath, records)
+
+    def exportJsonl(self, jsonlPath):
+        """Write the header and every shard back out as a single tasks.jsonl"""
+        tmpPath = jsonlPath + ".tmp"
+        # the app or posting.py may have tasks.jsonl open; replace it under its lock like every other writer
+        with lockFor(jsonlPath):
+            with open(tmpPath, "w", encoding="utf-8", newline="") as f:
+                headerDoc = documentCache.get(self.header.path)
+                for obj in (headerDoc.records if headerDoc is not None else []):
+                    f.write(dumpRecord(obj))
+                if self.header._usesChargeCodeStore():
+                    for obj in self.header.chargeCodes.records():
+                        f.write(dumpRecord(obj))
+                for shardPath in self._shardPaths():
+                    for obj in self._shardRecords(shardPath):
+                        f.write(dumpRecord(obj))
+            os.replace(tmpPath, jsonlPath)
+        documentCache.invalidate(jsonlPath)
+
+
+def main(argv):
+    if len(argv) < 2 or argv[1] not in ("import", "export"):
+        print("usage: shardedStorage.py import|export [dataDir]")
+        return 2
+    if len(argv) > 2:
+        dataDir = argv[2]
+    else:
+        appData = os.environ.get("LOCALAPPDATA") or os.environ.get("APPDATA") or os.path.expanduser("~")
+        dataDir = os.path.join(appData, "Task Tracker")
+    jsonlPath = os.path.join(dataDir, "tasks.jsonl")
+    store = ShardedStorage(os.path.join(dataDir, "shards"))
+    if argv[1] == "import":
+        store.importJsonl(jsonlPath)
+        print(f"Imported {jsonlPath} into {store.shardDir}")
+    else:
+        store.exportJsonl(jsonlPath)
+        print(f"Exported {store.shardDir} to {jsonlPath}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
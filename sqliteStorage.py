@@ -0,0 +1,368 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+from docCache import documentCache
+from fileLock import lockFor
+from storage import (
+    chargeCodeChunks,
+    chunkSignature,
+    dumpRecord,
+    historyEntryFromRecord,
+    isAllNullIds,
+)
+from lazyHistory import LazyHistoryEntry, TimelineCache
+from summaries import hasSummaryNumbers, summaryHead, withSummaryNumbers
+from timeline import CompactTimeline, encodeHistoryRecord
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    position INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS groups (
+    task TEXT PRIMARY KEY,
+    grp TEXT
+);
+CREATE TABLE IF NOT EXISTS charge_code_chunks (
+    position INTEGER PRIMARY KEY,
+    chunk_index INTEGER,
+    group_key TEXT NOT NULL DEFAULT '',
+    charge_codes TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_charge_code_chunks_index ON charge_code_chunks(chunk_index);
+CREATE TABLE IF NOT EXISTS history_days (
+    date TEXT PRIMARY KEY,
+    summary TEXT NOT NULL DEFAULT '',
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS timeline_segments (
+    date TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    task TEXT,
+    start TEXT,
+    end TEXT,
+    PRIMARY KEY (date, seq)
+);
+CREATE INDEX IF NOT EXISTS idx_timeline_segments_task ON timeline_segments(task, date);
+"""
+
+# SQLite does its own syncing; the durability modes map onto PRAGMA synchronous
+_SYNCHRONOUS = {"none": "OFF", "batched": "NORMAL", "strict": "FULL"}
+
+# history record keys that have their own columns/tables; anything else goes to `extra`
+_HISTORY_COLUMNS = ("type", "date", "summary", "timeline")
+
+
+class SqliteStorage:
+    """
+    Alternative backend storing tasks, groups, charge-code chunks, history days
+    and timeline segments in tasks.sqlite3. load() reads only the day
+    summaries; a day's timeline is a primary-key lookup when first used. Pay
+    period and range totals come from the in-memory history like the other
+    backends.
+    """
+    kind = "sqlite"
+
+    def __init__(self, path, durability=None):
+        self.path = path
+        self.lock = threading.Lock()
+        # the settings charge-code refresh runs on a worker thread
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        if durability is not None:
+            self.conn.execute(f"PRAGMA synchronous = {_SYNCHRONOUS[durability.mode]}")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+        self.timelines = TimelineCache(self._loadTimeline)
+        # PRAGMA data_version as of load(); it only changes when another connection commits
+        self.dataVersion = None
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def isEmpty(self):
+        with self.lock:
+            for table in ("tasks", "groups", "charge_code_chunks", "history_days"):
+                if self.conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone():
+                    return False
+        return True
+
+    def waitForBackgroundWork(self):
+        return
+
+    def vacuum(self):
+        """Compact the database file with SQLite's VACUUM; returns a report like the JSONL backends"""
+        with self.lock:
+            before = os.path.getsize(self.path)
+            self.conn.execute("VACUUM")
+            after = os.path.getsize(self.path)
+        return {"bytesBefore": before, "bytesAfter": after}
+
+    def historyVersion(self):
+        # data_version is per connection and doesn't survive a restart; totals are rebuilt on load
+        return None
+
+    def archivedPeriods(self):
+        # closed pay periods are only archived by the jsonl backend
+        return []
+
+    def archivedPeriodCovering(self, dateKey):
+        return None
+
+    def loadArchivedPeriod(self, startKey):
+        return {}
+
+    def _timelineFor(self, dateKey):
+        rows = self.conn.execute(
+            "SELECT task, start, end FROM timeline_segments WHERE date = ? ORDER BY seq",
+            (dateKey,)
+        ).fetchall()
+        return [{"task": t, "start": s, "end": e} for t, s, e in rows]
+
+    def _loadTimeline(self, dateKey):
+        with self.lock:
+            return CompactTimeline.fromSegments(self._timelineFor(dateKey), dateKey)
+
+    def _historyEntry(self, dateKey, summary, extra):
+        obj = json.loads(extra) if extra else {}
+        obj["summary"] = summary
+        obj["timeline"] = self._timelineFor(dateKey)
+        return historyEntryFromRecord(obj, dateKey)
+
+    def refresh(self):
+        """Like JsonlStorage.refresh(): None unless another connection committed since load(), else a full reload"""
+        with self.lock:
+            version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self.dataVersion:
+            return None
+        loaded = self.load()
+        if loaded is None:
+            return None
+        return loaded[0], loaded[1], loaded[2], True
+
+    def load(self):
+        with self.lock:
+            self.dataVersion = self.conn.execute("PRAGMA data_version").fetchone()[0]
+            tasks_list = [r[0] for r in self.conn.execute("SELECT name FROM tasks ORDER BY position")]
+            groups = {t: g for t, g in self.conn.execute("SELECT task, grp FROM groups ORDER BY rowid")}
+            # summaries only; timeline segments are queried when a day's timeline is first used
+            self.timelines.clear()
+            history = {}
+            legacy = []
+            for d, summary, extra in self.conn.execute("SELECT date, summary, extra FROM history_days ORDER BY date").fetchall():
+                obj = json.loads(extra) if extra else {}
+                obj["summary"] = summary or ""
+                head = summaryHead(obj)
+                if not hasSummaryNumbers(obj):
+                    obj.update(head)
+                    del obj["summary"]
+                    legacy.append((json.dumps(obj, ensure_ascii=False), d))
+                history[d] = LazyHistoryEntry(head, d, self.timelines)
+            if legacy:
+                # one-time migration of rows saved before numeric summaries existed
+                with self.conn:
+                    self.conn.executemany("UPDATE history_days SET extra = ? WHERE date = ?", legacy)
+        if not tasks_list and not groups and not history:
+            return None
+        return tasks_list, groups, history
+
+    def _writeTasksAndGroups(self, tasks, groups):
+        self.conn.execute("DELETE FROM tasks")
+        self.conn.executemany("INSERT INTO tasks(position, name) VALUES (?, ?)", list(enumerate(tasks)))
+        self.conn.execute("DELETE FROM groups")
+        self.conn.executemany("INSERT INTO groups(task, grp) VALUES (?, ?)", list(groups.items()))
+
+    def _writeHistory(self, historyObj):
+        historyObj = withSummaryNumbers(encodeHistoryRecord(historyObj))
+        dateKey = historyObj.get("date")
+        extra = {k: v for k, v in historyObj.items() if k not in _HISTORY_COLUMNS}
+        self.conn.execute(
+            "INSERT OR REPLACE INTO history_days(date, summary, extra) VALUES (?, ?, ?)",
+            (dateKey, historyObj.get("summary", "") or "", json.dumps(extra, ensure_ascii=False) if extra else None)
+        )
+        self.conn.execute("DELETE FROM timeline_segments WHERE date = ?", (dateKey,))
+        self.timelines.discard(dateKey)
+        self.conn.executemany(
+            "INSERT INTO timeline_segments(date, seq, task, start, end) VALUES (?, ?, ?, ?, ?)",
+            [
+                (dateKey, i, seg.get("task"), seg.get("start"), seg.get("end"))
+                for i, seg in enumerate(historyObj.get("timeline", []) or [])
+            ]
+        )
+
+    def saveTasksAndGroups(self, tasks, groups):
+        with self.lock, self.conn:
+            self._writeTasksAndGroups(tasks, groups)
+
+    def saveHistory(self, dateKey, historyObj, tasks, groups):
+        with self.lock, self.conn:
+            self._writeTasksAndGroups(tasks, groups)
+            self._writeHistory(historyObj)
+
+    def commitBatch(self, batch):
+        """Commit a UnitOfWork as one SQLite transaction"""
+        with self.lock, self.conn:
+            if batch.tasks is not None:
+                self._writeTasksAndGroups(batch.tasks, batch.groups)
+            if batch.chargeCodeGroupKeys is not None:
+                self._writeChargeCodeGroupKeys(batch.chargeCodeGroupKeys)
+            for dateKey, obj in batch.history.items():
+                self._writeHistory(dict(obj, type="history", date=dateKey))
+
+    def loadHistoryDay(self, dateKey):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT summary, extra FROM history_days WHERE date = ?", (dateKey,)
+            ).fetchone()
+            if row is None:
+                return None
+            return self._historyEntry(dateKey, row[0], row[1])
+
+    def _chargeCodeRows(self):
+        rows = self.conn.execute(
+            "SELECT position, chunk_index, group_key, charge_codes FROM charge_code_chunks ORDER BY position"
+        ).fetchall()
+        return [(pos, idx, key or "", json.loads(codes)) for pos, idx, key, codes in rows]
+
+    def loadChargeCodesByKey(self):
+        chargeCodesByKey = {}
+        with self.lock:
+            for _, _, groupKey, codes in self._chargeCodeRows():
+                groupKey = groupKey.strip()
+                if groupKey and codes:
+                    chargeCodesByKey[groupKey] = codes
+        return chargeCodesByKey
+
+    def loadChargeCodeChunks(self):
+        with self.lock:
+            return [codes for _, _, _, codes in self._chargeCodeRows() if codes]
+
+    def loadChargeCodeTable(self):
+        with self.lock:
+            return [(codes, (groupKey or "").strip()) for _, _, groupKey, codes in self._chargeCodeRows() if codes]
+
+    def readChunkGroupKey(self, chunkIdx):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT group_key FROM charge_code_chunks WHERE chunk_index = ? ORDER BY position LIMIT 1",
+                (chunkIdx,)
+            ).fetchone()
+        return (row[0] or "").strip() if row else ""
+
+    def _writeChargeCodeGroupKeys(self, groupKeys):
+        positions = [r[0] for r in self.conn.execute("SELECT position FROM charge_code_chunks ORDER BY position")]
+        self.conn.executemany(
+            "UPDATE charge_code_chunks SET group_key = ? WHERE position = ?",
+            [(groupKeys.get(ccIdx, ""), pos) for ccIdx, pos in enumerate(positions)]
+        )
+
+    def updateChargeCodeGroupKeys(self, groupKeys):
+        with self.lock, self.conn:
+            self._writeChargeCodeGroupKeys(groupKeys)
+
+    def insertChargeCodes(self, chargeCodeIdModels):
+        chunks = chargeCodeChunks(chargeCodeIdModels)
+        if not chunks:
+            return
+        with self.lock, self.conn:
+            existing = self._chargeCodeRows()
+            seen = {chunkSignature(codes) for _, _, _, codes in existing if isinstance(codes, list)}
+            nextIndex = max([idx for _, idx, _, _ in existing if idx is not None] + [-1]) + 1
+            nextPosition = max([pos for pos, _, _, _ in existing] + [-1]) + 1
+            for chunk in chunks:
+                sig = chunkSignature(chunk)
+                if isAllNullIds(sig) or sig in seen:
+                    continue
+                self.conn.execute(
+                    "INSERT INTO charge_code_chunks(position, chunk_index, group_key, charge_codes) VALUES (?, ?, '', ?)",
+                    (nextPosition, nextIndex, json.dumps(chunk, ensure_ascii=False))
+                )
+                seen.add(sig)
+                nextIndex += 1
+                nextPosition += 1
+
+    def importJsonl(self, jsonlPath):
+        """Replace the database contents with the records from a tasks.jsonl file (left as it is)"""
+        # parsed read-only: a JsonlStorage load() could quarantine, archive or compact the source
+        doc = documentCache.get(jsonlPath)
+        if doc is None:
+            return
+        tasks_list, groups, history, _ = doc.views()
+        history = dict(history)
+        from archive import HistoryArchive
+        for obj in HistoryArchive.besideDataFile(jsonlPath).iterRecords():
+            history.setdefault(obj["date"], obj)
+        from chargeCodeStore import chargeCodeRecordsFor
+        chargeCodeRecords = chargeCodeRecordsFor(jsonlPath)
+        with self.lock, self.conn:
+            for table in ("tasks", "groups", "charge_code_chunks", "history_days", "timeline_segments"):
+                self.conn.execute(f"DELETE FROM {table}")
+            self._writeTasksAndGroups(tasks_list, groups)
+            for pos, obj in enumerate(chargeCodeRecords):
+                self.conn.execute(
+                    "INSERT INTO charge_code_chunks(position, chunk_index, group_key, charge_codes) VALUES (?, ?, ?, ?)",
+                    (pos, obj.get("chunkIndex"), obj.get("groupKey") or "",
+                     json.dumps(obj.get("chargeCodes", []) or [], ensure_ascii=False))
+                )
+            for d, entry in history.items():
+                if isinstance(entry, dict):
+                    rec = dict(entry)
+                else:
+                    rec = {"summary": entry or "", "timeline": []}
+                rec["type"] = "history"
+                rec["date"] = d
+                self._writeHistory(rec)
+
+    def exportJsonl(self, jsonlPath):
+        """Write the database out as a tasks.jsonl file (tasks, groups, charge codes, history)"""
+        # held across write and replace so no other writer of tasks.jsonl interleaves
+        with self.lock, lockFor(jsonlPath):
+            tasks_list = [r[0] for r in self.conn.execute("SELECT name FROM tasks ORDER BY position")]
+            groups = list(self.conn.execute("SELECT task, grp FROM groups ORDER BY rowid"))
+            chargeCodes = self._chargeCodeRows()
+            days = self.conn.execute("SELECT date, summary, extra FROM history_days ORDER BY date").fetchall()
+            tmpPath = jsonlPath + ".tmp"
+            with open(tmpPath, "w", encoding="utf-8") as f:
+                for name in tasks_list:
+                    f.write(dumpRecord({"type": "task", "name": name}))
+                for t, g in groups:
+                    f.write(dumpRecord({"type": "group", "task": t, "group": g}))
+                for _, idx, key, codes in chargeCodes:
+                    f.write(dumpRecord({"type": "chargeCode", "groupKey": key, "chunkIndex": idx, "chargeCodes": codes}))
+                for d, summary, extra in days:
+                    obj = {"type": "history", "date": d, "summary": summary or ""}
+                    if extra:
+                        obj.update(json.loads(extra))
+                    obj["timeline"] = self._timelineFor(d)
+                    f.write(dumpRecord(obj))
+            os.replace(tmpPath, jsonlPath)
+
+
+def main(argv):
+    if len(argv) < 2 or argv[1] not in ("import", "export"):
+        print("usage: sqliteStorage.py import|export [dataDir]")
+        return 2
+    if len(argv) > 2:
+        dataDir = argv[2]
+    else:
+        appData = os.environ.get("LOCALAPPDATA") or os.environ.get("APPDATA") or os.path.expanduser("~")
+        dataDir = os.path.join(appData, "Task Tracker")
+    jsonlPath = os.path.join(dataDir, "tasks.jsonl")
+    store = SqliteStorage(os.path.join(dataDir, "tasks.sqlite3"))
+    try:
+        if argv[1] == "import":
+            store.importJsonl(jsonlPath)
+            print(f"Imported {jsonlPath} into {store.path}")
+        else:
+            store.exportJsonl(jsonlPath)
+            print(f"Exported {store.path} to {jsonlPath}")
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
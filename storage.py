@@ -0,0 +1,1203 @@
+import json
+import os
+import tempfile
+import threading
+import zlib
+
+from docCache import documentCache
+from durability import DEFAULT_DURABILITY, DEFAULT_FLUSH_SECONDS, Durability
+from fileLock import fileVersion, lockFor
+from historyIndex import HistoryIndex, parseRecordHead
+from jsonlReader import (
+    CHECKSUM_KEY,
+    checkLine,
+    decodeLine,
+    iterRawLines,
+    iterRecords,
+    mappedFile,
+    peekType,
+    stampChecksum,
+)
+from lazyHistory import LazyHistoryEntry, TimelineCache
+from summaries import hasSummaryNumbers, summaryHead, withSummaryNumbers
+from timeline import CompactTimeline, encodeHistoryRecord
+
+
+# bytes before the last loaded offset that must be unchanged for refresh() to parse only the tail
+TAIL_CHECK_BYTES = 4096
+
+
+def dumpRecord(obj):
+    """One JSONL line for `obj`, stamped with a fresh checksum (see jsonlReader.checkLine)"""
+    if CHECKSUM_KEY in obj:
+        obj = {k: v for k, v in obj.items() if k != CHECKSUM_KEY}
+    return stampChecksum(json.dumps(obj, ensure_ascii=False, separators=(',', ':'))) + "\n"
+
+
+def appendRecords(path, objs, durability=None):
+    """
+    Append records to the end of a JSONL file in one write, synced as
+    `durability` asks; returns the (offset, length) of each line.
+    """
+    lines = [dumpRecord(obj).encode("utf-8") for obj in objs]
+    with open(path, "a+b") as f:
+        f.seek(0, os.SEEK_END)
+        offset = f.tell()
+        if offset > 0:
+            # hand-edited files may be missing the final newline
+            f.seek(offset - 1)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+                offset += 1
+        f.write(b"".join(lines))
+        f.flush()
+        if durability is not None:
+            durability.sync(f)
+    if durability is not None:
+        durability.committed(path, replaced=False)
+    spans = []
+    for line in lines:
+        spans.append((offset, len(line)))
+        offset += len(line)
+    return spans
+
+
+def dedupeHistory(historyObjs):
+    """Keep only the last record per date (last writer wins), in file order"""
+    lastIndex = {}
+    for i, obj in enumerate(historyObjs):
+        lastIndex[obj.get("date")] = i
+    kept = [obj for i, obj in enumerate(historyObjs) if lastIndex.get(obj.get("date")) == i]
+    return kept, len(historyObjs) - len(kept)
+
+
+def historyEntryFromRecord(obj, dateKey=None):
+    entry = summaryHead(obj)
+    timeline = obj.get("timeline", []) or []
+    if not isinstance(timeline, CompactTimeline):
+        timeline = CompactTimeline.fromSegments(timeline, dateKey or obj.get("date"))
+    entry["timeline"] = timeline
+    return entry
+
+
+def _splitRecords(text):
+    tasksAndGroups = []
+    chargeCodes = []
+    history = []
+    other = []
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line:
+            continue
+        lineBytes = line.encode("utf-8")
+        if checkLine(lineBytes, 0, len(lineBytes)) is False:
+            # a damaged record is carried along verbatim, never re-stamped as good data
+            other.append(line)
+            continue
+        try:
+            obj = json.loads(line)
+        except Exception:
+            other.append(line)
+            continue
+        t = obj.get("type") if isinstance(obj, dict) else None
+        if t in ("task", "group"):
+            tasksAndGroups.append(obj)
+        elif t == "chargeCode":
+            chargeCodes.append(obj)
+        elif t == "history":
+            history.append(obj)
+        else:
+            other.append(line)
+    return tasksAndGroups, chargeCodes, history, other
+
+
+def compactJournal(path, lock, durability=None, onReplaced=None):
+    """
+    Rewrite a journaled tasks.jsonl keeping only the newest history record per date,
+    backfilling the numeric summary fields of records written before they existed.
+
+    The bulk of the work happens without holding `lock`, so writers appending to
+    the journal are not blocked. Before swapping the file in, the lock is taken,
+    any bytes appended since the snapshot are copied over verbatim, and the
+    compaction is abandoned if the file was replaced underneath us.
+    `onReplaced(versionBefore)` is called, still under the lock, once the
+    compacted file is in place. Returns the number of dead records dropped.
+    """
+    if not os.path.exists(path):
+        return 0
+
+    with lock:
+        st = os.stat(path)
+    snapshotSize = st.st_size
+    snapshotIno = st.st_ino
+
+    with open(path, "rb") as f:
+        data = f.read(snapshotSize)
+    # only compact whole lines; a partially written tail is carried over below
+    cut = data.rfind(b"\n") + 1
+    if cut < len(data):
+        # hand-edited files may lack the final newline; a tail that parses is a whole record
+        try:
+            json.loads(data[cut:])
+            cut = len(data)
+        except ValueError:
+            pass
+    text = data[:cut].decode("utf-8", errors="replace")
+
+    tasksAndGroups, chargeCodes, history, other = _splitRecords(text)
+    legacy = sum(1 for obj in history if not hasSummaryNumbers(obj))
+    history, dropped = dedupeHistory(history)
+    if dropped == 0 and legacy == 0:
+        return 0
+
+    dirpath = os.path.dirname(path) or "."
+    tmp = tempfile.NamedTemporaryFile(mode="wb", delete=False, dir=dirpath)
+    try:
+        for obj in tasksAndGroups:
+            tmp.write(dumpRecord(obj).encode("utf-8"))
+        for obj in chargeCodes:
+            tmp.write(dumpRecord(obj).encode("utf-8"))
+        for obj in history:
+            tmp.write(dumpRecord(withSummaryNumbers(obj)).encode("utf-8"))
+        for l in other:
+            tmp.write((l + "\n").encode("utf-8"))
+
+        with lock:
+            st = os.stat(path)
+            if st.st_ino != snapshotIno or st.st_size < snapshotSize:
+                # someone rewrote the file while we were compacting; their copy wins
+                tmp.close()
+                os.remove(tmp.name)
+                return 0
+            with open(path, "rb") as f:
+                f.seek(cut)
+                tmp.write(f.read())
+            tmp.flush()
+            if durability is not None:
+                durability.sync(tmp)
+            tmp.close()
+            os.replace(tmp.name, path)
+            documentCache.invalidate(path)
+            if durability is not None:
+                durability.committed(path)
+            if onReplaced is not None:
+                onReplaced((st.st_ino, st.st_size, st.st_mtime_ns))
+    except Exception:
+        try:
+            tmp.close()
+            if os.path.exists(tmp.name):
+                os.remove(tmp.name)
+        except Exception:
+            pass
+        raise
+    return dropped
+
+
+EMPTY_CHARGE_CODE = {
+    "chargeCodeId": None,
+    "chargeCodeName": None,
+    "type": None,
+    "hierarchicalName": None,
+    "leave": False,
+}
+
+
+def normalizeChargeCodeModel(m):
+    if not isinstance(m, dict):
+        return None
+
+    ccId = m.get("chargeCodeId") or m.get("chargeCodeID") or m.get("chargeCodeId".upper())
+    name = m.get("chargeCodeName")
+    typ = m.get("type")
+    hier = m.get("hierarchicalName")
+    leave = m.get("leave")
+
+    return {
+        "chargeCodeId": ccId,
+        "chargeCodeName": name,
+        "type": typ,
+        "hierarchicalName": hier,
+        "leave": bool(leave) if leave is not None else False,
+    }
+
+
+def chargeCodeChunks(chargeCodeIdModels):
+    """Normalize models from copyPreviousTimesheet and split them into padded chunks of 4"""
+    normalized = []
+    for m in (chargeCodeIdModels or []):
+        nm = normalizeChargeCodeModel(m)
+        if nm is None:
+            nm = dict(EMPTY_CHARGE_CODE)
+        normalized.append(nm)
+
+    if (len(normalized) % 4) != 0:
+        pad = 4 - (len(normalized) % 4)
+        for _ in range(pad):
+            normalized.append(dict(EMPTY_CHARGE_CODE))
+
+    return [normalized[i:i + 4] for i in range(0, len(normalized), 4)]
+
+
+def chunkSignature(chunk):
+    ids = []
+    for x in chunk:
+        if isinstance(x, dict):
+            ids.append(x.get("chargeCodeId"))
+        else:
+            ids.append(None)
+    while len(ids) < 4:
+        ids.append(None)
+    return tuple(ids[:4])
+
+
+def isAllNullIds(sig):
+    return all(x is None for x in sig)
+
+
+def insertChargeCodesBetweenGroupAndHistory(path, chargeCodeIdModels, durability=None):
+    # posting.py may call this while the app is running; hold the file's lock across read-modify-replace
+    with lockFor(path):
+        _insertChargeCodes(path, chargeCodeIdModels, durability)
+
+
+def _insertChargeCodes(path, chargeCodeIdModels, durability=None):
+    tmpPath = path + ".tmp"
+
+    def existingSignatureFromChargeCodeRecord(rec):
+        chunk = rec.get("chargeCodes")
+        if not isinstance(chunk, list):
+            return None
+        return chunkSignature(chunk)
+
+    def mkChargeCodeLine(groupKey, chunkIndex, chunk):
+        obj = {
+            "type": "chargeCode",
+            "groupKey": groupKey,
+            "chunkIndex": chunkIndex,
+            "chargeCodes": chunk,
+        }
+        return dumpRecord(obj).encode("utf-8")
+
+    chunks = chargeCodeChunks(chargeCodeIdModels)
+    if not chunks:
+        return
+
+    with open(tmpPath, "wb") as dst:
+        inGroup = False
+        groupKey = ""
+        seenChargeCodeSigs = set()
+        insertedSigs = set()
+        maxChunkIndex = -1
+        inserted_any = False
+        saw_group = False
+        saw_history = False
+
+        def insertMissingChargeCodes():
+            nonlocal inserted_any
+
+            nextChunkIndex = maxChunkIndex + 1
+            wrote = 0
+            for chunk in chunks:
+                sig = chunkSignature(chunk)
+                if isAllNullIds(sig):
+                    continue
+                if sig in seenChargeCodeSigs or sig in insertedSigs:
+                    continue
+
+                dst.write(mkChargeCodeLine(groupKey, nextChunkIndex, chunk))
+                insertedSigs.add(sig)
+                nextChunkIndex += 1
+                wrote += 1
+            if wrote:
+                inserted_any = True
+            return wrote
+
+        # history lines (the bulk of the file) are copied without being decoded
+        for recType, rawLine in iterRawLines(path):
+            rec = None
+            if recType is None or recType in ("group", "chargeCode"):
+                rec = decodeLine(rawLine)
+                if rec is None:
+                    dst.write(rawLine)
+                    continue
+                recType = rec.get("type")
+
+            if recType == "group":
+                dst.write(rawLine)
+                saw_group = True
+                inGroup = True
+                insertedSigs = set()
+                seenChargeCodeSigs = set()
+                maxChunkIndex = -1
+                groupKey = rec.get("groupKey") or rec.get("key") or rec.get("name") or ""
+                continue
+
+            if inGroup and recType == "chargeCode":
+                try:
+                    ci = rec.get("chunkIndex")
+                    if ci is not None:
+                        maxChunkIndex = max(maxChunkIndex, int(ci))
+                except Exception:
+                    pass
+
+                sig = existingSignatureFromChargeCodeRecord(rec)
+                if sig is not None:
+                    seenChargeCodeSigs.add(sig)
+
+                dst.write(rawLine)
+                continue
+
+            if inGroup and recType == "history":
+                saw_history = True
+                insertMissingChargeCodes()
+                inGroup = False
+                dst.write(rawLine)
+                continue
+
+            if recType == "history":
+                saw_history = True
+
+            dst.write(rawLine)
+
+        # If we never found a group/history section to insert into, append at the end.
+        if not inserted_any and (not saw_group or not saw_history):
+            groupKey = ""
+            maxChunkIndex = -1
+            insertedSigs = set()
+            seenChargeCodeSigs = set()
+            insertMissingChargeCodes()
+
+        if durability is not None:
+            durability.sync(dst)
+
+    os.replace(tmpPath, path)
+    documentCache.invalidate(path)
+    if durability is not None:
+        durability.committed(path)
+
+
+def scanRecords(data):
+    """
+    One pass over the raw bytes of a JSONL file, parsing only the head of
+    history lines. Returns (taskNames, groups, historyHeads, dayOffsets,
+    deadRecords, legacyRecords, badLines, chargeCodeLines) where dayOffsets
+    maps each date to the (offset, length) of its newest line, legacyRecords
+    counts history lines without numeric summaries, badLines lists the
+    (offset, length, reason) of corrupted lines, which are skipped, and
+    chargeCodeLines counts chargeCode records. Raises ValueError if the
+    first record is neither JSON nor shaped like a dumpRecord line (the file
+    is not JSONL).
+    """
+    tasks_list = []
+    groups = {}
+    heads = {}
+    dayOffsets = {}
+    deadRecords = 0
+    legacyRecords = 0
+    badLines = []
+    chargeCodeLines = 0
+    sawRecord = False
+    pos = 0
+    end = len(data)
+    while pos < end:
+        nl = data.find(b"\n", pos)
+        lineEnd = end if nl == -1 else nl + 1
+        start = pos
+        pos = lineEnd
+        line = data[start:lineEnd].strip()
+        if not line or line.startswith(b"//"):
+            continue
+        if checkLine(line, 0, len(line)) is False:
+            badLines.append((start, lineEnd - start, "checksum"))
+            sawRecord = True
+            continue
+        try:
+            obj = parseRecordHead(line)
+        except ValueError:
+            if not sawRecord and peekType(line, 0, len(line)) is None:
+                raise
+            badLines.append((start, lineEnd - start, "unreadable"))
+            sawRecord = True
+            continue
+        if not isinstance(obj, dict):
+            continue
+        t = obj.get("type")
+        sawRecord = sawRecord or t is not None
+        if t == "task":
+            name = obj.get("name")
+            if name:
+                tasks_list.append(name)
+        elif t == "group":
+            task = obj.get("task")
+            if task:
+                groups[task] = obj.get("group")
+        elif t == "history":
+            d = obj.get("date")
+            if not d:
+                continue
+            if d in heads:
+                # journaled files keep superseded records until compaction
+                deadRecords += 1
+            if not hasSummaryNumbers(obj):
+                legacyRecords += 1
+            heads[d] = summaryHead(obj)
+            dayOffsets[d] = (start, lineEnd - start)
+        elif t == "chargeCode":
+            chargeCodeLines += 1
+    return tasks_list, groups, heads, dayOffsets, deadRecords, legacyRecords, badLines, chargeCodeLines
+
+
+class JsonlStorage:
+    """
+    Default backend: everything lives in tasks.jsonl, one record per line
+    (task, group, chargeCode, history). A legacy single-JSON document is
+    still readable.
+    """
+    kind = "jsonl"
+
+    def __init__(self, path, journal=False, compactThreshold=50, historyIndex=False, durability=None,
+                 quarantine=False, archive=None, archiveKeepPeriods=None, chargeCodes=None):
+        self.path = path
+        # how hard writes are pushed to disk (settings["durability"]); none by default
+        self.durability = durability if durability is not None else Durability("none")
+        self.journal = journal
+        self.compactThreshold = compactThreshold
+        # day -> byte offset of its record; persisted as tasks.jsonl.idx when enabled
+        self.index = HistoryIndex(path, persist=historyIndex)
+        self.timelines = TimelineCache(self._readTimeline)
+        # guards every rewrite/append of the file (background compaction included)
+        # shared with every other writer of this file, in this process and others
+        self.lock = lockFor(path)
+        # (inode, size, mtime) as of our last load/write; a mismatch means another process wrote
+        self.version = None
+        # the version the caller's loaded data matches (our own writes keep it current) and a
+        # checksum of its last bytes, so refresh() can tell a pure append from a rewrite
+        self.synced = None
+        self.syncedTail = None
+        self.externalChanges = 0
+        self.journalDates = set()
+        self.deadRecords = 0
+        self.compactionThread = None
+        # set when load() converted a legacy document: {"days", "seconds", "backup"}
+        self.migrationReport = None
+        # move corrupted lines to <path>.quarantine on load (otherwise they are only skipped)
+        self.quarantine = quarantine
+        # set when load() quarantined lines: {"lines", "path"}
+        self.integrityReport = None
+        # compressed closed pay periods (archive.HistoryArchive); load() archives periods older than
+        # the newest `archiveKeepPeriods` when that is set
+        self.archive = archive
+        self.archiveKeepPeriods = archiveKeepPeriods
+        # charge codes kept in their own file (chargeCodeStore.ChargeCodeStore); None keeps them in this one
+        self.chargeCodes = chargeCodes
+
+    def _document(self):
+        return documentCache.get(self.path)
+
+    def load(self):
+        """
+        Return (taskNames, groups, history), or None when nothing has been saved yet.
+
+        Only the head of each history line is parsed; entries are
+        LazyHistoryEntry objects whose timeline is read from the file (via the
+        history index) when first asked for.
+        """
+        # a legacy single-JSON document is converted to JSONL once, then loaded the fast way
+        self._migrateLegacy()
+        self.synced = None
+        try:
+            scanned, st = self._scan()
+            if scanned[6] and self.quarantine and self._quarantine(scanned[6]):
+                scanned, st = self._scan()
+        except OSError:
+            return None
+        except ValueError:
+            # not JSONL and could not be converted -> fallback to full JSON
+            return self._loadDocument()
+        # charge codes still in the file (older versions, exports) move to the charge-code store
+        moveChargeCodes = bool(scanned[7]) and self.chargeCodes is not None and self._rewrite(None, None)
+        if (self._hasClosedPeriods(scanned[2]) and self.archiveClosedPeriods(self.archiveKeepPeriods)) or moveChargeCodes:
+            try:
+                scanned, st = self._scan()
+            except (OSError, ValueError):
+                return None
+        tasks_list, groups, heads, dayOffsets, deadRecords, legacyRecords, _, _ = scanned
+
+        # the scan doubles as a fresh history index
+        self.index.replaceAll(dayOffsets, (st.st_size, st.st_mtime_ns))
+        self.timelines.clear()
+        history = {d: LazyHistoryEntry(head, d, self.timelines) for d, head in heads.items()}
+        self.journalDates = set(history.keys())
+        self.deadRecords = deadRecords
+        if legacyRecords:
+            # one-time migration: compaction writes the numeric summaries back
+            self.compactInBackground()
+        return tasks_list, groups, history
+
+    def refresh(self):
+        """
+        Bring the data of the last load() up to date. Returns None when the
+        file hasn't changed since, (None, None, newHistory, False) when
+        history lines were only appended (just that tail is parsed), or
+        (taskNames, groups, history, True) after a full reload.
+        """
+        current = fileVersion(self.path)
+        if current is not None and current == self.synced:
+            return None
+        if current is not None and self.synced is not None:
+            history = self._loadTail(current)
+            if history is not None:
+                return None, None, history, False
+        loaded = self.load()
+        if loaded is None:
+            return None
+        return loaded[0], loaded[1], loaded[2], True
+
+    def _loadTail(self, current):
+        """History appended since self.synced, or None if anything else changed"""
+        ino, size, mtimeNs = self.synced
+        if current[0] != ino or current[1] <= size:
+            return None
+        try:
+            with self.lock.shared(), mappedFile(self.path) as (data, st):
+                if st.st_ino != ino or zlib.crc32(data[max(0, size - TAIL_CHECK_BYTES):size]) != self.syncedTail:
+                    return None
+                scanned = scanRecords(data[size:st.st_size])
+                version = (st.st_ino, st.st_size, st.st_mtime_ns)
+                tailCheck = zlib.crc32(data[max(0, st.st_size - TAIL_CHECK_BYTES):st.st_size])
+        except (OSError, ValueError):
+            return None
+        tasks_list, groups, heads, dayOffsets, deadRecords, legacyRecords, badLines, chargeCodeLines = scanned
+        if tasks_list or groups or legacyRecords or badLines or chargeCodeLines:
+            # only appended history is handled here; quarantine and migration need the full load
+            return None
+
+        self.index.noteAppends({d: (size + o, n) for d, (o, n) in dayOffsets.items()}, (size, mtimeNs))
+        history = {}
+        for d, head in heads.items():
+            if d in self.journalDates:
+                self.deadRecords += 1
+            self.journalDates.add(d)
+            self.timelines.discard(d)
+            history[d] = LazyHistoryEntry(head, d, self.timelines)
+        self.deadRecords += deadRecords
+        self.version = self.synced = version
+        self.syncedTail = tailCheck
+        if self.journal and self.deadRecords > self.compactThreshold:
+            self.compactInBackground()
+        return history
+
+    def _scan(self):
+        with self.lock.shared(), mappedFile(self.path) as (data, st):
+            scanned = scanRecords(data)
+            self.version = (st.st_ino, st.st_size, st.st_mtime_ns)
+            self.synced = self.version
+            self.syncedTail = zlib.crc32(data[max(0, st.st_size - TAIL_CHECK_BYTES):st.st_size])
+        return scanned, st
+
+    def _markSynced(self):
+        """After our own write: the caller's data already holds what was written"""
+        self.synced = self.version
+        self.syncedTail = None
+        if self.version is None:
+            return
+        size = self.version[1]
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(max(0, size - TAIL_CHECK_BYTES))
+                self.syncedTail = zlib.crc32(f.read(size - max(0, size - TAIL_CHECK_BYTES)))
+        except OSError:
+            self.synced = None
+
+    def _quarantine(self, badLines):
+        """Move the corrupted lines found by the last scan to <path>.quarantine; False if the file changed since"""
+        from integrity import quarantineLines
+        try:
+            with self.lock:
+                if fileVersion(self.path) != self.version:
+                    return False
+                quarantinePath = quarantineLines(self.path, badLines, self.durability)
+                self._noteWrite()
+        except Exception:
+            return False
+        self.integrityReport = {"lines": len(badLines), "path": quarantinePath}
+        return True
+
+    def _checkVersion(self):
+        """
+        Called with the lock held before a write. Every writer re-reads the file
+        under the lock, so nothing another process wrote is lost; only cached
+        timelines may be stale and are dropped.
+        """
+        current = fileVersion(self.path)
+        if self.version is not None and current != self.version:
+            self.externalChanges += 1
+            self.timelines.clear()
+        if current != self.synced:
+            # someone else's changes haven't been loaded; the next refresh() reloads in full
+            self.synced = None
+
+    def _noteWrite(self):
+        self.version = fileVersion(self.path)
+        if self.synced is not None:
+            self._markSynced()
+
+    def _migrateLegacy(self):
+        from legacyMigration import isLegacyDocument, migrateLegacyFile
+        if not isLegacyDocument(self.path):
+            return
+        try:
+            with self.lock:
+                report = migrateLegacyFile(self.path)
+        except Exception:
+            return
+        if report is not None:
+            documentCache.invalidate(self.path)
+            self.migrationReport = report
+
+    def _loadDocument(self):
+        doc = self._document()
+        if doc is None:
+            return None
+        tasks_list, groups, history, deadRecords = doc.views()
+        self.journalDates = set(history.keys())
+        self.deadRecords = deadRecords
+        # the lists/dicts are handed to the app, which edits them; entries stay shared
+        return list(tasks_list), dict(groups), dict(history)
+
+    def _createFile(self, tasks, groups, extra=()):
+        with open(self.path, "w", encoding="utf-8", newline="") as f:
+            for name in tasks:
+                f.write(dumpRecord({"type": "task", "name": name}))
+            for t, g in groups.items():
+                f.write(dumpRecord({"type": "group", "task": t, "group": g}))
+            for obj in extra:
+                f.write(dumpRecord(obj))
+            self.durability.sync(f)
+        documentCache.invalidate(self.path)
+        self.durability.committed(self.path)
+        self._noteWrite()
+        self.index.rebuild()
+        self.timelines.clear()
+
+    def _rewrite(self, tasks, groups, newHistory=(), chargeCodeGroupKeys=None, dropDates=()):
+        """
+        Rewrite the file keeping charge codes and history. `tasks`/`groups` of
+        None keep the ones on file; `newHistory` records replace their dates;
+        `chargeCodeGroupKeys` (line ordinal -> key) remaps the charge codes and
+        history of `dropDates` is left out. With a charge-code store, charge
+        codes found in the file are merged into it instead of rewritten.
+        Returns False if the write failed.
+        """
+        dirpath = os.path.dirname(self.path) or "."
+        tmp = None
+        newDates = {obj.get("date") for obj in newHistory}
+        try:
+            with self.lock:
+                self._checkVersion()
+                preserved_history = []
+                preserved_chargeCodes = []
+                doc = self._document()
+                preserved_other = list(doc.badLines) if doc is not None else []
+                records = doc.records if doc is not None else []
+                if tasks is None:
+                    tasks, groups, _, _ = doc.views() if doc is not None else ([], {}, {}, 0)
+                for obj in records:
+                    t = obj.get("type")
+                    if t == "history":
+                        if obj.get("date") in newDates or obj.get("date") in dropDates:
+                            # skip existing history for this date (we will append the new one)
+                            continue
+                        preserved_history.append(withSummaryNumbers(obj))
+                    elif t == "chargeCode":
+                        if chargeCodeGroupKeys is not None and self.chargeCodes is None:
+                            obj = dict(obj, groupKey=chargeCodeGroupKeys.get(len(preserved_chargeCodes), ""))
+                        preserved_chargeCodes.append(obj)
+
+                if self.chargeCodes is not None:
+                    if preserved_chargeCodes:
+                        self.chargeCodes.merge(preserved_chargeCodes)
+                        preserved_chargeCodes = []
+                    if chargeCodeGroupKeys is not None:
+                        self.chargeCodes.setGroupKeys(chargeCodeGroupKeys)
+
+                # a full rewrite is a free compaction of any journaled history
+                preserved_history, _ = dedupeHistory(preserved_history)
+
+                # newline="" keeps byte offsets exact for the history index
+                tmp = tempfile.NamedTemporaryFile(mode="w", encoding="utf-8", newline="", delete=False, dir=dirpath)
+                offset = 0
+                dayOffsets = {}
+
+                def write(line, dateKey=None):
+                    nonlocal offset
+                    length = len(line.encode("utf-8"))
+                    if dateKey:
+                        dayOffsets[dateKey] = (offset, length)
+                    tmp.write(line)
+                    offset += length
+
+                for name in tasks:
+                    write(dumpRecord({"type": "task", "name": name}))
+                for t, g in groups.items():
+                    write(dumpRecord({"type": "group", "task": t, "group": g}))
+                for obj in preserved_chargeCodes:
+                    write(dumpRecord(obj))
+                for obj in preserved_history:
+                    write(dumpRecord(obj), obj.get("date"))
+                for l in preserved_other:
+                    write(l + "\n")
+                for obj in newHistory:
+                    # Append the new history records at the end.
+                    write(dumpRecord(obj), obj.get("date"))
+
+                self.durability.sync(tmp)
+                tmp.close()
+                os.replace(tmp.name, self.path)
+                documentCache.invalidate(self.path)
+                self.durability.committed(self.path)
+                self._noteWrite()
+                self.index.replaceAll(dayOffsets)
+                for dateKey in newDates:
+                    self.timelines.discard(dateKey)
+                self.deadRecords = 0
+                self.journalDates.update(newDates)
+                self.journalDates.difference_update(dropDates)
+                return True
+        except Exception:
+            try:
+                if tmp is not None:
+                    tmp.close()
+                    if os.path.exists(tmp.name):
+                        os.remove(tmp.name)
+            except Exception:
+                pass
+            return False
+
+    def saveTasksAndGroups(self, tasks, groups):
+        with self.lock:
+            if not os.path.exists(self.path):
+                try:
+                    self._createFile(tasks, groups)
+                except Exception:
+                    pass
+                return
+            self._rewrite(tasks, groups)
+
+    def saveHistory(self, dateKey, historyObj, tasks, groups):
+        historyObj = withSummaryNumbers(encodeHistoryRecord(historyObj))
+        with self.lock:
+            # If file doesn't exist, create and write tasks/groups then history.
+            if not os.path.exists(self.path):
+                try:
+                    self._createFile(tasks, groups, [historyObj])
+                    self.journalDates.add(dateKey)
+                except Exception:
+                    pass
+                return
+
+            active = self._saveArchivedDays([historyObj])
+            if not active:
+                return
+            if self.journal:
+                self._appendToJournal(active)
+            else:
+                self._rewrite(tasks, groups, newHistory=active)
+
+    def _appendToJournal(self, historyObjs):
+        # Journal mode: one appended line per day; on load the last record for a date wins.
+        try:
+            with self.lock:
+                self._checkVersion()
+                statBefore = self.index._dataStat()
+                spans = appendRecords(self.path, historyObjs, self.durability)
+                documentCache.invalidate(self.path)
+                self._noteWrite()
+                self.index.noteAppends({obj.get("date"): span for obj, span in zip(historyObjs, spans)}, statBefore)
+                for obj in historyObjs:
+                    self.timelines.discard(obj.get("date"))
+        except Exception:
+            return False
+        for obj in historyObjs:
+            dateKey = obj.get("date")
+            if dateKey in self.journalDates:
+                self.deadRecords += 1
+            else:
+                self.journalDates.add(dateKey)
+        if self.deadRecords > self.compactThreshold:
+            self.compactInBackground()
+        return True
+
+    def commitBatch(self, batch):
+        """
+        Commit a UnitOfWork with a single write: one append when only
+        history days changed in journal mode, otherwise one rewrite.
+        """
+        history = [
+            withSummaryNumbers(encodeHistoryRecord(dict(obj, type="history", date=dateKey)))
+            for dateKey, obj in batch.history.items()
+        ]
+        with self.lock:
+            if not os.path.exists(self.path):
+                try:
+                    self._createFile(batch.tasks or [], batch.groups or {}, history)
+                    self.journalDates.update(batch.history)
+                except Exception:
+                    pass
+                return
+            chargeCodeGroupKeys = batch.chargeCodeGroupKeys
+            if chargeCodeGroupKeys is not None and self._usesChargeCodeStore():
+                # remapping charge codes only touches the charge-code file
+                self.chargeCodes.setGroupKeys(chargeCodeGroupKeys)
+                chargeCodeGroupKeys = None
+                if batch.tasks is None and not history:
+                    return
+            history = self._saveArchivedDays(history)
+            if batch.tasks is None and chargeCodeGroupKeys is None and not history:
+                return
+            if self.journal and history and batch.tasks is None and chargeCodeGroupKeys is None:
+                self._appendToJournal(history)
+            else:
+                self._rewrite(batch.tasks, batch.groups, newHistory=history,
+                              chargeCodeGroupKeys=chargeCodeGroupKeys)
+
+    def _saveArchivedDays(self, historyObjs):
+        """
+        Write the days of archived pay periods into their archive segments
+        (the segment is rewritten, the period stays archived) and return the
+        rest, which belong in the file. Called with the lock held.
+        """
+        if self.archive is None or self.archive.isEmpty():
+            return historyObjs
+        active = []
+        byPeriod = {}
+        for obj in historyObjs:
+            startKey = self.archive.periodCovering(obj.get("date"))
+            if startKey is None:
+                active.append(obj)
+            else:
+                byPeriod.setdefault(startKey, []).append(obj)
+        if byPeriod:
+            try:
+                self.archive.writePeriods(byPeriod)
+            except Exception:
+                # the file takes them instead; the next archive run merges them into the period
+                return historyObjs
+            for records in byPeriod.values():
+                for obj in records:
+                    self.timelines.discard(obj.get("date"))
+        return active
+
+    def _hasClosedPeriods(self, heads):
+        if self.archive is None or not self.archiveKeepPeriods or not heads:
+            return False
+        from archive import archiveCutoff
+        return min(heads) < archiveCutoff(self.archiveKeepPeriods, calendar=self.archive.calendar)
+
+    def archiveClosedPeriods(self, keepPeriods):
+        """
+        Move the history of pay periods older than the newest `keepPeriods`
+        into the compressed archive and drop it from the file. Returns the
+        number of days archived.
+        """
+        if self.archive is None or not os.path.exists(self.path):
+            return 0
+        from archive import archiveCutoff
+        cutoff = archiveCutoff(keepPeriods, calendar=self.archive.calendar)
+        periodKey = self.archive.periodKey
+        try:
+            with self.lock:
+                self._checkVersion()
+                doc = self._document()
+                if doc is None or not doc.isJsonl:
+                    return 0
+                byPeriod = {}
+                for obj in doc.records:
+                    d = obj.get("date")
+                    if obj.get("type") == "history" and d and d < cutoff and periodKey(d):
+                        byPeriod.setdefault(periodKey(d), []).append(obj)
+                if not byPeriod:
+                    return 0
+                dates = {obj.get("date") for records in byPeriod.values() for obj in records}
+                # segments go in first: a crash before the rewrite leaves the days in both places,
+                # and the file's copy wins until the next archive run merges them
+                self.archive.writePeriods(byPeriod)
+                if not self._rewrite(None, None, dropDates=dates):
+                    return 0
+        except Exception:
+            return 0
+        for d in dates:
+            self.timelines.discard(d)
+        return len(dates)
+
+    def historyVersion(self):
+        """
+        Version of the file the caller's loaded history matches, or None when it
+        doesn't (periodAggregates.py saves its totals against this)
+        """
+        return self.synced
+
+    def archivedPeriods(self):
+        """Headers of the archived pay periods, newest first (see archive.py)"""
+        if self.archive is None:
+            return []
+        return self.archive.headers()
+
+    def archivedPeriodCovering(self, dateKey):
+        """Start of the archived pay period whose range holds `dateKey` (saves to it go to its segment), or None"""
+        if self.archive is None:
+            return None
+        return self.archive.periodCovering(dateKey)
+
+    def loadArchivedPeriod(self, startKey):
+        """{date: history entry} of one archived pay period; decompresses its segment"""
+        if self.archive is None:
+            return {}
+        return {obj["date"]: historyEntryFromRecord(obj) for obj in self.archive.readPeriod(startKey)}
+
+    def compactInBackground(self):
+        if self.compactionThread is not None and self.compactionThread.is_alive():
+            return
+
+        def replaced(versionBefore):
+            # the compacted file holds the same records, so nothing needs reloading
+            if self.version == versionBefore:
+                self.version = fileVersion(self.path)
+            if self.synced == versionBefore:
+                self._markSynced()
+
+        def job():
+            try:
+                dropped = compactJournal(self.path, self.lock, self.durability, replaced)
+            except Exception:
+                return
+            self.deadRecords = max(0, self.deadRecords - dropped)
+
+        self.compactionThread = threading.Thread(target=job, daemon=True)
+        self.compactionThread.start()
+
+    def waitForBackgroundWork(self):
+        # don't let the process exit halfway through a journal compaction or with unsynced writes
+        if self.compactionThread is not None and self.compactionThread.is_alive():
+            self.compactionThread.join()
+        self.durability.flush()
+
+    def vacuum(self):
+        """
+        Rewrite the file in canonical order without dead records, and the
+        charge-code store beside it; returns the combined report (see vacuum.py)
+        """
+        from vacuum import combineReports, vacuumFile
+        self.waitForBackgroundWork()
+        with self.lock:
+            self._checkVersion()
+            report = vacuumFile(self.path, self.lock, self.durability)
+            if report is not None:
+                self._noteWrite()
+                self.index.rebuild()
+                self.timelines.clear()
+                self.deadRecords = 0
+        if self._usesChargeCodeStore():
+            report = combineReports([report, self.chargeCodes.vacuum()])
+        return report
+
+    def loadHistoryDay(self, dateKey):
+        if not os.path.exists(self.path):
+            return None
+        try:
+            obj = self.index.readDay(dateKey)
+        except Exception:
+            obj = None
+        if obj is not None:
+            return historyEntryFromRecord(obj)
+        # no index, or the day is not in it (legacy document, archived, ...): use the parsed document
+        doc = self._document()
+        if doc is None:
+            return None
+        try:
+            entry = doc.views()[2].get(dateKey)
+        except Exception:
+            return None
+        if entry is None and self.archive is not None:
+            archived = self.archive.loadDay(dateKey)
+            return historyEntryFromRecord(archived) if archived is not None else None
+        if isinstance(entry, dict):
+            return historyEntryFromRecord(entry, dateKey)
+        return entry
+
+    def _readTimeline(self, dateKey):
+        entry = self.loadHistoryDay(dateKey)
+        if isinstance(entry, dict):
+            return entry.get("timeline", []) or []
+        return []
+
+    def _usesChargeCodeStore(self):
+        """
+        Charge codes are read from the store once it exists; until the first
+        load() moves them there they are still read from this file.
+        """
+        return self.chargeCodes is not None and self.chargeCodes.exists()
+
+    def loadChargeCodesByKey(self):
+        if self._usesChargeCodeStore():
+            return self.chargeCodes.byGroupKey()
+        chargeCodesByKey = {}
+        try:
+            with self.lock.shared():
+                for obj in iterRecords(self.path, ("chargeCode",)):
+                    groupKey = obj.get("groupKey", "").strip()
+                    chargeCodes = obj.get("chargeCodes", [])
+
+                    if groupKey and chargeCodes:
+                        chargeCodesByKey[groupKey] = chargeCodes
+        except Exception:
+            pass
+        return chargeCodesByKey
+
+    def loadChargeCodeChunks(self):
+        """Extract charge codes grouped by chunk"""
+        if self._usesChargeCodeStore():
+            return self.chargeCodes.chunkCodes()
+        chunks = []
+        if not os.path.exists(self.path):
+            return chunks
+        try:
+            with self.lock.shared():
+                for obj in iterRecords(self.path, ("chargeCode",)):
+                    codes = obj.get("chargeCodes", [])
+                    if codes:
+                        chunks.append(codes)
+        except Exception:
+            pass
+        return chunks
+
+    def loadChargeCodeTable(self):
+        """[(chargeCodes, groupKey)] by chunk ordinal in one pass, for the Settings table"""
+        if self._usesChargeCodeStore():
+            return self.chargeCodes.table()
+        table = []
+        if not os.path.exists(self.path):
+            return table
+        try:
+            with self.lock.shared():
+                for obj in iterRecords(self.path, ("chargeCode",)):
+                    codes = obj.get("chargeCodes", [])
+                    if codes:
+                        table.append((codes, (obj.get("groupKey") or "").strip()))
+        except Exception:
+            pass
+        return table
+
+    def readChunkGroupKey(self, chunkIdx):
+        if self._usesChargeCodeStore():
+            return self.chargeCodes.groupKey(chunkIdx)
+        try:
+            with self.lock.shared():
+                for obj in iterRecords(self.path, ("chargeCode",)):
+                    if obj.get("chunkIndex") == chunkIdx:
+                        return (obj.get("groupKey") or "").strip()
+        except Exception:
+            return ""
+        return ""
+
+    def updateChargeCodeGroupKeys(self, groupKeys):
+        """Set groupKey on every chargeCode line; `groupKeys` maps the line's ordinal to a key"""
+        if self._usesChargeCodeStore():
+            self.chargeCodes.setGroupKeys(groupKeys)
+            return
+        if not os.path.exists(self.path):
+            return
+
+        tmpPath = self.path + ".tmp"
+
+        with self.lock:
+            self._checkVersion()
+            try:
+                ccIdx = 0
+
+                with open(tmpPath, "wb") as dst:
+                    for kind, raw in iterRawLines(self.path):
+                        obj = None
+                        if (kind is None or kind == "chargeCode") and checkLine(raw, 0, len(raw)) is not False:
+                            obj = decodeLine(raw)
+                        if obj is None or obj.get("type") != "chargeCode":
+                            dst.write(raw)
+                            continue
+
+                        obj["groupKey"] = groupKeys.get(ccIdx, "")
+
+                        dst.write(dumpRecord(obj).encode("utf-8"))
+                        ccIdx += 1
+
+                    self.durability.sync(dst)
+
+                os.replace(tmpPath, self.path)
+                documentCache.invalidate(self.path)
+                self.durability.committed(self.path)
+                self._noteWrite()
+
+            except Exception as e:
+                try:
+                    if os.path.exists(tmpPath):
+                        os.remove(tmpPath)
+                except Exception:
+                    pass
+                print(f"Error updating charge codes in JSONL: {e}")
+                import traceback
+                traceback.print_exc()
+
+    def insertChargeCodes(self, chargeCodeIdModels):
+        if self.chargeCodes is not None:
+            self.chargeCodes.insert(chargeCodeIdModels)
+            return
+        with self.lock:
+            self._checkVersion()
+            insertChargeCodesBetweenGroupAndHistory(self.path, chargeCodeIdModels, self.durability)
+            self._noteWrite()
+
+
+def openStorage(dataDir, settings):
+    """Build the storage backend selected by settings["storageBackend"] ("jsonl", "sqlite" or "sharded")"""
+    backend = (settings.get("storageBackend") or "jsonl").strip().lower()
+    jsonlPath = os.path.join(dataDir, "tasks.jsonl")
+    durability = Durability(
+        settings.get("durability", DEFAULT_DURABILITY),
+        settings.get("durabilityFlushSeconds", DEFAULT_FLUSH_SECONDS),
+    )
+    if backend == "sqlite":
+        from sqliteStorage import SqliteStorage
+        store = SqliteStorage(os.path.join(dataDir, "tasks.sqlite3"), durability=durability)
+        if store.isEmpty() and os.path.exists(jsonlPath):
+            # one-shot import the first time the sqlite backend is selected
+            store.importJsonl(jsonlPath)
+        return store
+    if backend == "sharded":
+        from shardedStorage import ShardedStorage
+        store = ShardedStorage(os.path.join(dataDir, "shards"), durability=durability,
+                               quarantine=bool(settings.get("quarantineBadLines", True)))
+        if store.isEmpty() and os.path.exists(jsonlPath):
+            store.importJsonl(jsonlPath)
+        return store
+    from archive import DEFAULT_COMPRESSION, DEFAULT_KEEP_PERIODS, HistoryArchive
+    from chargeCodeStore import ChargeCodeStore
+    from payPeriods import PayPeriodCalendar
+    archive = HistoryArchive.besideDataFile(
+        jsonlPath,
+        compression=(settings.get("archiveCompression") or DEFAULT_COMPRESSION).strip().lower(),
+        durability=durability,
+        calendar=PayPeriodCalendar.fromSettings(settings),
+    )
+    keepPeriods = None
+    if settings.get("archiveClosedPeriods", False):
+        keepPeriods = max(1, int(settings.get("archiveKeepPeriods", DEFAULT_KEEP_PERIODS)))
+    return JsonlStorage(
+        jsonlPath,
+        journal=bool(settings.get("journalHistory", False)),
+        compactThreshold=int(settings.get("journalCompactThreshold", 50)),
+        historyIndex=bool(settings.get("historyIndex", False)),
+        durability=durability,
+        quarantine=bool(settings.get("quarantineBadLines", True)),
+        archive=archive,
+        archiveKeepPeriods=keepPeriods,
+        chargeCodes=ChargeCodeStore.besideDataFile(jsonlPath, durability=durability),
+    )
@@ -0,0 +1,111 @@
+"""
+Numeric day summaries. A history record carries its per-task totals as
+"hoursByTask" (the rounded hours shown in the summary text) and
+"secondsByTask" (exact seconds), so readers never have to parse the
+"Task: 1.5 h" text. Records written before these fields existed are
+backfilled from the text once, when they are loaded.
+
+Loaded heads key their numbers by the shared taskDictionary strings; the
+*ById helpers give the same numbers keyed by task id for aggregation.
+"""
+from taskDictionary import taskDictionary
+
+
+def parseSummaryText(text):
+    """Legacy "Task: 1.5 h" lines -> ({task: hours}, totalHours); the "Total" line is skipped"""
+    agg = {}
+    total = 0.0
+    for line in (text or "").splitlines():
+        if ":" not in line:
+            continue
+        name, rest = line.split(":", 1)
+        name = name.strip()
+        rest = rest.strip()
+        if not rest:
+            continue
+        token = rest.split()[0]
+        try:
+            hours = float(token)
+        except ValueError:
+            continue
+        if name.lower() == "total":
+            continue
+        agg[name] = agg.get(name, 0.0) + hours
+        total += hours
+    return agg, total
+
+
+def formatSummaryText(hoursByTask, totalHours):
+    lines = []
+    for name, hours in sorted(hoursByTask.items(), key=lambda kv: kv[0].lower()):
+        lines.append(f"{name}: {hours:.1f} h")
+    lines.append(f"Total: {totalHours:.1f} h")
+    return "\n".join(lines)
+
+
+def makeSummary(hoursByTask, totalHours, secondsByTask):
+    """Summary fields of a history entry: the display text plus the numbers behind it"""
+    return {
+        "summary": formatSummaryText(hoursByTask, totalHours),
+        "hoursByTask": dict(hoursByTask),
+        "secondsByTask": {name: int(round(secs)) for name, secs in secondsByTask.items()},
+    }
+
+
+def hasSummaryNumbers(obj):
+    return isinstance(obj.get("hoursByTask"), dict) and isinstance(obj.get("secondsByTask"), dict)
+
+
+def summaryNumbers(obj):
+    """(hoursByTask, secondsByTask) of a history record, backfilled from the text if missing"""
+    hoursByTask = obj.get("hoursByTask")
+    if not isinstance(hoursByTask, dict):
+        hoursByTask, _ = parseSummaryText(obj.get("summary", "") or "")
+    secondsByTask = obj.get("secondsByTask")
+    if not isinstance(secondsByTask, dict):
+        secondsByTask = {name: int(round(hours * 3600)) for name, hours in hoursByTask.items()}
+    return hoursByTask, secondsByTask
+
+
+def summaryHead(obj):
+    """The non-timeline part of a history entry"""
+    hoursByTask, secondsByTask = summaryNumbers(obj)
+    return {
+        "summary": obj.get("summary", "") or "",
+        "hoursByTask": taskDictionary.internKeys(hoursByTask),
+        "secondsByTask": taskDictionary.internKeys(secondsByTask),
+    }
+
+
+def withSummaryNumbers(obj):
+    """
+    History record with the numeric fields filled in, in writing order:
+    "timeline" stays the last key so record heads can be parsed without it.
+    """
+    if obj.get("type") != "history":
+        return obj
+    hoursByTask, secondsByTask = summaryNumbers(obj)
+    rec = {k: v for k, v in obj.items() if k not in ("hoursByTask", "secondsByTask", "timeline")}
+    rec["hoursByTask"] = hoursByTask
+    rec["secondsByTask"] = secondsByTask
+    rec["timeline"] = obj.get("timeline", []) or []
+    return rec
+
+
+def entryNumbers(entry):
+    """(hoursByTask, secondsByTask) of a history entry; legacy entries may be bare summary strings"""
+    if isinstance(entry, dict):
+        return summaryNumbers(entry)
+    return summaryNumbers({"summary": entry or ""})
+
+
+def entryHours(entry):
+    """({task: hours}, totalHours) of a history entry"""
+    hoursByTask, _ = entryNumbers(entry)
+    return hoursByTask, sum(hoursByTask.values())
+
+
+def entryHoursById(entry):
+    """({taskId: hours}, totalHours) of a history entry"""
+    hoursByTask, total = entryHours(entry)
+    return taskDictionary.idKeys(hoursByTask), total
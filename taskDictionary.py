@@ -0,0 +1,58 @@
+import sys
+import threading
+
+
+class TaskDictionary:
+    """
+    Process-wide table of task names and small integer ids. History heads,
+    timelines and the History window's aggregates refer to tasks by id (or by
+    the one interned copy of the name), so ten years of records don't hold a
+    separate string per day and segment. Names are resolved only for display.
+
+    Ids are never reused or renumbered while the process runs; they are not
+    stored on disk.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.names = []
+        self.ids = {}
+
+    def idFor(self, name):
+        tid = self.ids.get(name)
+        if tid is None:
+            with self.lock:
+                tid = self.ids.get(name)
+                if tid is None:
+                    name = sys.intern(str(name))
+                    tid = len(self.names)
+                    self.names.append(name)
+                    self.ids[name] = tid
+        return tid
+
+    def name(self, tid):
+        return self.names[tid]
+
+    def intern(self, name):
+        """The shared copy of `name`"""
+        return self.names[self.idFor(name)]
+
+    def internKeys(self, byName):
+        """Copy of a {task: value} dict whose keys are the shared name strings"""
+        return {self.names[self.idFor(name)]: value for name, value in byName.items()}
+
+    def idKeys(self, byName):
+        """{task: value} -> {taskId: value}"""
+        idFor = self.idFor
+        return {idFor(name): value for name, value in byName.items()}
+
+    def nameKeys(self, byId):
+        """{taskId: value} -> {task: value}, for display"""
+        names = self.names
+        return {names[tid]: value for tid, value in byId.items()}
+
+    def __len__(self):
+        return len(self.names)
+
+
+taskDictionary = TaskDictionary()
@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from jsonlReader import checkLine, decodeLine, iterRecords, stampChecksum
+from storage import dumpRecord
+
+
+def check(line):
+    return checkLine(line, 0, len(line))
+
+
+class TestCheckLine(unittest.TestCase):
+    def testStampedRecordMatches(self):
+        line = dumpRecord({"type": "history", "date": "2024-03-04", "summary": "Café: 1.0 h\nTotal: 1.0 h"}).encode("utf-8")
+        self.assertIn(b',"crc":"', line)
+        self.assertIs(check(line), True)
+        self.assertIs(check(line.rstrip(b"\n") + b"\r\n"), True)
+
+    def testChecksOnlyTheGivenSlice(self):
+        first = dumpRecord({"type": "task", "name": "Admin"}).encode("utf-8")
+        second = dumpRecord({"type": "task", "name": "Coding"}).encode("utf-8")
+        buf = first + second
+        self.assertIs(checkLine(buf, 0, len(first)), True)
+        self.assertIs(checkLine(buf, len(first), len(buf)), True)
+
+    def testAnyChangedByteIsCaught(self):
+        line = dumpRecord({"type": "task", "name": "Admin"}).encode("utf-8")
+        for i in range(len(line) - 1):
+            if line[i:i + 1] == b"\n":
+                continue
+            damaged = line[:i] + bytes([line[i] ^ 0x01]) + line[i + 1:]
+            # False, or None once the type prefix itself no longer parses
+            self.assertIsNot(check(damaged), True, i)
+
+    def testBadChecksumField(self):
+        line = dumpRecord({"type": "task", "name": "Admin"}).encode("utf-8")
+        start = line.index(b',"crc":"') + len(b',"crc":"')
+        self.assertIs(check(line[:start] + b"zzzzzzzz" + line[start + 8:]), False)
+        # a digit short: the field doesn't end where it should
+        self.assertIs(check(line[:start] + line[start + 1:]), False)
+
+    def testLinesWithoutChecksum(self):
+        for line in (b"", b"\n", b'{"type":"task","name":"Admin"}\n', b'{"name":"Admin","type":"task"}\n',
+                     b"// comment\n", b"garbage\n"):
+            self.assertIsNone(check(line), line)
+
+    def testStampLeavesOtherTextAlone(self):
+        self.assertEqual(stampChecksum('{"name":"Admin"}'), '{"name":"Admin"}')
+        self.assertEqual(stampChecksum("[1,2]"), "[1,2]")
+
+    def testDecodeDropsTheChecksum(self):
+        line = dumpRecord({"type": "task", "name": "Admin", "crc": "stale"}).encode("utf-8")
+        self.assertIs(check(line), True)
+        self.assertEqual(decodeLine(line), {"type": "task", "name": "Admin"})
+
+
+class TestIterRecords(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "tasks.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def testDamagedLinesAreSkipped(self):
+        good = dumpRecord({"type": "task", "name": "Admin"})
+        damaged = dumpRecord({"type": "task", "name": "Coding"}).replace("Coding", "Cod1ng")
+        legacy = '{"type":"task","name":"Old"}\n'
+        with open(self.path, "w", encoding="utf-8", newline="") as f:
+            f.write(good + damaged + legacy)
+        self.assertEqual([obj["name"] for obj in iterRecords(self.path, ("task",))], ["Admin", "Old"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+from datetime import date, timedelta
+
+from payPeriods import PayPeriodCalendar
+
+
+def d(text):
+    return date.fromisoformat(text)
+
+
+class TestPayPeriodCalendar(unittest.TestCase):
+    def assertPeriod(self, calendar, day, start, end):
+        p = calendar.periodOf(day)
+        self.assertEqual((p.start, p.end), (d(start), d(end)), day)
+        self.assertEqual(calendar.keyOf(day), start)
+
+    def assertContiguous(self, calendar, first, last):
+        """Every day from first to last is in exactly one period, and periods tile without gaps"""
+        periods = list(calendar.periodsBetween(first, last))
+        self.assertLessEqual(periods[0].start, d(first))
+        self.assertGreaterEqual(periods[-1].end, d(last))
+        for prev, nxt in zip(periods, periods[1:]):
+            self.assertEqual(prev.end + timedelta(days=1), nxt.start)
+            self.assertEqual(prev.index + 1, nxt.index)
+        day = d(first)
+        while day <= d(last):
+            p = calendar.periodOf(day)
+            self.assertTrue(p.contains(day) and p.start <= day <= p.end, day)
+            day += timedelta(days=1)
+
+    def testBiweeklyAroundTheAnchor(self):
+        cal = PayPeriodCalendar("biweekly", "2025-11-29")
+        self.assertPeriod(cal, "2025-11-29", "2025-11-29", "2025-12-12")
+        self.assertPeriod(cal, "2025-12-12", "2025-11-29", "2025-12-12")
+        self.assertPeriod(cal, "2025-12-13", "2025-12-13", "2025-12-26")
+        self.assertPeriod(cal, "2025-11-28", "2025-11-15", "2025-11-28")
+        self.assertEqual(cal.periodOf("2025-11-28").index, -1)
+        self.assertEqual(cal.periodOf("2025-11-28").days, 14)
+        self.assertContiguous(cal, "2024-12-20", "2026-02-10")
+
+    def testWeeklyStartsOnTheAnchorWeekday(self):
+        cal = PayPeriodCalendar("weekly", "2024-01-01")
+        self.assertPeriod(cal, "2024-03-10", "2024-03-04", "2024-03-10")
+        self.assertPeriod(cal, "2024-03-11", "2024-03-11", "2024-03-17")
+        self.assertContiguous(cal, "2023-12-01", "2024-02-15")
+
+    def testSemimonthly(self):
+        cal = PayPeriodCalendar("semimonthly", "2024-01-01")
+        self.assertPeriod(cal, "2024-01-15", "2024-01-01", "2024-01-15")
+        self.assertPeriod(cal, "2024-01-16", "2024-01-16", "2024-01-31")
+        self.assertPeriod(cal, "2024-02-29", "2024-02-16", "2024-02-29")
+        self.assertPeriod(cal, "2023-12-31", "2023-12-16", "2023-12-31")
+        self.assertContiguous(cal, "2023-11-01", "2024-04-30")
+
+    def testSemimonthlyLateAnchorClampsToShortMonths(self):
+        cal = PayPeriodCalendar("semimonthly", "2024-01-15")
+        # the second start is the 30th, which February doesn't have
+        self.assertPeriod(cal, "2024-02-29", "2024-02-29", "2024-03-14")
+        self.assertPeriod(cal, "2024-02-28", "2024-02-15", "2024-02-28")
+        self.assertContiguous(cal, "2023-12-01", "2024-05-31")
+
+    def testMonthlyAnchorPastShortMonthEnds(self):
+        cal = PayPeriodCalendar("monthly", "2024-01-31")
+        self.assertPeriod(cal, "2024-02-28", "2024-01-31", "2024-02-28")
+        self.assertPeriod(cal, "2024-02-29", "2024-02-29", "2024-03-30")
+        self.assertPeriod(cal, "2024-03-31", "2024-03-31", "2024-04-29")
+        self.assertPeriod(cal, "2023-12-31", "2023-12-31", "2024-01-30")
+        self.assertContiguous(cal, "2023-10-01", "2024-06-30")
+
+    def testPeriodDates(self):
+        p = PayPeriodCalendar("weekly", "2024-01-01").periodOf("2024-12-31")
+        self.assertEqual(p.dates(), [(d("2024-12-30") + timedelta(days=i)).isoformat() for i in range(7)])
+        self.assertEqual(p.key, "2024-12-30")
+
+    def testPeriodsBetweenOverlapOnly(self):
+        cal = PayPeriodCalendar("biweekly", "2025-11-29")
+        self.assertEqual([p.key for p in cal.periodsBetween("2025-12-12", "2025-12-13")], ["2025-11-29", "2025-12-13"])
+        self.assertEqual([p.key for p in cal.periodsBetween("2025-12-01", "2025-12-01")], ["2025-11-29"])
+
+    def testIsCurrent(self):
+        cal = PayPeriodCalendar("biweekly", "2025-11-29")
+        today = d("2025-12-12")
+        self.assertTrue(cal.isCurrent("2025-11-29", today))
+        self.assertFalse(cal.isCurrent("2025-12-13", today))
+        self.assertFalse(cal.isCurrent("bad", today))
+
+    def testBadInput(self):
+        cal = PayPeriodCalendar()
+        self.assertIsNone(cal.keyOf("not a date"))
+        self.assertIsNone(cal.keyOf(None))
+        with self.assertRaises(ValueError):
+            PayPeriodCalendar("fortnightly")
+        self.assertEqual(PayPeriodCalendar("Semi-Monthly", "2024-01-01").schedule, "semimonthly")
+
+    def testFromSettings(self):
+        self.assertEqual(PayPeriodCalendar.fromSettings({"payPeriodSchedule": "weekly", "payPeriodAnchor": "2024-01-01"}),
+                         PayPeriodCalendar("weekly", "2024-01-01"))
+        self.assertEqual(PayPeriodCalendar.fromSettings({"payPeriodSchedule": "yearly"}), PayPeriodCalendar())
+        self.assertEqual(PayPeriodCalendar.fromSettings({"payPeriodAnchor": "garbage"}), PayPeriodCalendar())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import random
+import unittest
+from datetime import date, timedelta
+
+from rangeIndex import GROWTH_DAYS, FenwickTree, HoursIndex
+
+
+def entry(**hoursByTask):
+    return {"summary": "", "hoursByTask": hoursByTask, "secondsByTask": {t: int(h * 3600) for t, h in hoursByTask.items()}}
+
+
+def shifted(dateKey, days):
+    return (date.fromisoformat(dateKey) + timedelta(days=days)).isoformat()
+
+
+class TestFenwickTree(unittest.TestCase):
+    def testMatchesPlainSums(self):
+        rng = random.Random(7)
+        values = [rng.uniform(0, 10) for _ in range(100)]
+        tree = FenwickTree(values)
+        for _ in range(50):
+            i = rng.randrange(100)
+            delta = rng.uniform(-5, 5)
+            tree.add(i, delta)
+            values[i] += delta
+        for lo in range(0, 101, 7):
+            for hi in range(lo, 101, 11):
+                self.assertAlmostEqual(tree.rangeSum(lo, hi), sum(values[lo:hi]))
+        self.assertEqual(tree.rangeSum(40, 40), 0.0)
+
+
+class TestHoursIndex(unittest.TestCase):
+    def setUp(self):
+        self.history = {
+            "2024-03-04": entry(Admin=1.5, Coding=6.0),
+            "2024-03-05": entry(Coding=8.0),
+            "2024-03-11": entry(Admin=2.0, Meetings=1.0),
+        }
+        self.groups = {"Coding": "Project", "Meetings": "Overhead", "Admin": "Overhead"}
+        self.index = HoursIndex(lambda: self.history, lambda: self.groups)
+
+    def testRangeQueries(self):
+        idx = self.index
+        self.assertAlmostEqual(idx.totalHours("2024-03-04", "2024-03-11"), 18.5)
+        self.assertAlmostEqual(idx.totalHours("2024-03-05", "2024-03-05"), 8.0)
+        self.assertAlmostEqual(idx.taskHours("Admin", "2024-03-04", "2024-03-10"), 1.5)
+        self.assertEqual(idx.taskHours("Nobody", "2024-03-04", "2024-03-11"), 0.0)
+        self.assertEqual(idx.hoursByTask("2024-03-05", "2024-03-11"), {"Coding": 8.0, "Admin": 2.0, "Meetings": 1.0})
+        self.assertEqual(idx.hoursByGroup("2024-03-04", "2024-03-05"), {"Project": 14.0, "Overhead": 1.5})
+        self.assertAlmostEqual(idx.groupHours("Overhead", "2024-03-01", "2024-03-31"), 4.5)
+
+    def testRangesOutsideTheCoveredDays(self):
+        idx = self.index
+        idx.totalHours("2024-03-04", "2024-03-04")
+        first, last = date.fromordinal(idx.base).isoformat(), date.fromordinal(idx.base + idx.size - 1).isoformat()
+        self.assertEqual(idx.totalHours("1990-01-01", "1990-12-31"), 0.0)
+        self.assertEqual(idx.totalHours("2199-01-01", "2199-12-31"), 0.0)
+        self.assertEqual(idx.hoursByTask(shifted(last, 1), shifted(last, 400)), {})
+        self.assertEqual(idx.hoursByGroup(shifted(first, -400), shifted(first, -1)), {})
+        # ranges sticking out on either side are clamped to what is covered
+        self.assertAlmostEqual(idx.totalHours("1990-01-01", "2024-03-04"), 7.5)
+        self.assertAlmostEqual(idx.totalHours("2024-03-05", "2199-12-31"), 11.0)
+        self.assertAlmostEqual(idx.totalHours("1990-01-01", "2199-12-31"), 18.5)
+        self.assertAlmostEqual(idx.taskHours("Admin", shifted(first, -1), shifted(last, 1)), 3.5)
+
+    def testBackwardsRangeIsEmpty(self):
+        self.assertEqual(self.index.totalHours("2024-03-11", "2024-03-04"), 0.0)
+        self.assertEqual(self.index.hoursByTask("2024-03-11", "2024-03-04"), {})
+
+    def testReplaceDayUpdatesTotals(self):
+        idx = self.index
+        idx.totalHours("2024-03-04", "2024-03-11")
+        old = self.history["2024-03-05"]
+        self.history["2024-03-05"] = new = entry(Coding=4.0, Meetings=2.0)
+        idx.replaceDay("2024-03-05", old, new)
+        self.assertAlmostEqual(idx.totalHours("2024-03-04", "2024-03-11"), 16.5)
+        self.assertEqual(idx.hoursByGroup("2024-03-05", "2024-03-05"), {"Project": 4.0, "Overhead": 2.0})
+        idx.replaceDay("2024-03-04", self.history.pop("2024-03-04"), None)
+        self.assertEqual(idx.hoursByTask("2024-03-04", "2024-03-04"), {})
+
+    def testReplaceDayGrowsPastTheCoveredDays(self):
+        idx = self.index
+        idx.totalHours("2024-03-04", "2024-03-11")
+        base, size = idx.base, idx.size
+        farPast = date.fromordinal(base - 10).isoformat()
+        farFuture = date.fromordinal(base + size + GROWTH_DAYS * 2).isoformat()
+        for day, e in ((farPast, entry(Admin=3.0)), (farFuture, entry(Coding=5.0))):
+            self.history[day] = e
+            idx.replaceDay(day, None, e)
+        self.assertLess(idx.base, base)
+        self.assertAlmostEqual(idx.totalHours(farPast, farPast), 3.0)
+        self.assertAlmostEqual(idx.taskHours("Coding", farFuture, farFuture), 5.0)
+        self.assertAlmostEqual(idx.totalHours("2024-03-04", "2024-03-11"), 18.5)
+        self.assertAlmostEqual(idx.hoursByGroup(farPast, farFuture)["Project"], 19.0)
+
+    def testGroupChangesAreRegrouped(self):
+        idx = self.index
+        self.assertEqual(idx.hoursByGroup("2024-03-04", "2024-03-11"), {"Project": 14.0, "Overhead": 4.5})
+        self.groups = {"Coding": "Project", "Admin": "Project"}
+        self.assertEqual(idx.hoursByGroup("2024-03-04", "2024-03-11"), {"Project": 17.5})
+
+    def testInvalidateRebuildsFromHistory(self):
+        idx = self.index
+        idx.totalHours("2024-03-04", "2024-03-11")
+        self.history["2024-03-06"] = entry(Admin=1.0)
+        self.assertAlmostEqual(idx.totalHours("2024-03-06", "2024-03-06"), 0.0)
+        idx.invalidate()
+        self.assertAlmostEqual(idx.totalHours("2024-03-06", "2024-03-06"), 1.0)
+
+    def testLegacySummaryEntries(self):
+        self.history = {"2024-03-04": "Admin: 1.5 h\nTotal: 1.5 h", "bad-date": entry(Admin=9.0)}
+        self.assertEqual(self.index.hoursByTask("2024-03-01", "2024-03-31"), {"Admin": 1.5})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import date
+
+from sessionLog import HEARTBEAT_SECONDS, SessionLog, lastEventTime, replayEvents
+from timeline import CompactTimeline
+
+
+class SessionLogTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "session.wal")
+        self.today = date.today().isoformat()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def crashedLog(self, writeEvents):
+        """Write a log through `writeEvents(log)`, abandon it like a crash, and recover it"""
+        log = SessionLog(self.path)
+        log.open(self.today)
+        writeEvents(log)
+        log.close()
+        return SessionLog(self.path).recover(self.today)
+
+
+class TestHeartbeat(SessionLogTestCase):
+    def testBeatsAtMostOncePerInterval(self):
+        def write(log):
+            for second in range(0, 5 * HEARTBEAT_SECONDS, 5):
+                log.heartbeat(1000.0 + second)
+
+        events = self.crashedLog(write)
+        self.assertEqual([ev["e"] for ev in events], ["beat"] * 5)
+        self.assertEqual(lastEventTime(events), 1000.0 + 4 * HEARTBEAT_SECONDS)
+
+    def testReopeningStartsANewInterval(self):
+        log = SessionLog(self.path)
+        log.open(self.today)
+        log.heartbeat(1000.0)
+        log.reset()
+        log.heartbeat(1001.0)
+        log.close()
+        self.assertEqual(SessionLog(self.path).recover(self.today), [{"e": "beat", "t": 1001.0}])
+
+
+class TestRecover(SessionLogTestCase):
+    def testTornLastLineIsSkipped(self):
+        def write(log):
+            log.append("start", t=10.0, task="Admin")
+            log.fh.write('{"e":"stop","t":2')
+
+        self.assertEqual(self.crashedLog(write), [{"e": "start", "t": 10.0, "task": "Admin"}])
+
+    def testLogFromAnotherDayIsSetAside(self):
+        log = SessionLog(self.path)
+        log.open("2020-01-02")
+        log.append("start", t=10.0, task="Admin")
+        log.close()
+        self.assertEqual(SessionLog(self.path).recover(self.today), [])
+        self.assertTrue(os.path.exists(os.path.join(self.dir, "session-2020-01-02.wal")))
+        self.assertFalse(os.path.exists(self.path))
+
+
+class TestReplay(SessionLogTestCase):
+    def newApp(self):
+        # the session fields replayEvents() touches on TaskTrackerApp
+        class App:
+            pass
+
+        app = App()
+        app.tasks = {}
+        app.currentTask = None
+        app.currentStart = None
+        app.unassignedStart = None
+        app.unassignedSeconds = 0.0
+        app.hasEverSelectedTask = False
+        app.hasUnsavedTime = False
+        app.dayTimeline = CompactTimeline(self.today)
+        return app
+
+    def testStoppedTasksAndUntaskedTime(self):
+        def write(log):
+            log.append("start", t=100.0, task="Admin")
+            log.append("stop", t=400.0, task="Admin")
+            log.append("ustart", t=400.0)
+            log.append("ustop", t=460.0)
+            log.append("start", t=460.0, task="Coding")
+            log.append("stop", t=1060.0, task="Coding")
+            log.append("drop", task="Admin")
+
+        app = self.newApp()
+        replayEvents(app, self.crashedLog(write))
+        self.assertEqual(app.tasks, {"Coding": 600.0})
+        self.assertEqual(app.unassignedSeconds, 60.0)
+        self.assertIsNone(app.currentTask)
+        self.assertTrue(app.hasUnsavedTime)
+
+    def testRunningTaskIsLeftOpenAtItsStart(self):
+        def write(log):
+            log.append("start", t=100.0, task="Admin")
+            log.heartbeat(160.0)
+            log.heartbeat(220.0)
+
+        events = self.crashedLog(write)
+        app = self.newApp()
+        replayEvents(app, events)
+        self.assertEqual((app.currentTask, app.currentStart), ("Admin", 100.0))
+        self.assertEqual(lastEventTime(events), 220.0)
+
+    def testSegmentEndsCountAsEvents(self):
+        end = time.mktime((2024, 3, 4, 10, 30, 0, 0, 0, -1))
+
+        def write(log):
+            log.append("start", t=end - 3600, task="Admin")
+            log.append("seg", task="Admin", start="2024-03-04T09:30:00", end="2024-03-04T10:30:00")
+
+        self.assertEqual(lastEventTime(self.crashedLog(write)), end)
+
+    def testAppClosesRunningTaskAtLastHeartbeat(self):
+        try:
+            from timesheet import TaskTrackerApp
+        except ImportError as e:
+            self.skipTest(f"timesheet needs {e.name}")
+        started = time.time() - 600
+
+        def write(log):
+            log.append("start", t=started, task="Admin")
+            for second in range(0, 300, 30):
+                log.heartbeat(started + second)
+
+        self.crashedLog(write)
+        app = TaskTrackerApp.__new__(TaskTrackerApp)
+        app.__dict__.update(vars(self.newApp()))
+        app.sessionLog = SessionLog(self.path)
+        app.minSegmentSeconds = 0
+        app.refreshRowStyles = lambda: None
+        app.replaySessionLog()
+        app.sessionLog.close()
+
+        lastBeat = started + 4 * HEARTBEAT_SECONDS
+        self.assertIsNone(app.currentTask)
+        self.assertAlmostEqual(app.tasks["Admin"], lastBeat - started)
+        self.assertEqual([(task, end - start) for task, start, end in app.dayTimeline], [("Admin", 240)])
+        # the close is logged, so a second crash replays to the same totals
+        again = self.newApp()
+        replayEvents(again, SessionLog(self.path).recover(self.today))
+        self.assertAlmostEqual(again.tasks["Admin"], lastBeat - started)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+
+from timeline import SECONDS_PER_DAY, CompactTimeline, asCompactTimeline, encodeHistoryRecord
+
+
+def segments(*triples):
+    return [{"task": task, "start": start, "end": end} for task, start, end in triples]
+
+
+class TestCompactTimeline(unittest.TestCase):
+    def testSegmentsRoundTrip(self):
+        segs = segments(
+            ("Admin", "2024-03-04T09:00:00", "2024-03-04T10:15:30"),
+            ("Coding", "2024-03-04T10:15:30", "2024-03-04T12:00:00"),
+        )
+        tl = CompactTimeline.fromSegments(segs)
+        self.assertEqual(tl.dayKey, "2024-03-04")
+        self.assertEqual(list(tl), [("Admin", 9 * 3600, 10 * 3600 + 15 * 60 + 30), ("Coding", 36930, 12 * 3600)])
+        self.assertEqual(tl.toSegments(), segs)
+
+    def testTimezoneSuffixAndBadSegmentsAreHandled(self):
+        tl = CompactTimeline.fromSegments([
+            {"task": "Admin", "start": "2024-03-04T09:00:00+02:00", "end": "2024-03-04T09:30:00Z"},
+            {"task": "Admin", "start": "not a time", "end": "2024-03-04T10:00:00"},
+            "junk",
+            {"start": "2024-03-04T11:00", "end": "2024-03-04T11:45"},
+        ])
+        self.assertEqual(list(tl), [("Admin", 9 * 3600, 9 * 3600 + 1800), ("Untasked", 11 * 3600, 11 * 3600 + 2700)])
+
+    def testSegmentPastMidnightKeepsItsDay(self):
+        segs = segments(("Admin", "2024-03-04T23:30:00", "2024-03-05T00:45:00"))
+        tl = CompactTimeline.fromSegments(segs)
+        self.assertEqual(list(tl), [("Admin", 23 * 3600 + 1800, SECONDS_PER_DAY + 2700)])
+        self.assertEqual(tl.toSegments(), segs)
+
+    def testExtendRebasesOntoThisDay(self):
+        tl = CompactTimeline.fromSegments(segments(("Admin", "2024-03-04T22:00:00", "2024-03-04T23:00:00")))
+        nextDay = CompactTimeline.fromSegments(segments(("Coding", "2024-03-05T00:30:00", "2024-03-05T01:00:00")))
+        tl.extend(nextDay)
+        self.assertEqual(tl.dayKey, "2024-03-04")
+        self.assertEqual(list(tl)[1], ("Coding", SECONDS_PER_DAY + 1800, SECONDS_PER_DAY + 3600))
+        self.assertEqual(tl.toSegments()[1], {"task": "Coding", "start": "2024-03-05T00:30:00", "end": "2024-03-05T01:00:00"})
+
+    def testExtendClampsTimeBeforeThisDay(self):
+        tl = CompactTimeline("2024-03-05")
+        tl.extend(CompactTimeline.fromSegments(segments(("Admin", "2024-03-04T23:00:00", "2024-03-05T00:30:00"))))
+        self.assertEqual(list(tl), [("Admin", 0, 1800)])
+
+    def testExtendSameDayAndEmpty(self):
+        tl = CompactTimeline()
+        tl.extend(CompactTimeline.fromSegments(segments(("Admin", "2024-03-04T09:00:00", "2024-03-04T10:00:00"))))
+        tl.extend(CompactTimeline.fromSegments(segments(("Coding", "2024-03-04T10:00:00", "2024-03-04T11:00:00"))))
+        tl.extend([("Admin", 11 * 3600, 12 * 3600)])
+        self.assertEqual(tl.dayKey, "2024-03-04")
+        self.assertEqual([task for task, _, _ in tl], ["Admin", "Coding", "Admin"])
+
+    def testCopyIsIndependent(self):
+        tl = CompactTimeline.fromSegments(segments(("Admin", "2024-03-04T09:00:00", "2024-03-04T10:00:00")))
+        copy = tl.copy()
+        copy.starts[0] = 0
+        self.assertEqual(tl.starts[0], 9 * 3600)
+        self.assertNotEqual(tl, copy)
+        self.assertEqual(tl, tl.copy())
+
+    def testEncodeHistoryRecord(self):
+        segs = segments(("Admin", "2024-03-04T09:00:00", "2024-03-04T10:00:00"))
+        obj = {"type": "history", "date": "2024-03-04", "timeline": asCompactTimeline(segs, "2024-03-04")}
+        encoded = encodeHistoryRecord(obj)
+        self.assertEqual(encoded["timeline"], segs)
+        self.assertIsInstance(obj["timeline"], CompactTimeline)
+        plain = {"type": "history", "date": "2024-03-04", "timeline": segs}
+        self.assertIs(encodeHistoryRecord(plain), plain)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+from array import array
+from datetime import date, timedelta
+
+from taskDictionary import taskDictionary
+
+SECONDS_PER_DAY = 24 * 3600
+
+
+def _splitIso(ts):
+    """"YYYY-MM-DDTHH:MM[:SS][tz]" -> (datePart, seconds since that midnight), or None"""
+    if not ts or "T" not in ts:
+        return None
+    datePart, tpart = ts.split("T", 1)
+    # wall-clock time only, same as the History window always did
+    for sep in ("+", "-", "Z"):
+        idx = tpart.find(sep)
+        if idx > 0:
+            tpart = tpart[:idx]
+            break
+    comps = tpart.split(":")
+    if len(comps) < 2:
+        return None
+    try:
+        h = int(comps[0])
+        m = int(comps[1])
+        s = int(float(comps[2])) if len(comps) > 2 else 0
+    except ValueError:
+        return None
+    return datePart, h * 3600 + m * 60 + s
+
+
+class CompactTimeline:
+    """
+    A day's timeline as parallel arrays instead of a list of ISO-string dicts:
+    taskDictionary ids, and array('I') start/end seconds since midnight of
+    `dayKey`. A segment that runs past midnight keeps an end above 86400.
+
+    Iterating yields (task, startSec, endSec). The JSON form
+    ({"task", "start", "end"} with ISO strings) is only produced and parsed at
+    the storage boundary by fromSegments()/toSegments().
+    """
+    __slots__ = ("dayKey", "taskIds", "starts", "ends")
+
+    def __init__(self, dayKey=None):
+        self.dayKey = dayKey
+        self.taskIds = array("I")
+        self.starts = array("I")
+        self.ends = array("I")
+
+    def append(self, task, startSec, endSec):
+        self.taskIds.append(taskDictionary.idFor(task or "Untasked"))
+        self.starts.append(max(0, int(startSec)))
+        self.ends.append(max(0, int(endSec)))
+
+    def _dayOffset(self, datePart):
+        if not self.dayKey or datePart == self.dayKey:
+            return 0
+        try:
+            return (date.fromisoformat(datePart) - date.fromisoformat(self.dayKey)).days * SECONDS_PER_DAY
+        except ValueError:
+            return 0
+
+    def appendIso(self, task, startIso, endIso):
+        """Append a segment given as ISO strings; returns False if either can't be parsed"""
+        start = _splitIso(startIso)
+        end = _splitIso(endIso)
+        if start is None or end is None:
+            return False
+        if self.dayKey is None:
+            self.dayKey = start[0]
+        self.append(task, start[1] + self._dayOffset(start[0]), end[1] + self._dayOffset(end[0]))
+        return True
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        names = taskDictionary.names
+        for tid, start, end in zip(self.taskIds, self.starts, self.ends):
+            yield names[tid], start, end
+
+    def task(self, i):
+        return taskDictionary.name(self.taskIds[i])
+
+    def extend(self, other):
+        if isinstance(other, CompactTimeline):
+            if self.dayKey is None:
+                self.dayKey = other.dayKey
+            elif other.dayKey and other.dayKey != self.dayKey:
+                # seconds count from the other timeline's midnight (e.g. the app ran past
+                # midnight); rebase them onto this day, clamping anything before it to 0
+                offset = self._dayOffset(other.dayKey)
+                for tid, start, end in zip(other.taskIds, other.starts, other.ends):
+                    self.taskIds.append(tid)
+                    self.starts.append(max(0, start + offset))
+                    self.ends.append(max(0, end + offset))
+                return
+            # ids are shared by every timeline, so the arrays can be joined as-is
+            self.taskIds.extend(other.taskIds)
+            self.starts.extend(other.starts)
+            self.ends.extend(other.ends)
+            return
+        for task, start, end in other:
+            self.append(task, start, end)
+
+    def copy(self):
+        tl = CompactTimeline(self.dayKey)
+        tl.taskIds = array("I", self.taskIds)
+        tl.starts = array("I", self.starts)
+        tl.ends = array("I", self.ends)
+        return tl
+
+    def __eq__(self, other):
+        if not isinstance(other, CompactTimeline):
+            return NotImplemented
+        return self.dayKey == other.dayKey and list(self) == list(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"CompactTimeline({self.dayKey!r}, {len(self)} segments)"
+
+    @classmethod
+    def fromSegments(cls, segments, dayKey=None):
+        """Parse JSON timeline segments; unparseable segments are dropped"""
+        tl = cls(dayKey)
+        for seg in segments or []:
+            if isinstance(seg, dict):
+                tl.appendIso(seg.get("task") or "Untasked", seg.get("start"), seg.get("end"))
+        return tl
+
+    def _iso(self, secs):
+        days, rem = divmod(int(secs), SECONDS_PER_DAY)
+        dayKey = self.dayKey
+        if days:
+            dayKey = (date.fromisoformat(dayKey) + timedelta(days=days)).isoformat()
+        h, rem = divmod(rem, 3600)
+        m, s = divmod(rem, 60)
+        return f"{dayKey}T{h:02d}:{m:02d}:{s:02d}"
+
+    def toSegments(self):
+        return [{"task": task, "start": self._iso(start), "end": self._iso(end)} for task, start, end in self]
+
+
+def asCompactTimeline(value, dayKey=None):
+    """Accept either representation (legacy documents still hand out JSON lists)"""
+    if isinstance(value, CompactTimeline):
+        return value
+    return CompactTimeline.fromSegments(value or [], dayKey)
+
+
+def encodeHistoryRecord(obj):
+    """Copy of a history record with its timeline in JSON form"""
+    timeline = obj.get("timeline")
+    if isinstance(timeline, CompactTimeline):
+        obj = dict(obj)
+        obj["timeline"] = timeline.toSegments()
+    return obj
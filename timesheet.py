@@ -3,12 +3,20 @@ from tkinter import messagebox
 import time
 import os
 import sys
-import json
-import tempfile
 import threading
 from datetime import date, timedelta, datetime
 from openHistory import openHistory as openHistoryImpl
 from settings import openSettings as openSettingsImpl, loadSettings as loadSettingsImpl
+from storage import openStorage
+from payPeriods import PayPeriodCalendar
+from periodAggregates import PeriodAggregates
+from rangeIndex import HoursIndex
+from analytics import HistoryMatrix, summarize, DEFAULT_TREND_MONTHS
+from unitOfWork import UnitOfWork
+from writeBehind import WriteBehindPersister
+from sessionLog import SessionLog, lastEventTime, replayEvents
+from timeline import CompactTimeline, asCompactTimeline, SECONDS_PER_DAY
+from summaries import entryNumbers, makeSummary
 
 
 def resourcePath(relPath):
@@ -64,7 +72,6 @@ class TaskTrackerApp:
         self.useTimesheetFunctions = self.settings.get("useTimesheetFunctions", False)
         self.autoChargeCodes = self.settings.get("autoChargeCodes", False)
 
-
         self.bgColor = "#111315"
         self.cardColor = "#1e2227"
         self.accentColor = "#3f8cff"
@@ -108,10 +115,23 @@ class TaskTrackerApp:
         baseDir = self.getDataDir()
         self.realPath = os.path.join(baseDir, "tasks.jsonl")
         self.dataFile = self.realPath
-        self.dayTimeline = []
+        self.dayTimeline = CompactTimeline(date.today().isoformat())
+        self.storage = openStorage(baseDir, self.settings)
+        # pay-period schedule of settings.json, shared by History, the day editor and posting
+        self.payPeriods = PayPeriodCalendar.fromSettings(self.settings)
+        # per-pay-period totals for History, kept in step with every saved day
+        self.periodTotals = PeriodAggregates.besideDataFile(self.realPath, calendar=self.payPeriods)
+        # per-task/group cumulative hours for date-range queries, built on first use
+        self.hoursIndex = HoursIndex(lambda: self.history, lambda: self.groups)
+        # start dates of the archived periods already merged into history (decompressed once per load)
+        self.archivedLoaded = set()
+        # task/group edits (drag reorders, add/delete, grouping) are saved off the Tk thread
+        self.persister = WriteBehindPersister(self.sync_task_group_section)
+        self.sessionLog = SessionLog(os.path.join(baseDir, "session.wal"))
 
         self.buildUi()
         self.loadData()
+        self.replaySessionLog()
         self.restoreTodayTimeline()
         self.relayoutRows()
         self.updateLoop()
@@ -147,9 +167,29 @@ class TaskTrackerApp:
         todayKey = date.today().isoformat()
         entry = self.history.get(todayKey)
         if isinstance(entry, dict):
-            timeline = entry.get("timeline", []) or []
+            timeline = asCompactTimeline(entry.get("timeline"), todayKey)
             if timeline:
-                self.dayTimeline = [dict(seg) for seg in timeline]
+                # segments replayed from the session log come after the saved ones
+                restored = timeline.copy()
+                restored.extend(self.dayTimeline)
+                self.dayTimeline = restored
+
+    def replaySessionLog(self):
+        """Rebuild an unsaved session (e.g. after a crash) from the write-ahead log"""
+        todayKey = date.today().isoformat()
+        events = self.sessionLog.recover(todayKey)
+        if events:
+            replayEvents(self, events)
+        self.sessionLog.open(todayKey)
+        if events:
+            # a task (or untasked time) still running when the log stopped ends at the last
+            # logged event or heartbeat, so the time the app was down isn't credited to it
+            lastT = lastEventTime(events)
+            if lastT is not None:
+                self._closeActiveSegment(lastT)
+                self._accrueCurrentTask(lastT)
+                self.stopUnassigned(lastT)
+            self.refreshRowStyles()
 
     def buildUi(self):
         topBar = tk.Frame(self.root, bg=self.bgColor)
@@ -360,137 +400,184 @@ class TaskTrackerApp:
             self.startTask(name)
 
     def loadData(self):
-        if not os.path.exists(self.dataFile):
-            return
+        # reloading must see task/group edits still waiting in the write-behind queue
+        self.persister.flush()
         try:
-            tasks_list = []
-            groups = {}
-            history = {}
-            with open(self.dataFile, "r", encoding="utf-8") as f:
-                is_jsonl = True
-                for raw in f:
-                    line = raw.strip()
-                    if not line:
-                        continue
-                    try:
-                        obj = json.loads(line)
-                    except Exception:
-                        # not JSONL -> fallback to full JSON
-                        is_jsonl = False
-                        break
-                    t = obj.get("type")
-                    if t == "task":
-                        name = obj.get("name")
-                        if name:
-                            tasks_list.append(name)
-                    elif t == "group":
-                        task = obj.get("task")
-                        grp = obj.get("group")
-                        if task:
-                            groups[task] = grp
-                    elif t == "history":
-                        d = obj.get("date")
-                        if not d:
-                            continue
-                        entry = {}
-                        entry["summary"] = obj.get("summary", "") or ""
-                        entry["timeline"] = obj.get("timeline", []) or []
-                        history[d] = entry
-                if not is_jsonl:
-                    # fallback: parse entire file as legacy JSON
-                    f.seek(0)
-                    data = json.load(f)
-                    tasks_list = data.get("tasks", [])
-                    history = data.get("history", {}) or {}
-                    groups = data.get("groups", {}) or {}
+            loaded = self.storage.load()
+            if loaded is None:
+                return
+            tasks_list, groups, history = loaded
             for name in tasks_list:
                 self.createTaskRow(name)
             self.history = history
             self.groups = groups
+            self.archivedLoaded = set()
+            self.periodTotals.load(self.storage.historyVersion(), history)
+            self.hoursIndex.invalidate()
         except Exception:
             self.history = {}
+            self.archivedLoaded = set()
+            self.periodTotals.rebuild({})
+            self.hoursIndex.invalidate()
+            return
+        self._showLoadReports()
+
+    def refreshData(self):
+        """
+        Catch up with changes to the data file since it was loaded: nothing to
+        do when it is unchanged, only appended days are parsed when possible,
+        and a full reload happens otherwise.
+        """
+        self.persister.flush()
+        try:
+            changes = self.storage.refresh()
+        except Exception:
+            self.loadData()
+            return
+        if changes is None:
+            return
+        tasks_list, groups, history, full = changes
+        for name in tasks_list or []:
+            self.createTaskRow(name)
+        if groups is not None:
+            self.groups = groups
+        if full:
+            self.history = history
+            self.archivedLoaded = set()
+            self.periodTotals.load(self.storage.historyVersion(), history)
+            self.hoursIndex.invalidate()
+        else:
+            for dayKey, entry in history.items():
+                self.setHistoryEntry(dayKey, entry)
+        self._showLoadReports()
+
+    def _showLoadReports(self):
+        report = getattr(self.storage, "migrationReport", None)
+        if report:
+            self.storage.migrationReport = None
+            message = f"Converted data file to JSONL ({report['days']} days) in {report['seconds']:.2f} s"
+            self.root.after(500, lambda: self.showToast(message, timeout=5000))
+        report = getattr(self.storage, "integrityReport", None)
+        if report:
+            self.storage.integrityReport = None
+            message = f"Moved {report['lines']} damaged line(s) to {os.path.basename(report['path'])}"
+            self.root.after(500, lambda: self.showToast(message, timeout=8000, error=True))
+
+    def getHistoryEntry(self, dayKey):
+        """One day's history entry; loaded entries read their timeline from storage on first use"""
+        return self.history.get(dayKey)
+
+    def setHistoryEntry(self, dayKey, entry):
+        """Replace one day's history entry in memory, moving its hours between the pay-period totals"""
+        startKey = self.payPeriods.keyOf(dayKey)
+        if startKey is not None and not self.periodTotals.hasPeriod(startKey):
+            # a day of an archived period (saved into its segment): the whole period joins
+            # the in-memory totals, which then no longer match the file alone
+            archivedStart = self.storage.archivedPeriodCovering(dayKey)
+            if archivedStart is not None:
+                self.loadArchivedPeriod(archivedStart)
+            for d in self.payPeriods.periodOf(startKey).dates():
+                if d != dayKey and d in self.history:
+                    self.periodTotals.replaceDay(d, None, self.history[d], saved=archivedStart is None)
+        self.periodTotals.replaceDay(dayKey, self.history.get(dayKey), entry)
+        self.hoursIndex.replaceDay(dayKey, self.history.get(dayKey), entry)
+        self.history[dayKey] = entry
+
+    def addArchivedDays(self, entries):
+        """Put days read from the archive into history (not the period totals); returns the dates added"""
+        added = []
+        for dayKey, entry in entries.items():
+            if dayKey not in self.history:
+                self.history[dayKey] = entry
+                self.hoursIndex.replaceDay(dayKey, None, entry)
+                added.append(dayKey)
+        return added
+
+    def loadArchivedPeriod(self, startKey):
+        """Merge one archived period into history, decompressing it only the first time after a load"""
+        if startKey in self.archivedLoaded:
+            return []
+        added = self.addArchivedDays(self.storage.loadArchivedPeriod(startKey))
+        self.archivedLoaded.add(startKey)
+        return added
+
+    def _loadArchivedBetween(self, startKey, endKey):
+        for header in self.storage.archivedPeriods():
+            if header.get("start", "") <= endKey and header.get("end", "") >= startKey:
+                self.loadArchivedPeriod(header["start"])
+
+    def hoursBetween(self, startKey, endKey, task=None, group=None):
+        """
+        Hours from startKey to endKey (ISO dates, both inclusive) on `task`, on
+        `group`, or in total. Archived periods in the range are loaded first;
+        after that each query is O(log days).
+        """
+        self._loadArchivedBetween(startKey, endKey)
+        if task is not None:
+            return self.hoursIndex.taskHours(task, startKey, endKey)
+        if group is not None:
+            return self.hoursIndex.groupHours(group, startKey, endKey)
+        return self.hoursIndex.totalHours(startKey, endKey)
+
+    def hoursByTaskBetween(self, startKey, endKey):
+        """{task: hours} from startKey to endKey (inclusive) for every task with time in the range"""
+        self._loadArchivedBetween(startKey, endKey)
+        return self.hoursIndex.hoursByTask(startKey, endKey)
+
+    def hoursByGroupBetween(self, startKey, endKey):
+        self._loadArchivedBetween(startKey, endKey)
+        return self.hoursIndex.hoursByGroup(startKey, endKey)
+
+    def analyticsBetween(self, startKey, endKey, trendMonths=DEFAULT_TREND_MONTHS):
+        """Report (analytics.summarize) of startKey..endKey (inclusive), archived periods in the range loaded first"""
+        self._loadArchivedBetween(startKey, endKey)
+        matrix = HistoryMatrix.fromHistory(self.history, startKey, endKey)
+        return summarize(matrix, self.groups, trendMonths)
 
     def saveData(self):
-        self.sync_task_group_section()
+        self.persister.markDirty((list(self.rows.keys()), dict(self.groups or {})))
         return
 
-    def sync_task_group_section(self):
-        desired_tasks = list(self.rows.keys())
-        desired_groups = dict(self.groups or {})
-
+    def sync_task_group_section(self, snapshot=None):
         dirpath = os.path.dirname(self.realPath) or self.getDataDir()
         try:
             os.makedirs(dirpath, exist_ok=True)
         except Exception:
             pass
-
-        if not os.path.exists(self.realPath):
-            try:
-                with open(self.realPath, "w", encoding="utf-8") as f:
-                    for name in desired_tasks:
-                        f.write(json.dumps({"type": "task", "name": name}, ensure_ascii=False, separators=(',',':')) + "\n")
-                    for t, g in desired_groups.items():
-                        f.write(json.dumps({"type": "group", "task": t, "group": g}, ensure_ascii=False, separators=(',',':')) + "\n")
-                self.dataFile = self.realPath
-            except Exception:
-                pass
-            return
-
-        tmp = None
-        try:
-            preserved_history = []
-            preserved_chargeCodes = []
-            preserved_other = []
-            with open(self.realPath, "r", encoding="utf-8") as rf:
-                for raw in rf:
-                    line = raw.rstrip("\n")
-                    if not line.strip():
-                        continue
-                    try:
-                        obj = json.loads(line)
-                    except Exception:
-                        preserved_other.append(line.strip())
-                        continue
-                    t = obj.get("type")
-                    if t == "history":
-                        preserved_history.append(obj)
-                    elif t == "chargeCode":
-                        preserved_chargeCodes.append(obj)
-                    else:
-                        continue
-
-            tmp = tempfile.NamedTemporaryFile(mode="w", encoding="utf-8", delete=False, dir=dirpath)
-            for name in desired_tasks:
-                tmp.write(json.dumps({"type": "task", "name": name}, ensure_ascii=False, separators=(',',':')) + "\n")
-            for t, g in desired_groups.items():
-                tmp.write(json.dumps({"type": "group", "task": t, "group": g}, ensure_ascii=False, separators=(',',':')) + "\n")
-            for obj in preserved_chargeCodes:
-                tmp.write(json.dumps(obj, ensure_ascii=False, separators=(',',':')) + "\n")
-            for obj in preserved_history:
-                tmp.write(json.dumps(obj, ensure_ascii=False, separators=(',',':')) + "\n")
-            for l in preserved_other:
-                tmp.write(l + "\n")
-
-            tmp.flush()
-            tmp.close()
-            os.replace(tmp.name, self.realPath)
-            self.dataFile = self.realPath
-        except Exception:
-            try:
-                if tmp is not None:
-                    tmp.close()
-                    if os.path.exists(tmp.name):
-                        os.remove(tmp.name)
-            except Exception:
-                pass
-            return
-
-    def append_history_entry(self, dateKey, entry):
+        if snapshot is None:
+            snapshot = (list(self.rows.keys()), dict(self.groups or {}))
+        tasks, groups = snapshot
+        self.storage.saveTasksAndGroups(tasks, groups)
+
+    def flushPendingWrites(self):
+        """Write any debounced task/group changes and wait for background storage work"""
+        self.persister.flush()
+        self.storage.waitForBackgroundWork()
+        # saved on the way out only: a crash just means one rebuild on the next start
+        self.periodTotals.save(self.storage.historyVersion())
+
+    def unitOfWork(self):
+        """
+        Batch for one user action's storage writes; a pending debounced
+        task/group snapshot joins it instead of being written separately.
+        """
         dirpath = os.path.dirname(self.realPath) or self.getDataDir()
         try:
             os.makedirs(dirpath, exist_ok=True)
         except Exception:
             pass
+        batch = UnitOfWork(self.storage)
+        snapshot = self.persister.takePending()
+        if snapshot is not None:
+            batch.setTasksAndGroups(*snapshot)
+        return batch
+
+    def append_history_entry(self, dateKey, entry, batch=None):
+        """Save one day's history, in `batch` when given or else as its own unit of work"""
+        if batch is None:
+            with self.unitOfWork() as batch:
+                self.append_history_entry(dateKey, entry, batch)
+            return
 
         if isinstance(entry, dict):
             summary = entry.get("summary", "") or ""
@@ -498,80 +585,14 @@ class TaskTrackerApp:
         else:
             summary = entry or ""
             timeline = []
+        hoursByTask, secondsByTask = entryNumbers(entry)
 
-        new_obj = {"type": "history", "date": dateKey, "summary": summary, "timeline": timeline}
-
-        # If file doesn't exist, create and write tasks/groups then history.
-        if not os.path.exists(self.realPath):
-            try:
-                with open(self.realPath, "w", encoding="utf-8") as f:
-                    for name in list(self.rows.keys()):
-                        f.write(json.dumps({"type": "task", "name": name}, ensure_ascii=False, separators=(',',':')) + "\n")
-                    for t, g in (self.groups or {}).items():
-                        f.write(json.dumps({"type": "group", "task": t, "group": g}, ensure_ascii=False, separators=(',',':')) + "\n")
-                    f.write(json.dumps(new_obj, ensure_ascii=False, separators=(',',':')) + "\n")
-                self.dataFile = self.realPath
-            except Exception:
-                pass
-            return
-
-        tmp = None
-        try:
-            preserved_history = []
-            preserved_chargeCodes = []
-            preserved_other = []
-            with open(self.realPath, "r", encoding="utf-8") as rf:
-                for raw in rf:
-                    line = raw.rstrip("\n")
-                    if not line.strip():
-                        # skip blank lines for compactness
-                        continue
-                    try:
-                        obj = json.loads(line)
-                    except Exception:
-                        preserved_other.append(line.strip())
-                        continue
-                    if obj.get("type") == "history" and obj.get("date") == dateKey:
-                        # skip existing history for this date (we will append the new one)
-                        continue
-                    if obj.get("type") == "history":
-                        preserved_history.append(obj)
-                    elif obj.get("type") == "chargeCode":
-                        preserved_chargeCodes.append(obj)
-                    else:
-                        # skip other JSON (task/group) lines
-                        continue
-
-            tmp = tempfile.NamedTemporaryFile(mode="w", encoding="utf-8", delete=False, dir=dirpath)
-            # write current tasks/groups fresh
-            for name in list(self.rows.keys()):
-                tmp.write(json.dumps({"type": "task", "name": name}, ensure_ascii=False, separators=(',',':')) + "\n")
-            for t, g in (self.groups or {}).items():
-                tmp.write(json.dumps({"type": "group", "task": t, "group": g}, ensure_ascii=False, separators=(',',':')) + "\n")
-            # write preserved chargeCode lines
-            for obj in preserved_chargeCodes:
-                tmp.write(json.dumps(obj, ensure_ascii=False, separators=(',',':')) + "\n")
-            # Append preserved history entries
-            for obj in preserved_history:
-                tmp.write(json.dumps(obj, ensure_ascii=False, separators=(',',':')) + "\n")
-            # Append any non-JSON preserved lines trimmed
-            for l in preserved_other:
-                tmp.write(l + "\n")
-            # Append the new history record at the end.
-            tmp.write(json.dumps(new_obj, ensure_ascii=False, separators=(',',':')) + "\n")
-            tmp.flush()
-            tmp.close()
-            os.replace(tmp.name, self.realPath)
-            self.dataFile = self.realPath
-        except Exception:
-            try:
-                if tmp is not None:
-                    tmp.close()
-                    if os.path.exists(tmp.name):
-                        os.remove(tmp.name)
-            except Exception:
-                pass
-            return
+        # "timeline" stays last so loaders can parse a record's head without it
+        new_obj = {
+            "type": "history", "date": dateKey, "summary": summary,
+            "hoursByTask": hoursByTask, "secondsByTask": secondsByTask, "timeline": timeline,
+        }
+        batch.saveHistory(dateKey, new_obj)
 
     def adjustWindowHeight(self):
         self.root.update_idletasks()
@@ -681,6 +702,7 @@ class TaskTrackerApp:
         if self.unassignedStart is None:
             self.unassignedStart = now
             self.hasUnsavedTime = True
+            self.sessionLog.append("ustart", t=now)
 
     def stopUnassigned(self, now=None):
         if self.unassignedStart is None:
@@ -689,6 +711,16 @@ class TaskTrackerApp:
             now = time.time()
         self.unassignedSeconds += now - self.unassignedStart
         self.unassignedStart = None
+        self.sessionLog.append("ustop", t=now)
+
+    def _accrueCurrentTask(self, now):
+        """Add the running task's elapsed time to its total and stop it"""
+        if self.currentTask is not None and self.currentStart is not None:
+            elapsed = now - self.currentStart
+            self.tasks[self.currentTask] = self.tasks.get(self.currentTask, 0.0) + elapsed
+            self.sessionLog.append("stop", t=now, task=self.currentTask)
+        self.currentTask = None
+        self.currentStart = None
 
     def _recordSegment(self, label, startTs, endTs):
         if not label or startTs is None or endTs is None:
@@ -698,25 +730,13 @@ class TaskTrackerApp:
             return
         startIso = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(startTs))
         endIso = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(endTs))
-        self.dayTimeline.append({
-            "task": label,
-            "start": startIso,
-            "end": endIso
-        })
+        self.dayTimeline.appendIso(label, startIso, endIso)
+        self.sessionLog.append("seg", task=label, start=startIso, end=endIso)
 
     def _roundTimelineEdgesToHour(self, timeline):
         if not self.roundToHours or not timeline:
             return timeline
 
-        def parseIso(s):
-            try:
-                return datetime.fromisoformat(s)
-            except Exception:
-                return None
-
-        def fmtIso(dtObj):
-            return dtObj.strftime("%Y-%m-%dT%H:%M:%S")
-
         def parseHHMM(s, fallbackHour, fallbackMinute):
             try:
                 parts = (s or "").split(":")
@@ -726,27 +746,24 @@ class TaskTrackerApp:
             except Exception:
                 return fallbackHour, fallbackMinute
 
-        first = timeline[0]
-        last = timeline[-1]
-
-        firstStart = parseIso(first.get("start"))
-        lastEnd = parseIso(last.get("end"))
-
-        if firstStart is None or lastEnd is None:
+        # loaded timelines are shared with storage caches, so round a copy
+        timeline = asCompactTimeline(timeline, date.today().isoformat()).copy()
+        if not timeline:
             return timeline
 
         workStartHour, workStartMinute = parseHHMM(self.workDayStart, 9, 0)
         workEndHour, workEndMinute = parseHHMM(self.workDayEnd, 17, 0)
 
-        day = firstStart.date()
-        workStart = datetime(day.year, day.month, day.day, workStartHour, workStartMinute, 0)
-        workEnd = datetime(day.year, day.month, day.day, workEndHour, workEndMinute, 0)
-        
-        if abs((firstStart - workStart).total_seconds()) <= 5 * 60:
-            first["start"] = fmtIso(workStart)
+        # work hours on the day of the first segment
+        dayBase = (timeline.starts[0] // SECONDS_PER_DAY) * SECONDS_PER_DAY
+        workStart = dayBase + workStartHour * 3600 + workStartMinute * 60
+        workEnd = dayBase + workEndHour * 3600 + workEndMinute * 60
+
+        if abs(timeline.starts[0] - workStart) <= 5 * 60:
+            timeline.starts[0] = workStart
 
-        if abs((lastEnd - workEnd).total_seconds()) <= 5 * 60:
-            last["end"] = fmtIso(workEnd)
+        if abs(timeline.ends[-1] - workEnd) <= 5 * 60:
+            timeline.ends[-1] = workEnd
 
         return timeline
 
@@ -872,6 +889,10 @@ class TaskTrackerApp:
     def postChargeCodeHours(self, taskSecondsSnapshot=None, dateKey=None):
         if not self.autoChargeCodes:
             return
+        if dateKey and not self.payPeriods.isCurrent(dateKey):
+            # the session's timesheet only covers the current pay period
+            self.showToast("Not posted: the day is outside the current pay period", error=True)
+            return
 
         def job():
             try:
@@ -1053,10 +1074,7 @@ class TaskTrackerApp:
         self._closeActiveSegment(now)
 
         if self.currentTask is not None and self.currentStart is not None:
-            elapsed = now - self.currentStart
-            self.tasks[self.currentTask] = self.tasks.get(self.currentTask, 0.0) + elapsed
-            self.currentTask = None
-            self.currentStart = None
+            self._accrueCurrentTask(now)
             self.refreshRowStyles()
 
         self.stopUnassigned(now)
@@ -1069,11 +1087,7 @@ class TaskTrackerApp:
                 )
 
             roundedHours, totalHours = self._normalizeRoundedHours(taskSecondsForSummary)
-            lines = []
-            for name, hours in sorted(roundedHours.items(), key=lambda kv: kv[0].lower()):
-                lines.append(f"{name}: {hours:.1f} h")
-            lines.append(f"Total: {totalHours:.1f} h")
-            summary = "\n".join(lines)
+            summary = makeSummary(roundedHours, totalHours, taskSecondsForSummary)
 
             todayKey = date.today().isoformat()
             merged, choice = self._mergeSummaryForDate(todayKey, summary, allowSkip=True)
@@ -1083,26 +1097,26 @@ class TaskTrackerApp:
 
             if merged == "__SKIP__" or choice == "skip":
                 self.hasUnsavedTime = False
-                self.dayTimeline = []
+                self.dayTimeline = CompactTimeline(todayKey)
+                self.sessionLog.reset()
+                self.flushPendingWrites()
                 self.root.destroy()
                 return
 
             existingEntry = self.history.get(todayKey)
-            existingTimeline = []
+            existingTimeline = CompactTimeline(todayKey)
             if isinstance(existingEntry, dict):
-                existingTimeline = existingEntry.get("timeline", []) or []
+                existingTimeline = asCompactTimeline(existingEntry.get("timeline"), todayKey)
 
             if choice == "append":
-                timeline = existingTimeline + list(self.dayTimeline)
+                timeline = existingTimeline.copy()
+                timeline.extend(self.dayTimeline)
             else:
-                timeline = list(self.dayTimeline)
+                timeline = self.dayTimeline.copy()
 
             timeline = self._roundTimelineEdgesToHour(timeline)
 
-            self.history[todayKey] = {
-                "summary": merged,
-                "timeline": timeline
-            }
+            self.setHistoryEntry(todayKey, dict(merged, timeline=timeline))
             # append only the day's summary to the jsonl log
             self.append_history_entry(todayKey, self.history[todayKey])
 
@@ -1114,13 +1128,9 @@ class TaskTrackerApp:
                 )
 
             if choice == "append" and existingEntry:
-                if isinstance(existingEntry, dict):
-                    existingText = existingEntry.get("summary", "") or ""
-                else:
-                    existingText = existingEntry or ""
-                oldAgg, _ = self._parseSummaryText(existingText)
-                for name, hours in oldAgg.items():
-                    taskSecondsSnapshot[name] = taskSecondsSnapshot.get(name, 0.0) + (hours * 3600.0)
+                _, oldSeconds = entryNumbers(existingEntry)
+                for name, secs in oldSeconds.items():
+                    taskSecondsSnapshot[name] = taskSecondsSnapshot.get(name, 0.0) + secs
 
             if self.unassignedSeconds > 0:
                 taskSecondsSnapshot["Untasked"] = (
@@ -1138,8 +1148,11 @@ class TaskTrackerApp:
             self.postChargeCodeHours(taskSecondsSnapshot)
             
             self.hasUnsavedTime = False
-            self.dayTimeline = []
+            self.dayTimeline = CompactTimeline(todayKey)
+            self.sessionLog.reset()
 
+        self.flushPendingWrites()
+        self.sessionLog.close()
         self.root.destroy()
 
     def endDrag(self, event):
@@ -1178,11 +1191,15 @@ class TaskTrackerApp:
         for name in self.tasks.keys():
             self.tasks[name] = 0.0
         
-        self.dayTimeline = []
-        
         todayKey = date.today().isoformat()
+        self.dayTimeline = CompactTimeline(todayKey)
+        
         if todayKey in self.history:
+            # only forgotten in memory; the saved day stays on disk
+            self.periodTotals.replaceDay(todayKey, self.history[todayKey], None, saved=False)
+            self.hoursIndex.replaceDay(todayKey, self.history[todayKey], None)
             del self.history[todayKey]
+        self.sessionLog.reset(todayKey)
         
         self.hasUnsavedTime = False
         self.refreshRowStyles()
@@ -1197,21 +1214,14 @@ class TaskTrackerApp:
         self._closeActiveSegment(now)
 
         if self.currentTask == name:
-            if self.currentStart is not None:
-                elapsed = now - self.currentStart
-                self.tasks[self.currentTask] = self.tasks.get(self.currentTask, 0.0) + elapsed
-            self.currentTask = None
-            self.currentStart = None
+            self._accrueCurrentTask(now)
             self.startUnassigned(now)
             self.hasUnsavedTime = True
             self.refreshRowStyles()
             return
 
         if self.currentTask is not None and self.currentStart is not None:
-            elapsed = now - self.currentStart
-            self.tasks[self.currentTask] = self.tasks.get(self.currentTask, 0.0) + elapsed
-            self.currentTask = None
-            self.currentStart = None
+            self._accrueCurrentTask(now)
 
         self.stopUnassigned(now)
 
@@ -1219,6 +1229,7 @@ class TaskTrackerApp:
         self.currentTask = name
         self.currentStart = now
         self.hasUnsavedTime = True
+        self.sessionLog.append("start", t=now, task=name)
         self.refreshRowStyles()
         
         shouldPunchIn = not any(self.tasks.values()) and self.unassignedSeconds == 0
@@ -1253,10 +1264,7 @@ class TaskTrackerApp:
 
         if self.currentTask == name and self.currentStart is not None:
             self._closeActiveSegment(now)
-            elapsed = now - self.currentStart
-            self.tasks[name] = self.tasks.get(name, 0.0) + elapsed
-            self.currentTask = None
-            self.currentStart = None
+            self._accrueCurrentTask(now)
             self.startUnassigned(now)
 
         rowFrame, nameLabel, timeLabel, deleteBtn = self.rows[name]
@@ -1265,6 +1273,7 @@ class TaskTrackerApp:
         del self.rows[name]
         if name in self.tasks:
             del self.tasks[name]
+            self.sessionLog.append("drop", task=name)
 
         self.relayoutRows()
         self.saveData()
@@ -1290,30 +1299,10 @@ class TaskTrackerApp:
             if name in self.rows:
                 _, _, timeLabel, _ = self.rows[name]
                 timeLabel.config(text=text)
+        if self.currentStart is not None or self.unassignedStart is not None:
+            self.sessionLog.heartbeat(time.time())
         self.root.after(50, self.updateLoop)
 
-    def _parseSummaryText(self, text):
-        agg = {}
-        total = 0.0
-        for line in text.splitlines():
-            if ":" not in line:
-                continue
-            name, rest = line.split(":", 1)
-            name = name.strip()
-            rest = rest.strip()
-            if not rest:
-                continue
-            token = rest.split()[0]
-            try:
-                hours = float(token)
-            except ValueError:
-                continue
-            if name.lower() == "total":
-                continue
-            agg[name] = agg.get(name, 0.0) + hours
-            total += hours
-        return agg, total
-
     def _groupAggregates(self, taskAgg):
         grouped = {}
         for task, hours in taskAgg.items():
@@ -1340,15 +1329,11 @@ class TaskTrackerApp:
         return rounded, target_total
 
     def _mergeSummaryForDate(self, dateKey, newSummary, allowSkip=False):
+        """`newSummary` is a makeSummary() dict; returns the summary to save (or None/"__SKIP__") and the choice"""
         existingEntry = self.history.get(dateKey)
         if not existingEntry:
             return newSummary, "new"
 
-        if isinstance(existingEntry, dict):
-            existingText = existingEntry.get("summary", "") or ""
-        else:
-            existingText = existingEntry or ""
-
         dialog = tk.Toplevel(self.root)
         dialog.title("Existing summary")
         dialog.configure(bg=self.bgColor)
@@ -1475,21 +1460,17 @@ class TaskTrackerApp:
         if choice["value"] == "overwrite":
             return newSummary, "overwrite"
 
-        newAgg, _ = self._parseSummaryText(newSummary)
-        oldAgg, _ = self._parseSummaryText(existingText)
+        oldHours, oldSeconds = entryNumbers(existingEntry)
 
-        combined = dict(oldAgg)
-        for name, hours in newAgg.items():
+        combined = dict(oldHours)
+        for name, hours in newSummary["hoursByTask"].items():
             combined[name] = combined.get(name, 0.0) + hours
+        combinedSeconds = dict(oldSeconds)
+        for name, secs in newSummary["secondsByTask"].items():
+            combinedSeconds[name] = combinedSeconds.get(name, 0) + secs
 
-        totalHours = 0.0
-        lines = []
-        for name, hours in sorted(combined.items(), key=lambda kv: kv[0].lower()):
-            rounded = round(hours, 1)
-            totalHours += rounded
-            lines.append(f"{name}: {rounded:.1f} h")
-        lines.append(f"Total: {totalHours:.1f} h")
-        return "\n".join(lines), "append"
+        rounded = {name: round(hours, 1) for name, hours in combined.items()}
+        return makeSummary(rounded, sum(rounded.values()), combinedSeconds), "append"
 
     def endDay(self):
         now = time.time()
@@ -1497,10 +1478,7 @@ class TaskTrackerApp:
         self._closeActiveSegment(now)
 
         if self.currentTask is not None and self.currentStart is not None:
-            elapsed = now - self.currentStart
-            self.tasks[self.currentTask] = self.tasks.get(self.currentTask, 0.0) + elapsed
-            self.currentTask = None
-            self.currentStart = None
+            self._accrueCurrentTask(now)
             self.refreshRowStyles()
 
         self.stopUnassigned(now)
@@ -1516,11 +1494,7 @@ class TaskTrackerApp:
             )
 
         roundedHours, totalHours = self._normalizeRoundedHours(taskSecondsForSummary)
-        lines = []
-        for name, hours in sorted(roundedHours.items(), key=lambda kv: kv[0].lower()):
-            lines.append(f"{name}: {hours:.1f} h")
-        lines.append(f"Total: {totalHours:.1f} h")
-        summary = "\n".join(lines)
+        summary = makeSummary(roundedHours, totalHours, taskSecondsForSummary)
 
         todayKey = date.today().isoformat()
         merged, choice = self._mergeSummaryForDate(todayKey, summary)
@@ -1528,32 +1502,26 @@ class TaskTrackerApp:
             return
 
         existingEntry = self.history.get(todayKey)
-        existingTimeline = []
+        existingTimeline = CompactTimeline(todayKey)
         if isinstance(existingEntry, dict):
-            existingTimeline = existingEntry.get("timeline", []) or []
+            existingTimeline = asCompactTimeline(existingEntry.get("timeline"), todayKey)
 
         if choice == "append":
-            timeline = existingTimeline + list(self.dayTimeline)
+            timeline = existingTimeline.copy()
+            timeline.extend(self.dayTimeline)
         else:
-            timeline = list(self.dayTimeline)
+            timeline = self.dayTimeline.copy()
 
         timeline = self._roundTimelineEdgesToHour(timeline)
 
-        self.history[todayKey] = {
-            "summary": merged,
-            "timeline": timeline
-        }
+        self.setHistoryEntry(todayKey, dict(merged, timeline=timeline))
         self.append_history_entry(todayKey, self.history[todayKey])
         
         taskSecondsSnapshot = dict(self.tasks)
         if choice == "append" and existingEntry:
-            if isinstance(existingEntry, dict):
-                existingText = existingEntry.get("summary", "") or ""
-            else:
-                existingText = existingEntry or ""
-            oldAgg, _ = self._parseSummaryText(existingText)
-            for name, hours in oldAgg.items():
-                taskSecondsSnapshot[name] = taskSecondsSnapshot.get(name, 0.0) + (hours * 3600.0)
+            _, oldSeconds = entryNumbers(existingEntry)
+            for name, secs in oldSeconds.items():
+                taskSecondsSnapshot[name] = taskSecondsSnapshot.get(name, 0.0) + secs
 
         if self.unassignedSeconds > 0:
             taskSecondsSnapshot["Untasked"] = (
@@ -1566,7 +1534,8 @@ class TaskTrackerApp:
         self.postChargeCodeHours(taskSecondsSnapshot)
         
         # CLEAR session data after saving TODO: should this be a setting?
-        self.dayTimeline = []
+        self.sessionLog.reset(todayKey)
+        self.dayTimeline = CompactTimeline(todayKey)
         self.tasks = {name: 0.0 for name in self.tasks.keys()}
         self.unassignedSeconds = 0.0
         self.unassignedStart = None
@@ -1575,31 +1544,10 @@ class TaskTrackerApp:
         self.hasUnsavedTime = False
         self.refreshRowStyles()
 
-        messagebox.showinfo("Summary: ", merged)
+        messagebox.showinfo("Summary: ", merged["summary"])
 
     def loadChargeCodesFromJsonl(self):
-        chargeCodesByKey = {}
-        try:
-            with open(self.dataFile, "r", encoding="utf-8") as f:
-                for raw in f:
-                    line = raw.strip()
-                    if not line or line.startswith("//"):
-                        continue
-                    try:
-                        obj = json.loads(line)
-                    except Exception:
-                        continue
-                    
-                    if obj.get("type") == "chargeCode":
-                        groupKey = obj.get("groupKey", "").strip()
-                        chargeCodes = obj.get("chargeCodes", [])
-                        
-                        if groupKey and chargeCodes:
-                            chargeCodesByKey[groupKey] = chargeCodes
-        except Exception as e:
-            pass
-        
-        return chargeCodesByKey
+        return self.storage.loadChargeCodesByKey()
 
     def validateEnvFile(self):
         if not self.useTimesheetFunctions and not self.autoChargeCodes:
@@ -0,0 +1,52 @@
+class UnitOfWork:
+    """
+    The storage mutations of one user action (End Day, closing the window, an
+    editor save, saving Settings) gathered into a single batch. The backend
+    commits the whole batch with one write of the data file (or one append in
+    journal mode) instead of one rewrite per mutation.
+
+        with UnitOfWork(storage) as batch:
+            batch.setTasksAndGroups(tasks, groups)
+            batch.saveHistory(dateKey, record)
+
+    Leaving the block commits; an exception inside it discards the batch.
+    Anything not set is left as it is on disk.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.tasks = None
+        self.groups = None
+        # chargeCode line ordinal -> groupKey, like updateChargeCodeGroupKeys()
+        self.chargeCodeGroupKeys = None
+        # dateKey -> history record; a later save of the same day replaces the earlier one
+        self.history = {}
+        self.committed = False
+
+    def setTasksAndGroups(self, tasks, groups):
+        self.tasks = list(tasks)
+        self.groups = dict(groups or {})
+
+    def setChargeCodeGroupKeys(self, groupKeys):
+        self.chargeCodeGroupKeys = dict(groupKeys)
+
+    def saveHistory(self, dateKey, historyObj):
+        self.history[dateKey] = historyObj
+
+    def isEmpty(self):
+        return self.tasks is None and self.chargeCodeGroupKeys is None and not self.history
+
+    def commit(self):
+        if self.committed:
+            return
+        self.committed = True
+        if not self.isEmpty():
+            self.storage.commitBatch(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, exc, tb):
+        if excType is None:
+            self.commit()
+        return False
@@ -0,0 +1,210 @@
+"""
+Rewrite a tasks.jsonl in canonical order with the junk removed:
+
+- tasks (first occurrence), groups (last per task), charge codes, history by date
+- superseded history lines for the same date (newest wins)
+- charge-code chunks that are all padding or repeat an earlier chunk, with
+  chunkIndex renumbered 0..n-1 so re-pulls can't leave colliding indexes
+- comment and unparseable lines; records whose checksum doesn't match are
+  moved to <file>.quarantine instead
+
+The charge-code store (chargeCodes.jsonl) gets the same pass and its
+numbers are added to the report.
+
+    python vacuum.py [dataDir]
+
+vacuums the data of whichever backend settings.json selects.
+"""
+import os
+import sys
+import tempfile
+import time
+
+from docCache import documentCache
+from integrity import appendToQuarantine
+from jsonlReader import checkLine, decodeLine, iterRawLines, mappedFile
+from storage import chunkSignature, dedupeHistory, dumpRecord, isAllNullIds, scanRecords
+from summaries import withSummaryNumbers
+
+
+def _scanSeconds(path, repeat=3):
+    """Best-of-`repeat` time of the startup scan over `path`"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        try:
+            with mappedFile(path) as (data, _):
+                scanRecords(data)
+        except (OSError, ValueError):
+            return None
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _canonicalRecords(path):
+    tasks = []
+    seenTasks = set()
+    groups = {}
+    chunks = []
+    history = []
+    records = 0
+    droppedLines = 0
+    damaged = []
+    offset = 0
+    for _, raw in iterRawLines(path):
+        lineOffset = offset
+        offset += len(raw)
+        if not raw.strip():
+            continue
+        records += 1
+        if checkLine(raw, 0, len(raw)) is False:
+            # don't re-stamp a damaged record as good data; keep it for inspection
+            damaged.append((lineOffset, "checksum", raw))
+            continue
+        obj = decodeLine(raw)
+        kind = obj.get("type") if obj is not None else None
+        if kind == "task":
+            name = obj.get("name")
+            if name and name not in seenTasks:
+                seenTasks.add(name)
+                tasks.append(name)
+        elif kind == "group":
+            if obj.get("task"):
+                groups[obj["task"]] = obj.get("group")
+        elif kind == "chargeCode":
+            chunks.append(obj)
+        elif kind == "history" and obj.get("date"):
+            history.append(obj)
+        else:
+            droppedLines += 1
+
+    keptChunks = []
+    bySignature = {}
+    for obj in chunks:
+        codes = obj.get("chargeCodes")
+        if not isinstance(codes, list) or not codes:
+            continue
+        sig = chunkSignature(codes)
+        if isAllNullIds(sig):
+            continue
+        earlier = bySignature.get(sig)
+        if earlier is not None:
+            # a re-pull of the same chunk; keep whichever mapping the user set
+            if not earlier.get("groupKey") and obj.get("groupKey"):
+                earlier["groupKey"] = obj["groupKey"]
+            continue
+        kept = {"type": "chargeCode", "groupKey": obj.get("groupKey") or "", "chunkIndex": len(keptChunks),
+                "chargeCodes": codes}
+        bySignature[sig] = kept
+        keptChunks.append(kept)
+
+    history, _ = dedupeHistory(history)
+    history.sort(key=lambda obj: obj.get("date"))
+
+    out = [{"type": "task", "name": name} for name in tasks]
+    out.extend({"type": "group", "task": t, "group": g} for t, g in groups.items())
+    out.extend(keptChunks)
+    out.extend(withSummaryNumbers(obj) for obj in history)
+    return out, damaged, {
+        "recordsBefore": records,
+        "droppedLines": droppedLines,
+        "droppedChunks": len(chunks) - len(keptChunks),
+        "quarantinedLines": len(damaged),
+    }
+
+
+def vacuumFile(path, lock, durability=None):
+    """
+    Vacuum the JSONL file at `path` in place while holding `lock` (its FileLock),
+    syncing the rewrite as `durability` (durability.Durability) asks.
+    Returns a report dict, or None if the file doesn't exist or isn't JSONL.
+    """
+    with lock:
+        if not os.path.exists(path):
+            return None
+        bytesBefore = os.path.getsize(path)
+        scanBefore = _scanSeconds(path)
+        if scanBefore is None:
+            # legacy single-document files are converted by the normal load first
+            return None
+        records, damaged, report = _canonicalRecords(path)
+        if damaged:
+            appendToQuarantine(path, damaged)
+
+        dirpath = os.path.dirname(path) or "."
+        tmp = tempfile.NamedTemporaryFile(mode="w", encoding="utf-8", newline="", delete=False, dir=dirpath)
+        try:
+            for obj in records:
+                tmp.write(dumpRecord(obj))
+            tmp.flush()
+            if durability is not None:
+                durability.sync(tmp)
+            tmp.close()
+            os.replace(tmp.name, path)
+            if durability is not None:
+                durability.committed(path)
+        except Exception:
+            tmp.close()
+            if os.path.exists(tmp.name):
+                os.remove(tmp.name)
+            raise
+        documentCache.invalidate(path)
+
+        bytesAfter = os.path.getsize(path)
+        report.update({
+            "recordsAfter": len(records),
+            "bytesBefore": bytesBefore,
+            "bytesAfter": bytesAfter,
+            "scanBefore": scanBefore,
+            "scanAfter": _scanSeconds(path),
+        })
+        return report
+
+
+def combineReports(reports):
+    """Sum per-file reports (the sharded backend vacuums every shard)"""
+    total = {}
+    for report in reports:
+        if not report:
+            continue
+        for key, value in report.items():
+            if value is not None:
+                total[key] = total.get(key, 0) + value
+    return total or None
+
+
+def formatReport(report):
+    if not report:
+        return "Nothing to vacuum."
+    lines = []
+    if "recordsBefore" in report:
+        lines.append(f"Records: {report['recordsBefore']} -> {report['recordsAfter']} "
+                     f"({report['recordsBefore'] - report['recordsAfter']} reclaimed)")
+    lines.append(f"Size: {report['bytesBefore'] / 1024:.1f} KB -> {report['bytesAfter'] / 1024:.1f} KB "
+                 f"({(report['bytesBefore'] - report['bytesAfter']) / 1024:.1f} KB reclaimed)")
+    if report.get("droppedChunks") or report.get("droppedLines"):
+        lines.append(f"Dropped {report.get('droppedChunks', 0)} charge-code chunks and "
+                     f"{report.get('droppedLines', 0)} unreadable lines")
+    if report.get("quarantinedLines"):
+        lines.append(f"Moved {report['quarantinedLines']} damaged records to the quarantine file")
+    if report.get("scanBefore") and report.get("scanAfter"):
+        lines.append(f"Load scan: {report['scanBefore'] * 1000:.1f} ms -> {report['scanAfter'] * 1000:.1f} ms")
+    return "\n".join(lines)
+
+
+def main(argv):
+    if len(argv) > 1:
+        dataDir = argv[1]
+    else:
+        appData = os.environ.get("LOCALAPPDATA") or os.environ.get("APPDATA") or os.path.expanduser("~")
+        dataDir = os.path.join(appData, "Task Tracker")
+    from settings import loadSettings
+    from storage import openStorage
+    store = openStorage(dataDir, loadSettings(os.path.join(dataDir, "settings.json")))
+    print(formatReport(store.vacuum()))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))